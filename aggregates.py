@@ -0,0 +1,209 @@
+"""
+Category aggregates for the Inventory Management System
+category_stats holds product count, total units and total stock value per
+category so dashboards read one row per category instead of joining the
+whole catalog. Triggers on products and inventory (installed by migration 4)
+keep it up to date on every write; this module rebuilds and verifies it.
+
+Usage:
+    python aggregates.py rebuild   Recompute category_stats from scratch
+    python aggregates.py verify    Compare category_stats with a fresh computation
+"""
+
+import argparse
+import sys
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import Error
+
+CREATE_CATEGORY_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS category_stats (
+    category_id INT PRIMARY KEY,
+    product_count INT NOT NULL DEFAULT 0,
+    total_units BIGINT NOT NULL DEFAULT 0,
+    total_value DECIMAL(20, 2) NOT NULL DEFAULT 0
+)
+"""
+
+# Products without a category are tracked under category_id 0 so the
+# inventory total still covers them
+COMPUTE_CATEGORY_STATS_QUERY = """
+SELECT COALESCE(p.category_id, 0) AS category_id,
+       COUNT(*) AS product_count,
+       COALESCE(SUM(i.quantity), 0) AS total_units,
+       COALESCE(SUM(p.price * i.quantity), 0) AS total_value
+FROM products p
+LEFT JOIN inventory i ON i.product_id = p.product_id
+GROUP BY COALESCE(p.category_id, 0)
+"""
+
+REBUILD_CATEGORY_STATS_QUERY = (
+    "INSERT INTO category_stats (category_id, product_count, total_units, total_value) "
+    + COMPUTE_CATEGORY_STATS_QUERY
+)
+
+
+def bump(category, products, units, value):
+    """SQL that adds the given deltas to a category's row, creating it if needed"""
+    return f"""
+    INSERT INTO category_stats (category_id, product_count, total_units, total_value)
+    VALUES (COALESCE({category}, 0), {products}, {units}, {value})
+    ON DUPLICATE KEY UPDATE
+        product_count = product_count + VALUES(product_count),
+        total_units = total_units + VALUES(total_units),
+        total_value = total_value + VALUES(total_value)"""
+
+
+# Each trigger applies only the change its row event causes, so a sale costs
+# one primary-key upsert on category_stats rather than a re-aggregation
+CATEGORY_STATS_TRIGGERS = {
+    "products_stats_insert": f"""
+CREATE TRIGGER products_stats_insert AFTER INSERT ON products FOR EACH ROW
+{bump("NEW.category_id", 1, 0, 0)}
+""",
+    "products_stats_update": f"""
+CREATE TRIGGER products_stats_update AFTER UPDATE ON products FOR EACH ROW
+BEGIN
+    DECLARE units INT DEFAULT 0;
+    IF NOT (OLD.category_id <=> NEW.category_id) OR OLD.price <> NEW.price THEN
+        SELECT COALESCE(SUM(quantity), 0) INTO units FROM inventory WHERE product_id = NEW.product_id;
+        {bump("OLD.category_id", -1, "-units", "-OLD.price * units")};
+        {bump("NEW.category_id", 1, "units", "NEW.price * units")};
+    END IF;
+END
+""",
+    "products_stats_delete": f"""
+CREATE TRIGGER products_stats_delete AFTER DELETE ON products FOR EACH ROW
+{bump("OLD.category_id", -1, 0, 0)}
+""",
+    "inventory_stats_insert": f"""
+CREATE TRIGGER inventory_stats_insert AFTER INSERT ON inventory FOR EACH ROW
+BEGIN
+    DECLARE category INT;
+    DECLARE unit_price DECIMAL(10, 2) DEFAULT 0;
+    SELECT category_id, price INTO category, unit_price FROM products WHERE product_id = NEW.product_id;
+    {bump("category", 0, "NEW.quantity", "COALESCE(unit_price, 0) * NEW.quantity")};
+END
+""",
+    "inventory_stats_update": f"""
+CREATE TRIGGER inventory_stats_update AFTER UPDATE ON inventory FOR EACH ROW
+BEGIN
+    DECLARE category INT;
+    DECLARE unit_price DECIMAL(10, 2) DEFAULT 0;
+    IF OLD.product_id = NEW.product_id THEN
+        IF OLD.quantity <> NEW.quantity THEN
+            SELECT category_id, price INTO category, unit_price FROM products WHERE product_id = NEW.product_id;
+            {bump("category", 0, "NEW.quantity - OLD.quantity",
+                  "COALESCE(unit_price, 0) * (NEW.quantity - OLD.quantity)")};
+        END IF;
+    ELSE
+        SELECT category_id, price INTO category, unit_price FROM products WHERE product_id = OLD.product_id;
+        {bump("category", 0, "-OLD.quantity", "-COALESCE(unit_price, 0) * OLD.quantity")};
+        SELECT category_id, price INTO category, unit_price FROM products WHERE product_id = NEW.product_id;
+        {bump("category", 0, "NEW.quantity", "COALESCE(unit_price, 0) * NEW.quantity")};
+    END IF;
+END
+""",
+    "inventory_stats_delete": f"""
+CREATE TRIGGER inventory_stats_delete AFTER DELETE ON inventory FOR EACH ROW
+BEGIN
+    DECLARE category INT;
+    DECLARE unit_price DECIMAL(10, 2) DEFAULT 0;
+    SELECT category_id, price INTO category, unit_price FROM products WHERE product_id = OLD.product_id;
+    {bump("category", 0, "-OLD.quantity", "-COALESCE(unit_price, 0) * OLD.quantity")};
+END
+""",
+}
+
+
+def install_triggers(cursor):
+    """(Re)create the triggers that maintain category_stats"""
+    for name, statement in CATEGORY_STATS_TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+
+
+def rebuild_category_stats(connection):
+    """Recompute category_stats from products and inventory in one transaction"""
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        cursor.execute("DELETE FROM category_stats")
+        cursor.execute(REBUILD_CATEGORY_STATS_QUERY)
+        rows = cursor.rowcount
+        connection.commit()
+        return rows
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def verify_category_stats(connection):
+    """
+    Compare category_stats with a fresh aggregation.
+    Returns a list of (category_id, expected, actual) for every mismatch.
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        # One snapshot for both reads so concurrent writes cannot cause false alarms
+        connection.start_transaction(readonly=True, isolation_level="REPEATABLE READ")
+        cursor.execute(COMPUTE_CATEGORY_STATS_QUERY)
+        expected = {row["category_id"]: row for row in cursor.fetchall()}
+        cursor.execute("SELECT category_id, product_count, total_units, total_value FROM category_stats")
+        actual = {row["category_id"]: row for row in cursor.fetchall()}
+        connection.commit()
+    finally:
+        cursor.close()
+
+    keys = ("product_count", "total_units", "total_value")
+    empty = dict.fromkeys(keys, 0)
+    mismatches = []
+    for category_id in sorted(set(expected) | set(actual)):
+        want = expected.get(category_id, empty)
+        have = actual.get(category_id, empty)
+        want = tuple(Decimal(want[k]) for k in keys)
+        have = tuple(Decimal(have[k]) for k in keys)
+        if want != have:
+            mismatches.append((category_id, want, have))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the category_stats aggregate table")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.command == "rebuild":
+            rows = rebuild_category_stats(conn)
+            print(f"Rebuilt category_stats ({rows} categories).")
+            return 0
+
+        mismatches = verify_category_stats(conn)
+        if not mismatches:
+            print("category_stats matches products and inventory.")
+            return 0
+        for category_id, want, have in mismatches:
+            print(f"Category {category_id}: expected (products, units, value) {want}, found {have}")
+        print(f"\n{len(mismatches)} mismatched categories. Run 'python aggregates.py rebuild' to repair.")
+        return 1
+    except Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Low-stock alerting for the Inventory Management System
+Every product has a reorder point: its own, else its category's, else
+DEFAULT_REORDER_POINT. Triggers on inventory (installed by migration 7)
+compare each stock change with it, so nothing is ever scanned to find
+low stock:
+
+- low_stock holds exactly the products below their reorder point, and is
+  what the Low Stock report reads
+- stock_alerts is a durable queue with one row each time a product drops
+  below its reorder point ('low') or climbs back to it ('restored'),
+  written in the same transaction as the stock change
+
+Changing a product's or a category's reorder point re-checks the products
+it applies to, through triggers on products and categories. This module
+delivers queued alerts to a log sink and rebuilds or verifies low_stock.
+
+Usage:
+    python alerts.py deliver [--log FILE] [--follow]   Append pending alerts as JSON lines
+    python alerts.py rebuild                           Recompute low_stock from scratch
+    python alerts.py verify                            Compare low_stock with a fresh computation
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+# Reorder point of products whose product and category set none. Baked into
+# the triggers, so re-run install_triggers after changing it.
+DEFAULT_REORDER_POINT = 10
+
+# Alerts read and acknowledged per delivery round
+DELIVERY_BATCH = 500
+
+# Seconds between polls of the queue with --follow
+POLL_INTERVAL = 5.0
+
+CREATE_LOW_STOCK_TABLE = """
+CREATE TABLE IF NOT EXISTS low_stock (
+    product_id INT PRIMARY KEY,
+    quantity INT NOT NULL,
+    reorder_point INT NOT NULL,
+    since TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_low_stock_quantity (quantity)
+)
+"""
+
+CREATE_STOCK_ALERTS_TABLE = """
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    alert_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    kind ENUM('low', 'restored') NOT NULL,
+    quantity INT NOT NULL,
+    reorder_point INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    delivered_at TIMESTAMP NULL,
+    INDEX idx_stock_alerts_pending (delivered_at, alert_id)
+)
+"""
+
+# The reorder point in effect for product row `p`
+REORDER_POINT = (
+    "COALESCE(p.reorder_point, (SELECT c.reorder_point FROM categories c "
+    f"WHERE c.category_id = p.category_id), {DEFAULT_REORDER_POINT})"
+)
+
+COMPUTE_LOW_STOCK_QUERY = f"""
+SELECT i.product_id, i.quantity, {REORDER_POINT} AS reorder_point
+FROM inventory i
+JOIN products p ON p.product_id = i.product_id
+WHERE i.quantity < {REORDER_POINT}
+"""
+
+REBUILD_LOW_STOCK_QUERY = (
+    "INSERT INTO low_stock (product_id, quantity, reorder_point) " + COMPUTE_LOW_STOCK_QUERY
+)
+
+PENDING_ALERTS_QUERY = """
+SELECT a.alert_id, a.product_id, p.name, a.kind, a.quantity, a.reorder_point, a.created_at
+FROM stock_alerts a
+LEFT JOIN products p ON p.product_id = a.product_id
+WHERE a.delivered_at IS NULL AND a.alert_id > %s
+ORDER BY a.alert_id
+LIMIT %s
+"""
+
+ACKNOWLEDGE_ALERTS_QUERY = """
+UPDATE stock_alerts SET delivered_at = CURRENT_TIMESTAMP
+WHERE delivered_at IS NULL AND alert_id <= %s
+"""
+
+
+def crossing(product, old, new, point):
+    """
+    SQL that records a stock change of `product` from `old` to `new` units
+    against `point`: an alert if it crossed the reorder point, and the
+    product's low_stock membership. A NULL `old` means no previous row.
+    """
+    return f"""
+    IF {new} < {point} AND ({old} IS NULL OR {old} >= {point}) THEN
+        INSERT INTO stock_alerts (product_id, kind, quantity, reorder_point)
+        VALUES ({product}, 'low', {new}, {point});
+    ELSEIF {new} >= {point} AND {old} < {point} THEN
+        INSERT INTO stock_alerts (product_id, kind, quantity, reorder_point)
+        VALUES ({product}, 'restored', {new}, {point});
+    END IF;
+    IF {new} < {point} THEN
+        INSERT INTO low_stock (product_id, quantity, reorder_point)
+        VALUES ({product}, {new}, {point})
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), reorder_point = VALUES(reorder_point);
+    ELSE
+        DELETE FROM low_stock WHERE product_id = {product};
+    END IF;"""
+
+
+def resync(source, scope, point):
+    """
+    SQL that re-checks every inventory row `i` of `source` matching `scope`
+    against `point` after a reorder point changed, alerting on products
+    that moved in or out of low_stock
+    """
+    return f"""
+    INSERT INTO stock_alerts (product_id, kind, quantity, reorder_point)
+    SELECT i.product_id, IF(i.quantity < {point}, 'low', 'restored'), i.quantity, {point}
+    FROM {source} WHERE {scope}
+    AND (i.quantity < {point}) <> EXISTS (SELECT 1 FROM low_stock l WHERE l.product_id = i.product_id);
+    DELETE FROM low_stock WHERE product_id IN (
+        SELECT i.product_id FROM {source} WHERE {scope} AND i.quantity >= {point}
+    );
+    INSERT INTO low_stock (product_id, quantity, reorder_point)
+    SELECT i.product_id, i.quantity, {point} FROM {source} WHERE {scope} AND i.quantity < {point}
+    ON DUPLICATE KEY UPDATE quantity = VALUES(quantity), reorder_point = VALUES(reorder_point);"""
+
+
+# A stock change looks up one product's reorder point by primary key and
+# touches one low_stock row; only a category-wide reorder point change
+# re-checks more than one product
+LOW_STOCK_TRIGGERS = {
+    "inventory_low_stock_insert": f"""
+CREATE TRIGGER inventory_low_stock_insert AFTER INSERT ON inventory FOR EACH ROW
+BEGIN
+    DECLARE point INT;
+    SELECT {REORDER_POINT} INTO point FROM products p WHERE p.product_id = NEW.product_id;
+    {crossing("NEW.product_id", "NULL", "NEW.quantity", "point")}
+END
+""",
+    "inventory_low_stock_update": f"""
+CREATE TRIGGER inventory_low_stock_update AFTER UPDATE ON inventory FOR EACH ROW
+BEGIN
+    DECLARE point INT;
+    IF OLD.quantity <> NEW.quantity THEN
+        SELECT {REORDER_POINT} INTO point FROM products p WHERE p.product_id = NEW.product_id;
+        {crossing("NEW.product_id", "OLD.quantity", "NEW.quantity", "point")}
+    END IF;
+END
+""",
+    "inventory_low_stock_delete": """
+CREATE TRIGGER inventory_low_stock_delete AFTER DELETE ON inventory FOR EACH ROW
+DELETE FROM low_stock WHERE product_id = OLD.product_id
+""",
+    "products_low_stock_update": f"""
+CREATE TRIGGER products_low_stock_update AFTER UPDATE ON products FOR EACH ROW
+BEGIN
+    IF NOT (OLD.reorder_point <=> NEW.reorder_point) OR NOT (OLD.category_id <=> NEW.category_id) THEN
+        {resync("inventory i", "i.product_id = NEW.product_id",
+                "COALESCE(NEW.reorder_point, (SELECT c.reorder_point FROM categories c "
+                f"WHERE c.category_id = NEW.category_id), {DEFAULT_REORDER_POINT})")}
+    END IF;
+END
+""",
+    "categories_low_stock_update": f"""
+CREATE TRIGGER categories_low_stock_update AFTER UPDATE ON categories FOR EACH ROW
+BEGIN
+    IF NOT (OLD.reorder_point <=> NEW.reorder_point) THEN
+        {resync("inventory i JOIN products p ON p.product_id = i.product_id",
+                "p.category_id = NEW.category_id AND p.reorder_point IS NULL",
+                f"COALESCE(NEW.reorder_point, {DEFAULT_REORDER_POINT})")}
+    END IF;
+END
+""",
+}
+
+
+def install_triggers(cursor):
+    """(Re)create the triggers that maintain low_stock and queue stock alerts"""
+    for name, statement in LOW_STOCK_TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+
+
+def rebuild_low_stock(connection):
+    """Recompute low_stock from inventory in one transaction, without queueing alerts"""
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction()
+        cursor.execute("DELETE FROM low_stock")
+        cursor.execute(REBUILD_LOW_STOCK_QUERY)
+        rows = cursor.rowcount
+        connection.commit()
+        return rows
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def verify_low_stock(connection):
+    """
+    Compare low_stock with a fresh computation.
+    Returns a list of (product_id, expected, actual) (quantity, reorder point) mismatches.
+    """
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction(readonly=True, isolation_level="REPEATABLE READ")
+        cursor.execute(COMPUTE_LOW_STOCK_QUERY)
+        expected = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        cursor.execute("SELECT product_id, quantity, reorder_point FROM low_stock")
+        actual = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        connection.commit()
+    finally:
+        cursor.close()
+
+    return [
+        (product_id, expected.get(product_id), actual.get(product_id))
+        for product_id in sorted(set(expected) | set(actual))
+        if expected.get(product_id) != actual.get(product_id)
+    ]
+
+
+def alert_record(alert):
+    """JSON-ready form of a stock_alerts row"""
+    record = dict(alert)
+    record['created_at'] = record['created_at'].isoformat(sep=" ") if record['created_at'] else None
+    return record
+
+
+def deliver_alerts(connection, sink, batch=DELIVERY_BATCH):
+    """
+    Append pending alerts to `sink` as JSON lines, oldest first, and mark
+    them delivered. Each batch is flushed to the sink before it is
+    acknowledged, so a crash between the two repeats alerts rather than
+    losing them. Returns the number delivered.
+    """
+    cursor = connection.cursor(dictionary=True)
+    delivered = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute(PENDING_ALERTS_QUERY, (last_id, batch))
+            alerts = cursor.fetchall()
+            connection.commit()
+            if not alerts:
+                return delivered
+
+            for alert in alerts:
+                sink.write(json.dumps(alert_record(alert)) + "\n")
+            sink.flush()
+            try:
+                os.fsync(sink.fileno())
+            except OSError:
+                # Not a file: a pipe, terminal or in-memory sink
+                pass
+
+            last_id = alerts[-1]['alert_id']
+            cursor.execute(ACKNOWLEDGE_ALERTS_QUERY, (last_id,))
+            connection.commit()
+            delivered += len(alerts)
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deliver stock alerts and maintain the low_stock table")
+    parser.add_argument("command", choices=["deliver", "rebuild", "verify"])
+    parser.add_argument("--log", help="File alerts are appended to (default: stdout)")
+    parser.add_argument("--follow", action="store_true",
+                        help=f"Keep delivering new alerts every {POLL_INTERVAL:g} seconds")
+    args = parser.parse_args(argv)
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.command == "rebuild":
+            rows = rebuild_low_stock(conn)
+            print(f"Rebuilt low_stock ({rows} products below their reorder point).")
+            return 0
+
+        if args.command == "verify":
+            mismatches = verify_low_stock(conn)
+            if not mismatches:
+                print("low_stock matches inventory and reorder points.")
+                return 0
+            for product_id, want, have in mismatches:
+                print(f"Product {product_id}: expected (quantity, reorder point) {want}, found {have}")
+            print(f"\n{len(mismatches)} mismatched products. Run 'python alerts.py rebuild' to repair.")
+            return 1
+
+        sink = open(args.log, "a") if args.log else sys.stdout
+        try:
+            while True:
+                delivered = deliver_alerts(conn, sink)
+                if delivered:
+                    print(f"Delivered {delivered} alerts.", file=sys.stderr)
+                if not args.follow:
+                    return 0
+                time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            return 0
+        finally:
+            if sink is not sys.stdout:
+                sink.close()
+    except Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,30 @@
 import mysql.connector
 from mysql.connector import Error
-import os
-from dotenv import load_dotenv
-from tabulate import tabulate
 import sys
+from datetime import datetime, timedelta
+from render import render
+from alerts import DEFAULT_REORDER_POINT
+from service import DB_CONFIG, STORAGE_CONFIG, StockError
+from sharding import ShardError, create_service
 
-# Load environment variables from .env file if it exists
-load_dotenv()
+# Report window choices offered by the Sales Summary, in days
+SALES_SUMMARY_WINDOWS = [7, 30, 90, 365]
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': 'inventory_management',
-    'charset': 'utf8mb4',
-    'use_pure': True
+# Column widths of the product catalog, from the schema, so every page lines up
+PRODUCT_COLUMN_WIDTHS = [8, 30, 33, 12, 20, 8]
+
+# Screen names for the menu choices; database time is attributed to them
+MENU_SCREENS = {
+    '1': "View Products", '2': "Add Product", '3': "Update Product", '4': "Delete Product",
+    '5': "View Inventory", '6': "Update Inventory", '7': "Record Transaction",
+    '8': "View Transactions", '9': "View Categories", '10': "Add Category",
+    '11': "Reports", '12': "Query Statistics", '13': "Search Products"
 }
 
 class InventoryManagementSystem:
-    def __init__(self):
-        self.connection = self.create_connection()
-    
-    def create_connection(self):
-        """Create a database connection to MySQL server"""
-        conn = None
-        try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            return conn
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
-            return None
-    
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a query on the database"""
-        if not self.connection:
-            self.connection = self.create_connection()
-            if not self.connection:
-                return None
-        
-        cursor = self.connection.cursor(dictionary=True)
-        result = None
-        
-        try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if fetch:
-                result = cursor.fetchall()
-            else:
-                self.connection.commit()
-                result = cursor.rowcount
-        except Error as e:
-            print(f"Error executing query: {e}")
-        finally:
-            cursor.close()
-        
-        return result
+    def __init__(self, service=None):
+        """Interactive menu over the service layer, which owns all database access"""
+        self.service = service or create_service()
     
     def display_menu(self):
         """Display the main menu options"""
@@ -74,31 +40,51 @@ class InventoryManagementSystem:
         print("9. View Categories")
         print("10. Add Category")
         print("11. Generate Reports")
+        print("12. Query Statistics")
+        print("13. Search Products")
         print("0. Exit")
         return input("Enter your choice: ")
     
+    def format_product_row(self, p):
+        """Format a product row for the catalog table"""
+        description = p['description']
+        if description and len(description) > 30:
+            description = description[:30] + "..."
+        return [p['product_id'], p['name'], description, f"${p['price']:.2f}", p['category'], p['quantity']]
+    
     def view_products(self):
-        """Display all products"""
-        query = """
-        SELECT p.product_id, p.name, p.description, p.price, c.name as category, i.quantity
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.category_id
-        LEFT JOIN inventory i ON p.product_id = i.product_id
-        ORDER BY p.product_id
-        """
-        products = self.execute_query(query, fetch=True)
-        
-        if products:
-            headers = ["ID", "Name", "Description", "Price", "Category", "In Stock"]
-            table_data = [
-                [p['product_id'], p['name'], p['description'][:30] + "..." if p['description'] and len(p['description']) > 30 else p['description'], 
-                 f"${p['price']:.2f}", p['category'], p['quantity']]
-                for p in products
-            ]
-            print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
-        else:
+        """Display products one page at a time"""
+        headers = ["ID", "Name", "Description", "Price", "Category", "In Stock"]
+        shown = 0
+        
+        for page, has_more in self.service.iter_product_pages():
+            print()
+            render((self.format_product_row(p) for p in page), headers, widths=PRODUCT_COLUMN_WIDTHS)
+            shown += len(page)
+            
+            if not has_more:
+                break
+            if input(f"Showing {shown} products. Press Enter for more, or q to stop: ").lower() == 'q':
+                break
+        
+        if not shown:
             print("No products found.")
     
+    def search_products(self):
+        """Find products by a word or part of a word in their name or description"""
+        text = input("Search for: ").strip()
+        if not text:
+            return
+        
+        products = self.service.search_products(text)
+        if not products:
+            print(f"No products match '{text}'.")
+            return
+        
+        headers = ["ID", "Name", "Description", "Price", "Category", "In Stock"]
+        print(f"\n===== Products matching '{text}' =====")
+        render((self.format_product_row(p) for p in products), headers, widths=PRODUCT_COLUMN_WIDTHS)
+    
     def add_product(self):
         """Add a new product"""
         name = input("Enter product name: ")
@@ -113,7 +99,7 @@ class InventoryManagementSystem:
                 print("Invalid price. Please enter a number.")
         
         # Get categories for selection
-        categories = self.execute_query("SELECT category_id, name FROM categories", fetch=True)
+        categories = self.service.category_choices()
         
         if not categories:
             print("No categories found. Please add a category first.")
@@ -133,31 +119,24 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        # Insert the product
-        query = """
-        INSERT INTO products (name, description, price, category_id)
-        VALUES (%s, %s, %s, %s)
-        """
-        result = self.execute_query(query, (name, description, price, category_id))
+        while True:
+            try:
+                quantity = int(input("Enter initial stock quantity: "))
+                if quantity >= 0:
+                    break
+                print("Inventory cannot be negative.")
+            except ValueError:
+                print("Invalid input. Please enter a number.")
+        
+        # Insert the product and its inventory row together
+        try:
+            self.service.create_product(name, description, price, category_id, quantity)
+        except (Error, StockError, ShardError) as e:
+            print(f"Failed to add product: {e}")
+            return
         
-        if result:
-            print(f"Product '{name}' added successfully.")
-            
-            # Get the new product ID
-            product_id = self.execute_query(
-                "SELECT product_id FROM products WHERE name = %s ORDER BY product_id DESC LIMIT 1",
-                (name,), fetch=True
-            )[0]['product_id']
-            
-            # Initialize inventory
-            quantity = int(input("Enter initial stock quantity: "))
-            self.execute_query(
-                "INSERT INTO inventory (product_id, quantity) VALUES (%s, %s)",
-                (product_id, quantity)
-            )
-            print(f"Initial inventory of {quantity} units recorded.")
-        else:
-            print("Failed to add product.")
+        print(f"Product '{name}' added successfully.")
+        print(f"Initial inventory of {quantity} units recorded.")
     
     def update_product(self):
         """Update an existing product"""
@@ -170,10 +149,7 @@ class InventoryManagementSystem:
                     return
                 
                 # Check if product exists
-                product = self.execute_query(
-                    "SELECT * FROM products WHERE product_id = %s",
-                    (product_id,), fetch=True
-                )
+                product = self.service.get_product(product_id)
                 
                 if not product:
                     print("Product not found.")
@@ -183,7 +159,6 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        product = product[0]
         print(f"\nUpdating Product: {product['name']}")
         
         name = input(f"Enter new name (current: {product['name']}, press Enter to keep current): ")
@@ -196,13 +171,9 @@ class InventoryManagementSystem:
         price = float(price_str) if price_str else product['price']
         
         # Get categories for selection
-        categories = self.execute_query("SELECT category_id, name FROM categories", fetch=True)
-        current_category = self.execute_query(
-            "SELECT c.name FROM categories c JOIN products p ON c.category_id = p.category_id WHERE p.product_id = %s",
-            (product_id,), fetch=True
-        )
+        categories = self.service.category_choices() or []
         
-        print(f"\nCurrent category: {current_category[0]['name'] if current_category else 'None'}")
+        print(f"\nCurrent category: {product['category'] or 'None'}")
         print("Available Categories:")
         for cat in categories:
             print(f"{cat['category_id']}. {cat['name']}")
@@ -210,15 +181,25 @@ class InventoryManagementSystem:
         category_id_str = input("Select new category ID (press Enter to keep current): ")
         category_id = int(category_id_str) if category_id_str else product['category_id']
         
+        current = product['reorder_point']
+        if current is None:
+            inherited = product['category_reorder_point']
+            current = f"{inherited if inherited is not None else DEFAULT_REORDER_POINT} by default"
+        point_str = input(
+            f"Enter reorder point (current: {current}, press Enter to keep current, "
+            "'-' for the category default): "
+        ).strip()
+        
         # Update the product
-        query = """
-        UPDATE products
-        SET name = %s, description = %s, price = %s, category_id = %s
-        WHERE product_id = %s
-        """
-        result = self.execute_query(query, (name, description, price, category_id, product_id))
+        result = self.service.update_product(product_id, name, description, price, category_id)
+        if result is not None and point_str:
+            try:
+                point = None if point_str == '-' else int(point_str)
+                result = self.service.set_reorder_point(product_id, point)
+            except ValueError as e:
+                print(f"Reorder point not changed: {e}")
         
-        if result:
+        if result is not None:
             print(f"Product updated successfully.")
         else:
             print("Failed to update product.")
@@ -234,10 +215,7 @@ class InventoryManagementSystem:
                     return
                 
                 # Check if product exists
-                product = self.execute_query(
-                    "SELECT name FROM products WHERE product_id = %s",
-                    (product_id,), fetch=True
-                )
+                product = self.service.get_product(product_id)
                 
                 if not product:
                     print("Product not found.")
@@ -247,18 +225,18 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        confirm = input(f"Are you sure you want to delete '{product[0]['name']}'? (y/n): ").lower()
+        confirm = input(f"Are you sure you want to delete '{product['name']}'? (y/n): ").lower()
         
         if confirm == 'y':
-            # First delete from inventory and transactions (due to foreign key constraints)
-            self.execute_query("DELETE FROM inventory WHERE product_id = %s", (product_id,))
-            self.execute_query("DELETE FROM transactions WHERE product_id = %s", (product_id,))
-            
-            # Then delete the product
-            result = self.execute_query("DELETE FROM products WHERE product_id = %s", (product_id,))
+            # The product, its inventory and its history go in one transaction
+            try:
+                deleted = self.service.delete_product(product_id)
+            except Error as e:
+                print(f"Failed to delete product: {e}")
+                return
             
-            if result:
-                print(f"Product '{product[0]['name']}' deleted successfully.")
+            if deleted:
+                print(f"Product '{product['name']}' deleted successfully.")
             else:
                 print("Failed to delete product.")
         else:
@@ -266,26 +244,17 @@ class InventoryManagementSystem:
     
     def view_inventory(self):
         """Display current inventory levels"""
-        query = """
-        SELECT p.product_id, p.name, i.quantity, p.price, (p.price * i.quantity) as total_value
-        FROM inventory i
-        JOIN products p ON i.product_id = p.product_id
-        ORDER BY i.quantity DESC
-        """
-        inventory = self.execute_query(query, fetch=True)
-        
-        if inventory:
-            headers = ["ID", "Product", "Quantity", "Unit Price", "Total Value"]
-            table_data = [
-                [item['product_id'], item['name'], item['quantity'], f"${item['price']:.2f}", f"${item['total_value']:.2f}"]
-                for item in inventory
-            ]
-            
-            # Calculate total inventory value
-            total_value = sum(item['total_value'] for item in inventory)
-            
-            print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
-            print(f"\nTotal Inventory Value: ${total_value:.2f}")
+        headers = ["ID", "Product", "Quantity", "Unit Price", "Total Value"]
+        table_data = (
+            [item['product_id'], item['name'], item['quantity'], f"${item['price']:.2f}", f"${item['total_value']:.2f}"]
+            for item in self.service.iter_inventory_levels()
+        )
+        
+        print()
+        if render(table_data, headers):
+            total_value = self.service.inventory_total()
+            if total_value is not None:
+                print(f"\nTotal Inventory Value: ${total_value:.2f}")
         else:
             print("No inventory data found.")
     
@@ -300,15 +269,7 @@ class InventoryManagementSystem:
                     return
                 
                 # Check if product exists in inventory
-                inventory = self.execute_query(
-                    """
-                    SELECT i.quantity, p.name 
-                    FROM inventory i 
-                    JOIN products p ON i.product_id = p.product_id 
-                    WHERE i.product_id = %s
-                    """,
-                    (product_id,), fetch=True
-                )
+                inventory = self.service.get_stock(product_id)
                 
                 if not inventory:
                     print("Product not found in inventory.")
@@ -318,8 +279,8 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        current_quantity = inventory[0]['quantity']
-        product_name = inventory[0]['name']
+        current_quantity = inventory['quantity']
+        product_name = inventory['name']
         
         print(f"\nUpdating inventory for: {product_name}")
         print(f"Current quantity: {current_quantity}")
@@ -347,31 +308,37 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        # Update inventory
-        result = self.execute_query(
-            "UPDATE inventory SET quantity = %s WHERE product_id = %s",
-            (new_quantity, product_id)
-        )
-        
-        if result:
-            print(f"Inventory updated successfully. New quantity: {new_quantity}")
-            
-            # Record transaction if it's an addition or removal
-            if update_type == 'a' and quantity_change != 0:
-                transaction_type = 'restock' if quantity_change > 0 else 'sale'
-                quantity = abs(quantity_change)
-                
-                self.execute_query(
-                    """
-                    INSERT INTO transactions (product_id, quantity, transaction_type, notes)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (product_id, quantity, transaction_type, f"Manual {transaction_type}")
+        if update_type == 'a':
+            # Apply the change relative to whatever is in the database now,
+            # not the quantity read before the prompts
+            transaction_type = 'restock' if quantity_change > 0 else 'sale'
+            try:
+                new_quantity = self.service.adjust_stock(
+                    product_id, quantity_change, transaction_type,
+                    notes=f"Manual {transaction_type}"
                 )
-                
-                print(f"Transaction recorded: {transaction_type} of {quantity} units")
+            except StockError as e:
+                print(f"Failed to update inventory. {e}")
+                return
+            
+            if new_quantity is None:
+                print("Failed to update inventory.")
+                return
+            
+            print(f"Inventory updated successfully. New quantity: {new_quantity}")
+            if quantity_change != 0:
+                print(f"Transaction recorded: {transaction_type} of {abs(quantity_change)} units")
         else:
-            print("Failed to update inventory.")
+            try:
+                result = self.service.set_stock(product_id, new_quantity)
+            except StockError as e:
+                print(f"Failed to update inventory. {e}")
+                return
+            
+            if result is not None:
+                print(f"Inventory updated successfully. New quantity: {new_quantity}")
+            else:
+                print("Failed to update inventory.")
     
     def record_transaction(self):
         """Record a sale or restock transaction"""
@@ -384,15 +351,7 @@ class InventoryManagementSystem:
                     return
                 
                 # Check if product exists
-                product = self.execute_query(
-                    """
-                    SELECT p.name, i.quantity 
-                    FROM products p 
-                    JOIN inventory i ON p.product_id = i.product_id 
-                    WHERE p.product_id = %s
-                    """,
-                    (product_id,), fetch=True
-                )
+                product = self.service.get_stock(product_id)
                 
                 if not product:
                     print("Product not found.")
@@ -402,8 +361,8 @@ class InventoryManagementSystem:
             except ValueError:
                 print("Invalid input. Please enter a number.")
         
-        product_name = product[0]['name']
-        current_quantity = product[0]['quantity']
+        product_name = product['name']
+        current_quantity = product['quantity']
         
         print(f"\nRecording transaction for: {product_name}")
         print(f"Current inventory: {current_quantity}")
@@ -434,65 +393,97 @@ class InventoryManagementSystem:
         
         notes = input("Enter transaction notes (optional): ")
         
-        # Record the transaction
-        result = self.execute_query(
-            """
-            INSERT INTO transactions (product_id, quantity, transaction_type, notes)
-            VALUES (%s, %s, %s, %s)
-            """,
-            (product_id, quantity, transaction_type, notes)
-        )
+        # Record the transaction and apply the stock change atomically
+        try:
+            new_quantity = self.service.record_transaction(product_id, quantity, transaction_type, notes)
+        except StockError as e:
+            print(f"Failed to record transaction. {e}")
+            return
         
-        if result:
-            # Update inventory
-            new_quantity = current_quantity + quantity if transaction_type == 'restock' else current_quantity - quantity
-            
-            self.execute_query(
-                "UPDATE inventory SET quantity = %s WHERE product_id = %s",
-                (new_quantity, product_id)
-            )
-            
+        if new_quantity is not None:
             print(f"Transaction recorded successfully.")
             print(f"New inventory for {product_name}: {new_quantity}")
         else:
             print("Failed to record transaction.")
     
+    def prompt_date(self, prompt):
+        """Ask for an optional YYYY-MM-DD date; returns a datetime or None"""
+        while True:
+            value = input(prompt).strip()
+            if not value:
+                return None
+            try:
+                return datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                print("Invalid date. Please use YYYY-MM-DD.")
+    
     def view_transactions(self):
-        """View transaction history"""
-        query = """
-        SELECT t.transaction_id, p.name as product, t.quantity, t.transaction_type,
-               t.transaction_date, t.notes
-        FROM transactions t
-        JOIN products p ON t.product_id = p.product_id
-        ORDER BY t.transaction_date DESC
-        LIMIT 50
-        """
-        transactions = self.execute_query(query, fetch=True)
-        
-        if transactions:
-            headers = ["ID", "Product", "Quantity", "Type", "Date", "Notes"]
+        """View transaction history with optional filters, one page at a time"""
+        print("\nFilter transactions (press Enter to skip a filter)")
+        
+        while True:
+            product_str = input("Product ID: ").strip()
+            if not product_str:
+                product_id = None
+                break
+            try:
+                product_id = int(product_str)
+                break
+            except ValueError:
+                print("Invalid input. Please enter a number.")
+        
+        while True:
+            type_str = input("Type (s)ale or (r)estock: ").strip().lower()
+            if type_str in ['', 's', 'r']:
+                transaction_type = {'s': 'sale', 'r': 'restock'}.get(type_str)
+                break
+            print("Invalid choice. Please enter 's', 'r' or press Enter.")
+        
+        start_date = self.prompt_date("From date (YYYY-MM-DD): ")
+        end_date = self.prompt_date("To date, inclusive (YYYY-MM-DD): ")
+        if end_date is not None:
+            end_date += timedelta(days=1)
+        
+        filters = dict(product_id=product_id, transaction_type=transaction_type,
+                       start_date=start_date, end_date=end_date)
+        page = self.service.query_transactions(**filters)
+        headers = ["ID", "Product", "Quantity", "Type", "Date", "Notes"]
+        
+        while True:
+            if page is None:
+                return
+            if not page.rows:
+                print("No transactions found.")
+                return
+            
             table_data = [
-                [t['transaction_id'], t['product'], t['quantity'], 
-                 t['transaction_type'].capitalize(), t['transaction_date'], 
+                [t['transaction_id'], t['product'], t['quantity'],
+                 t['transaction_type'].capitalize(), t['transaction_date'],
                  t['notes'] if t['notes'] else '']
-                for t in transactions
+                for t in page.rows
             ]
+            print()
+            render(table_data, headers)
             
-            print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
-            print("\nShowing the 50 most recent transactions.")
-        else:
-            print("No transactions found.")
+            options = []
+            if page.older:
+                options.append("(o)lder")
+            if page.newer:
+                options.append("(n)ewer")
+            if not options:
+                return
+            
+            choice = input(f"Show {' or '.join(options)} transactions, or press Enter to stop: ").lower()
+            if choice == 'o' and page.older:
+                page = self.service.query_transactions(before=page.older, **filters)
+            elif choice == 'n' and page.newer:
+                page = self.service.query_transactions(after=page.newer, **filters)
+            else:
+                return
     
     def view_categories(self):
         """View product categories"""
-        query = """
-        SELECT c.category_id, c.name, c.description, COUNT(p.product_id) as product_count
-        FROM categories c
-        LEFT JOIN products p ON c.category_id = p.category_id
-        GROUP BY c.category_id
-        ORDER BY c.name
-        """
-        categories = self.execute_query(query, fetch=True)
+        categories = self.service.list_categories()
         
         if categories:
             headers = ["ID", "Name", "Description", "Product Count"]
@@ -503,7 +494,8 @@ class InventoryManagementSystem:
                 for c in categories
             ]
             
-            print("\n" + tabulate(table_data, headers=headers, tablefmt="grid"))
+            print()
+            render(table_data, headers)
         else:
             print("No categories found.")
     
@@ -512,8 +504,7 @@ class InventoryManagementSystem:
         name = input("Enter category name: ")
         description = input("Enter category description: ")
         
-        query = "INSERT INTO categories (name, description) VALUES (%s, %s)"
-        result = self.execute_query(query, (name, description))
+        result = self.service.create_category(name, description)
         
         if result:
             print(f"Category '{name}' added successfully.")
@@ -527,41 +518,26 @@ class InventoryManagementSystem:
         print("2. High Value Items")
         print("3. Sales Summary")
         print("4. Category Summary")
+        print("5. Stock Alerts")
         print("0. Back to Main Menu")
         
         choice = input("Select report: ")
         
         if choice == '1':
-            # Low stock items (less than 10 units)
-            query = """
-            SELECT p.name, i.quantity, c.name as category
-            FROM inventory i
-            JOIN products p ON i.product_id = p.product_id
-            JOIN categories c ON p.category_id = c.category_id
-            WHERE i.quantity < 10
-            ORDER BY i.quantity
-            """
-            items = self.execute_query(query, fetch=True)
+            # Products below their reorder point
+            headers = ["Product", "Quantity", "Reorder Point", "Category"]
+            table_data = (
+                [item['name'], item['quantity'], item['reorder_point'], item['category']]
+                for item in self.service.iter_low_stock_items()
+            )
             
-            if items:
-                headers = ["Product", "Quantity", "Category"]
-                table_data = [[item['name'], item['quantity'], item['category']] for item in items]
-                
-                print("\n===== Low Stock Items (Less than 10 units) =====")
-                print(tabulate(table_data, headers=headers, tablefmt="grid"))
-            else:
+            print("\n===== Low Stock Items (Below Reorder Point) =====")
+            if not render(table_data, headers):
                 print("No low stock items found.")
                 
         elif choice == '2':
             # High value items (top 10 by total value)
-            query = """
-            SELECT p.name, i.quantity, p.price, (p.price * i.quantity) as total_value
-            FROM inventory i
-            JOIN products p ON i.product_id = p.product_id
-            ORDER BY total_value DESC
-            LIMIT 10
-            """
-            items = self.execute_query(query, fetch=True)
+            items = self.service.high_value_items()
             
             if items:
                 headers = ["Product", "Quantity", "Unit Price", "Total Value"]
@@ -571,52 +547,53 @@ class InventoryManagementSystem:
                 ]
                 
                 print("\n===== High Value Items (Top 10) =====")
-                print(tabulate(table_data, headers=headers, tablefmt="grid"))
+                render(table_data, headers)
             else:
                 print("No inventory data found.")
                 
         elif choice == '3':
-            # Sales summary (last 30 days)
-            query = """
-            SELECT p.name, SUM(t.quantity) as units_sold, 
-                   SUM(t.quantity * p.price) as revenue
-            FROM transactions t
-            JOIN products p ON t.product_id = p.product_id
-            WHERE t.transaction_type = 'sale'
-            AND t.transaction_date >= DATE_SUB(CURRENT_DATE, INTERVAL 30 DAY)
-            GROUP BY p.product_id
-            ORDER BY revenue DESC
-            """
-            sales = self.execute_query(query, fetch=True)
+            # Sales summary over a chosen window
+            print("\nReport window:")
+            for i, days in enumerate(SALES_SUMMARY_WINDOWS, 1):
+                print(f"{i}. Last {days} days")
+            print(f"{len(SALES_SUMMARY_WINDOWS) + 1}. Custom date range")
             
-            if sales:
-                headers = ["Product", "Units Sold", "Revenue"]
-                table_data = [
-                    [sale['name'], sale['units_sold'], f"${sale['revenue']:.2f}"]
-                    for sale in sales
-                ]
-                
-                total_revenue = sum(sale['revenue'] for sale in sales)
-                
-                print("\n===== Sales Summary (Last 30 Days) =====")
-                print(tabulate(table_data, headers=headers, tablefmt="grid"))
-                print(f"\nTotal Revenue: ${total_revenue:.2f}")
+            window = input("Select window (press Enter for last 30 days): ").strip()
+            today = datetime.now().date()
+            end_date = today + timedelta(days=1)
+            
+            if window.isdigit() and 1 <= int(window) <= len(SALES_SUMMARY_WINDOWS):
+                days = SALES_SUMMARY_WINDOWS[int(window) - 1]
+                start_date = today - timedelta(days=days)
+                title = f"Last {days} Days"
+            elif window == str(len(SALES_SUMMARY_WINDOWS) + 1):
+                start = self.prompt_date("From date (YYYY-MM-DD): ")
+                end = self.prompt_date("To date, inclusive (YYYY-MM-DD): ")
+                start_date = start.date() if start else today - timedelta(days=30)
+                end_date = end.date() + timedelta(days=1) if end else end_date
+                title = f"{start_date} to {end_date - timedelta(days=1)}"
             else:
-                print("No sales data found for the last 30 days.")
+                start_date = today - timedelta(days=30)
+                title = "Last 30 Days"
+            
+            headers = ["Product", "Units Sold", "Revenue"]
+            revenue = []
+            
+            def sales_rows():
+                # Totals accumulate as rows stream past, without keeping them
+                for sale in self.service.iter_sales_summary(start_date, end_date):
+                    revenue.append(sale['revenue'])
+                    yield [sale['name'], sale['units_sold'], f"${sale['revenue']:.2f}"]
+            
+            print(f"\n===== Sales Summary ({title}) =====")
+            if render(sales_rows(), headers):
+                print(f"\nTotal Revenue: ${sum(revenue):.2f}")
+            else:
+                print(f"No sales data found ({title}).")
                 
         elif choice == '4':
             # Category summary
-            query = """
-            SELECT c.name as category, COUNT(p.product_id) as product_count,
-                   SUM(i.quantity) as total_units,
-                   SUM(p.price * i.quantity) as total_value
-            FROM categories c
-            LEFT JOIN products p ON c.category_id = p.category_id
-            LEFT JOIN inventory i ON p.product_id = i.product_id
-            GROUP BY c.category_id
-            ORDER BY total_value DESC
-            """
-            categories = self.execute_query(query, fetch=True)
+            categories = self.service.category_summary()
             
             if categories:
                 headers = ["Category", "Products", "Total Units", "Total Value"]
@@ -628,60 +605,99 @@ class InventoryManagementSystem:
                 ]
                 
                 print("\n===== Category Summary =====")
-                print(tabulate(table_data, headers=headers, tablefmt="grid"))
+                render(table_data, headers)
             else:
                 print("No category data found.")
+                
+        elif choice == '5':
+            self.view_stock_alerts()
+    
+    def view_stock_alerts(self):
+        """Show undelivered low-stock alerts and optionally mark them seen"""
+        alerts = self.service.pending_alerts()
+        
+        if not alerts:
+            print("No pending stock alerts.")
+            return
+        
+        headers = ["Alert", "Product", "Alert Type", "Quantity", "Reorder Point", "Raised"]
+        table_data = [
+            [a['alert_id'], a['name'] or f"#{a['product_id']}", a['kind'].capitalize(),
+             a['quantity'], a['reorder_point'], a['created_at']]
+            for a in alerts
+        ]
+        print("\n===== Stock Alerts =====")
+        render(table_data, headers)
+        
+        if input("Mark these alerts as seen? (y/n): ").lower() == 'y':
+            self.service.acknowledge_alerts(alerts[-1]['alert_id'])
+    
+    def view_query_stats(self):
+        """Show which screens issue the most database work, and the costliest statements"""
+        print("\n===== Query Statistics (this session) =====")
+        print(self.service.query_report())
     
     def run(self):
         """Run the main application loop"""
         while True:
             choice = self.display_menu()
             
-            if choice == '1':
-                self.view_products()
-            elif choice == '2':
-                self.add_product()
-            elif choice == '3':
-                self.update_product()
-            elif choice == '4':
-                self.delete_product()
-            elif choice == '5':
-                self.view_inventory()
-            elif choice == '6':
-                self.update_inventory()
-            elif choice == '7':
-                self.record_transaction()
-            elif choice == '8':
-                self.view_transactions()
-            elif choice == '9':
-                self.view_categories()
-            elif choice == '10':
-                self.add_category()
-            elif choice == '11':
-                self.generate_reports()
-            elif choice == '0':
+            if choice == '0':
                 print("Thank you for using the Inventory Management System. Goodbye!")
                 break
-            else:
-                print("Invalid choice. Please try again.")
+            
+            with self.service.operation(MENU_SCREENS.get(choice, "Menu")):
+                if choice == '1':
+                    self.view_products()
+                elif choice == '2':
+                    self.add_product()
+                elif choice == '3':
+                    self.update_product()
+                elif choice == '4':
+                    self.delete_product()
+                elif choice == '5':
+                    self.view_inventory()
+                elif choice == '6':
+                    self.update_inventory()
+                elif choice == '7':
+                    self.record_transaction()
+                elif choice == '8':
+                    self.view_transactions()
+                elif choice == '9':
+                    self.view_categories()
+                elif choice == '10':
+                    self.add_category()
+                elif choice == '11':
+                    self.generate_reports()
+                elif choice == '12':
+                    self.view_query_stats()
+                elif choice == '13':
+                    self.search_products()
+                else:
+                    print("Invalid choice. Please try again.")
             
             input("\nPress Enter to continue...")
     
     def close_connection(self):
-        """Close the database connection"""
-        if self.connection:
-            self.connection.close()
+        """Close all pooled database connections"""
+        self.service.close()
 
 if __name__ == "__main__":
+    # Any arguments select the non-interactive command interface
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+    
     print("Starting Inventory Management System...")
     
-    # Check if database exists
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        conn.close()
-    except Error as e:
-        print("Database not set up. Please run setup_database.py first.")
-        sys.exit(1)
+    # Check if database exists (an embedded SQLite database creates its own schema)
+    if STORAGE_CONFIG['backend'] == 'mysql':
+        try:
+            conn = mysql.connector.connect(**DB_CONFIG)
+            conn.close()
+        except Error as e:
+            print("Database not set up. Please run setup_database.py first.")
+            sys.exit(1)
     
     ims = InventoryManagementSystem()
     
@@ -690,4 +706,8 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nProgram terminated by user.")
     finally:
+        cache_stats = ims.service.get_cache_stats()
+        if cache_stats:
+            print(f"Query cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                  f"({cache_stats['hit_rate']:.0%} hit rate)")
         ims.close_connection()
@@ -0,0 +1,349 @@
+"""
+Benchmark suite for the Inventory Management System
+Seeds one database per data scale with the synthetic generator and times
+every operation the menu performs, reporting p50/p95/p99 latency and
+throughput. Results can be saved as a JSON baseline, and later runs fail
+when an operation regresses beyond a threshold.
+
+Usage:
+    python benchmark.py --scales 1k,100k --save baseline.json
+    python benchmark.py --scales 1k,100k --baseline baseline.json [--threshold 0.2]
+    python benchmark.py --protocols [--only record_transaction,...]
+
+Each scale uses its own database (inventory_benchmark_<scale>), seeded on
+first use and reused afterwards; --reseed rebuilds it. To keep benchmarks
+off a shared server, point DB_HOST/DB_PORT at a throwaway instance, e.g.
+
+    docker run --rm -d -p 3307:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=yes mysql:8.0
+    DB_PORT=3307 python benchmark.py --scales 1k
+
+or use --backend sqlite, which needs no server and keeps each scale in
+inventory_benchmark_<scale>.db in the current directory.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+import data_generator
+from http_api import percentile
+from migrations import migrate
+from service import DB_CONFIG, QUERY_CACHE_CONFIG, STATEMENTS, InventoryService, MySQLBackend, create_backend
+
+# categories, products, transactions per scale
+SCALES = {
+    "1k": (10, 100, 1000),
+    "100k": (50, 10000, 100000),
+    "10m": (200, 100000, 10000000),
+}
+
+# Connector configurations compared by --protocols: (label, use_pure, prepared)
+PROTOCOLS = [
+    ("pure-python, text", True, False),
+    ("pure-python, prepared", True, True),
+    ("C extension, text", False, False),
+    ("C extension, prepared", False, True),
+]
+
+# Operations --protocols times unless --only names others
+PROTOCOL_OPERATIONS = ["record_transaction", "inventory_adjust"]
+
+# A change fails the comparison when p50 or p95 grows by more than this fraction...
+REGRESSION_THRESHOLD = 0.20
+
+# ...and by more than this many milliseconds, so sub-millisecond jitter never fails a run
+NOISE_FLOOR_MS = 0.5
+
+
+class BenchmarkError(Exception):
+    """Raised when an operation fails while being measured"""
+
+
+def checked(result, name):
+    if result is None:
+        raise BenchmarkError(f"{name} failed; see the error above")
+    return result
+
+
+def operations(service, first_product, last_product, rng):
+    """Return {name: callable} for every operation the menu performs"""
+    def product():
+        return rng.randint(first_product, last_product)
+
+    def catalog_first_page():
+        checked(next(service.iter_product_pages(), None), "catalog view")
+
+    def catalog_deep_page():
+        checked(next(service.iter_product_pages(after_id=product()), None), "catalog view")
+
+    def inventory_view():
+        checked(service.inventory_levels(), "inventory view")
+        checked(service.inventory_total(), "inventory total")
+
+    def sales_summary():
+        today = datetime.now().date()
+        checked(service.sales_summary(today - timedelta(days=30), today + timedelta(days=1)), "sales summary")
+
+    def transaction_history():
+        checked(service.query_transactions(product_id=product()), "transaction history")
+
+    return {
+        "catalog_first_page": catalog_first_page,
+        "catalog_deep_page": catalog_deep_page,
+        "inventory_view": inventory_view,
+        "categories_view": lambda: checked(service.list_categories(), "categories view"),
+        "transaction_history": transaction_history,
+        "report_low_stock": lambda: checked(service.low_stock_items(), "low stock report"),
+        "report_high_value": lambda: checked(service.high_value_items(), "high value report"),
+        "report_sales_summary": sales_summary,
+        "report_category_summary": lambda: checked(service.category_summary(), "category summary"),
+        # Restocks never hit the stock guard, so the write path is measured every time
+        "record_transaction": lambda: checked(
+            service.record_transaction(product(), 1, "restock", "benchmark"), "record transaction"),
+        "inventory_set": lambda: checked(service.set_stock(product(), rng.randint(0, 500)), "inventory update"),
+        "inventory_adjust": lambda: checked(
+            service.adjust_stock(product(), 1, "restock", "benchmark"), "inventory adjust"),
+    }
+
+
+def measure(operation, iterations, warmup, max_seconds):
+    """Time one operation; returns latency percentiles (ms) and throughput"""
+    for _ in range(warmup):
+        operation()
+
+    samples = []
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    while len(samples) < iterations:
+        begin = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - begin)
+        # Slow operations at large scales stop early, keeping a few samples
+        if begin > deadline and len(samples) >= 5:
+            break
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "ops_per_sec": round(len(samples) / elapsed, 1),
+    }
+
+
+def database_name(scale):
+    return f"inventory_benchmark_{scale}"
+
+
+def sqlite_path(scale):
+    return f"{database_name(scale)}.db"
+
+
+def prepare_database(scale, reseed=False, method="insert", backend="mysql"):
+    """Create, migrate and seed the database for a scale unless it is already seeded"""
+    categories, products, transactions = SCALES[scale]
+    name = database_name(scale)
+
+    if backend == "sqlite":
+        if reseed:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(sqlite_path(scale) + suffix):
+                    os.remove(sqlite_path(scale) + suffix)
+        # The embedded schema is created on connect
+        conn = create_backend("sqlite", sqlite_path(scale)).connect()
+    else:
+        server = {key: value for key, value in DB_CONFIG.items() if key != 'database'}
+        conn = mysql.connector.connect(**server)
+    try:
+        cursor = conn.cursor()
+        if backend == "mysql":
+            if reseed:
+                cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {name}")
+            cursor.execute(f"USE {name}")
+            migrate(conn)
+
+        cursor.execute("SELECT COUNT(*) FROM products")
+        seeded = cursor.fetchone()[0]
+        cursor.close()
+        if seeded == products:
+            print(f"Reusing {name} ({products:,} products)")
+        elif seeded:
+            raise BenchmarkError(f"{name} holds {seeded:,} products, expected {products:,}; use --reseed")
+        else:
+            print(f"Seeding {name}: {products:,} products, {transactions:,} transactions")
+            data_generator.seed(conn, categories, products, transactions, method=method, random_seed=42)
+    finally:
+        conn.close()
+
+
+def product_range(service):
+    rows = checked(service.execute_query(
+        "SELECT MIN(product_id) AS first, MAX(product_id) AS last FROM products", fetch=True
+    ), "product range")
+    return rows[0]["first"], rows[0]["last"]
+
+
+def run_scale(scale, args):
+    """Benchmark every selected operation against one scale's database"""
+    if args.backend == "sqlite":
+        backend = create_backend("sqlite", sqlite_path(scale))
+    else:
+        backend = MySQLBackend(dict(DB_CONFIG, database=database_name(scale)))
+    service = InventoryService(backend=backend)
+    rng = random.Random(7)
+    results = {}
+    try:
+        first, last = product_range(service)
+        selected = operations(service, first, last, rng)
+        for name, operation in selected.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = measure(operation, args.iterations, args.warmup, args.max_seconds)
+            r = results[name]
+            print(f"  {name:<26} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+                  f"p99 {r['p99_ms']:>9.2f} ms  {r['ops_per_sec']:>9,.1f} ops/s")
+    finally:
+        service.close()
+    return results
+
+
+def run_protocols(scale, args):
+    """
+    Time the hot write path under each connector protocol and statement
+    mode on one scale's database, reporting each against the pure-Python
+    text protocol (the old default)
+    """
+    names = args.only or PROTOCOL_OPERATIONS
+    results = {}
+    for label, use_pure, prepared in PROTOCOLS:
+        if not use_pure and not mysql.connector.HAVE_CEXT:
+            print(f"  {label:<24} skipped: the C extension is not installed")
+            continue
+        backend = MySQLBackend(dict(DB_CONFIG, database=database_name(scale), use_pure=use_pure))
+        service = InventoryService(backend=backend, statements=STATEMENTS.variant(enabled=prepared))
+        rng = random.Random(7)
+        try:
+            first, last = product_range(service)
+            selected = operations(service, first, last, rng)
+            results[label] = {name: measure(selected[name], args.iterations, args.warmup, args.max_seconds)
+                              for name in names}
+        finally:
+            service.close()
+
+    reference = results.get(PROTOCOLS[0][0])
+    for name in names:
+        print(f"  {name}:")
+        for label, timings in results.items():
+            r = timings[name]
+            saved = reference[name]["p50_ms"] - r["p50_ms"] if reference else 0.0
+            share = saved / reference[name]["p50_ms"] if reference and reference[name]["p50_ms"] else 0.0
+            print(f"    {label:<24} p50 {r['p50_ms']:>8.3f} ms  p95 {r['p95_ms']:>8.3f} ms  "
+                  f"{r['ops_per_sec']:>9,.1f} ops/s  saves {saved:>7.3f} ms/call ({share:.0%})")
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD, noise_floor=NOISE_FLOOR_MS):
+    """Return a list of regression messages for operations measured in both runs"""
+    regressions = []
+    for scale, operations_run in results["scales"].items():
+        for name, current in operations_run.items():
+            previous = baseline.get("scales", {}).get(scale, {}).get(name)
+            if not previous:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                before, after = previous[metric], current[metric]
+                if after > before * (1 + threshold) and after - before > noise_floor:
+                    regressions.append(
+                        f"{scale} {name}: {metric} {before:.2f} -> {after:.2f} ms "
+                        f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)"
+                    )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every inventory operation at several data scales")
+    parser.add_argument("--scales", default="1k",
+                        help=f"Comma-separated scales to run ({', '.join(SCALES)})")
+    parser.add_argument("--only", type=lambda value: value.split(","),
+                        help="Comma-separated operations to run (default: all)")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls per operation first")
+    parser.add_argument("--max-seconds", type=float, default=30.0,
+                        help="Stop timing an operation after this long (at least 5 calls)")
+    parser.add_argument("--reseed", action="store_true", help="Drop and reseed the benchmark databases")
+    parser.add_argument("--method", choices=["insert", "infile"], default="insert", help="Seeding method")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql",
+                        help="Storage to benchmark (sqlite needs no server)")
+    parser.add_argument("--protocols", action="store_true",
+                        help="Compare the pure-Python and C extension connectors, with and without "
+                             "prepared statements, on the write path")
+    parser.add_argument("--save", help="Write this run's results to a JSON file (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="Compare with a baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed slowdown as a fraction, e.g. 0.2 for 20%%")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip().lower() for scale in args.scales.split(",")]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    if args.backend == "sqlite" and args.method == "infile":
+        parser.error("--method infile needs the mysql backend")
+    if args.backend == "sqlite" and args.protocols:
+        parser.error("--protocols compares MySQL connector configurations")
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "query_cache": QUERY_CACHE_CONFIG['max_entries'] > 0,
+        "scales": {},
+    }
+    try:
+        for scale in scales:
+            prepare_database(scale, args.reseed, args.method, args.backend)
+            print(f"\nScale {scale}:")
+            if args.protocols:
+                results.setdefault("protocols", {})[scale] = run_protocols(scale, args)
+            else:
+                results["scales"][scale] = run_scale(scale, args)
+    except (Error, BenchmarkError) as e:
+        print(f"Benchmark failed: {e}")
+        return 1
+
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"\nResults written to {args.save}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as source:
+        baseline = json.load(source)
+    if baseline.get("backend", "mysql") != results["backend"]:
+        print(f"Warning: the baseline was recorded on the {baseline.get('backend', 'mysql')} backend")
+    if baseline.get("query_cache") != results["query_cache"]:
+        print("Warning: the baseline was recorded with a different query cache setting")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Command-line interface for the Inventory Management System
+Runs single operations without the interactive menu, e.g.
+
+    python app.py txn record --product 5 --qty 3 --type sale
+    python app.py inventory set --product 5 --qty 40
+    python app.py report low-stock --format json
+    python app.py product search "usb cable" --limit 10
+
+and a batch mode that reads one command per line from a file or stdin,
+running them over one connection and committing in groups:
+
+    python app.py batch adjustments.txt --group-size 500
+"""
+
+import argparse
+import csv
+import io
+import json
+import shlex
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from mysql.connector import Error
+
+from render import render
+from service import StockError
+from sharding import ShardError, create_service
+from connection_pool import PoolTimeoutError, is_connection_error
+
+# Failures that end one command without stopping a batch
+COMMAND_ERRORS = (Error, StockError, PoolTimeoutError, ValueError, ShardError)
+
+# Deadlock and lock wait timeout: InnoDB may have rolled back the whole
+# transaction, so the group's savepoints are gone
+TRANSACTION_ABORTED = (1213, 1205)
+
+
+class CommandError(Exception):
+    """Raised for a malformed command line"""
+
+
+class CommandParser(argparse.ArgumentParser):
+    """Argument parser that raises instead of exiting, so batch mode can report bad lines"""
+    def error(self, message):
+        raise CommandError(message)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def parse_cursor(value):
+    """Parse a 'YYYY-MM-DD HH:MM:SS,ID' history cursor"""
+    moment, _, transaction_id = value.rpartition(",")
+    return datetime.strptime(moment.strip(), "%Y-%m-%d %H:%M:%S"), int(transaction_id)
+
+
+def to_json(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def build_parser():
+    parser = CommandParser(prog="app.py", description="Inventory Management System")
+    parser.add_argument("--format", choices=["table", "json", "csv"], default="table",
+                        help="Output format (batch mode always writes JSON lines)")
+    # Lets --format also follow the subcommand, as in 'report low-stock --format json'
+    output = CommandParser(add_help=False)
+    output.add_argument("--format", choices=["table", "json", "csv"], default=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    product = commands.add_parser("product", help="List, search or add products")
+    product_actions = product.add_subparsers(dest="action", required=True)
+    listing = product_actions.add_parser("list", parents=[output])
+    listing.add_argument("--after", type=int, default=0, help="Start after this product ID")
+    listing.add_argument("--limit", type=int, default=100)
+    search = product_actions.add_parser("search", parents=[output],
+                                        help="Find products by name or description, best match first")
+    search.add_argument("text", help="Words or parts of words to look for")
+    search.add_argument("--limit", type=int, default=20)
+    add = product_actions.add_parser("add", parents=[output])
+    add.add_argument("--name", required=True)
+    add.add_argument("--description", default="")
+    add.add_argument("--price", type=Decimal, required=True)
+    add.add_argument("--category", type=int, required=True, help="Category ID")
+    add.add_argument("--qty", type=int, default=0, help="Initial stock")
+    add.add_argument("--sku", help="Stock keeping unit, used to match bulk imports")
+    reorder = product_actions.add_parser("reorder", parents=[output], help="Set a product's reorder point")
+    reorder.add_argument("--product", type=int, required=True)
+    reorder.add_argument("--point", type=int, help="Units below which stock is low (omit for the category's)")
+
+    category = commands.add_parser("category", help="List or add categories")
+    category_actions = category.add_subparsers(dest="action", required=True)
+    category_actions.add_parser("list", parents=[output])
+    add = category_actions.add_parser("add", parents=[output])
+    add.add_argument("--name", required=True)
+    add.add_argument("--description", default="")
+    reorder = category_actions.add_parser("reorder", parents=[output],
+                                          help="Set the reorder point of the category's products")
+    reorder.add_argument("--category", type=int, required=True)
+    reorder.add_argument("--point", type=int, help="Units below which stock is low (omit for the default)")
+
+    inventory = commands.add_parser("inventory", help="View or change stock levels")
+    inventory_actions = inventory.add_subparsers(dest="action", required=True)
+    inventory_actions.add_parser("list", parents=[output])
+    set_stock = inventory_actions.add_parser("set", parents=[output], help="Set an absolute quantity")
+    set_stock.add_argument("--product", type=int, required=True)
+    set_stock.add_argument("--qty", type=int, required=True)
+    adjust = inventory_actions.add_parser("adjust", parents=[output], help="Add (or remove, if negative) units")
+    adjust.add_argument("--product", type=int, required=True)
+    adjust.add_argument("--delta", type=int, required=True)
+    adjust.add_argument("--notes")
+
+    txn = commands.add_parser("txn", help="Record or list transactions")
+    txn_actions = txn.add_subparsers(dest="action", required=True)
+    record = txn_actions.add_parser("record", parents=[output])
+    record.add_argument("--product", type=int, required=True)
+    record.add_argument("--qty", type=int, required=True)
+    record.add_argument("--type", choices=["sale", "restock"], required=True)
+    record.add_argument("--notes")
+    history = txn_actions.add_parser("list", parents=[output])
+    history.add_argument("--product", type=int)
+    history.add_argument("--type", choices=["sale", "restock"])
+    history.add_argument("--from", dest="start", type=parse_date, help="YYYY-MM-DD")
+    history.add_argument("--to", dest="end", type=parse_date, help="YYYY-MM-DD, inclusive")
+    history.add_argument("--before", type=parse_cursor,
+                         help="Only rows older than 'YYYY-MM-DD HH:MM:SS,ID'")
+    history.add_argument("--limit", type=int, default=50)
+
+    alert = commands.add_parser("alerts", help="List or acknowledge low-stock alerts")
+    alert_actions = alert.add_subparsers(dest="action", required=True)
+    pending = alert_actions.add_parser("list", parents=[output], help="Undelivered alerts, oldest first")
+    pending.add_argument("--after", type=int, default=0, help="Start after this alert ID")
+    pending.add_argument("--limit", type=int, default=100)
+    ack = alert_actions.add_parser("ack", parents=[output], help="Mark alerts delivered")
+    ack.add_argument("--up-to", dest="up_to", type=int, required=True, help="Last alert ID to acknowledge")
+
+    report = commands.add_parser("report", parents=[output], help="Run a report")
+    report.add_argument("name", choices=["low-stock", "high-value", "sales", "categories"])
+    report.add_argument("--days", type=int, default=30, help="Sales window in days")
+    report.add_argument("--from", dest="start", type=parse_date, help="Sales from YYYY-MM-DD")
+    report.add_argument("--to", dest="end", type=parse_date, help="Sales to YYYY-MM-DD, inclusive")
+
+    batch = commands.add_parser("batch", help="Run commands read from a file or stdin")
+    batch.add_argument("file", nargs="?", default="-", help="Command file ('-' for stdin)")
+    batch.add_argument("--group-size", type=int, default=500,
+                       help="Commands committed together in one transaction")
+    return parser
+
+
+def command_label(args):
+    """Name a command for the query stats, e.g. 'txn record'"""
+    detail = args.name if args.command == "report" else getattr(args, "action", None)
+    return f"{args.command} {detail}" if detail else args.command
+
+
+def run_command(ims, args):
+    """Run one parsed command and return its result (a row dict or a list of rows)"""
+    if args.command == "product":
+        if args.action == "list":
+            return ims.list_products(args.after, args.limit)
+        if args.action == "search":
+            return ims.search_products(args.text, args.limit)
+        if args.action == "reorder":
+            ims.set_reorder_point(args.product, args.point)
+            return {"product_id": args.product, "reorder_point": args.point}
+        product_id = ims.create_product(args.name, args.description, args.price,
+                                        args.category, args.qty, args.sku)
+        return {"product_id": product_id}
+
+    if args.command == "category":
+        if args.action == "list":
+            return ims.list_categories()
+        if args.action == "reorder":
+            ims.set_category_reorder_point(args.category, args.point)
+            return {"category_id": args.category, "reorder_point": args.point}
+        return {"category_id": ims.create_category(args.name, args.description)}
+
+    if args.command == "inventory":
+        if args.action == "list":
+            return ims.inventory_levels()
+        if args.action == "set":
+            return {"product_id": args.product, "quantity": ims.set_stock(args.product, args.qty)}
+        quantity = ims.adjust_stock(args.product, args.delta, notes=args.notes)
+        return {"product_id": args.product, "quantity": quantity}
+
+    if args.command == "txn":
+        if args.action == "record":
+            quantity = ims.record_transaction(args.product, args.qty, args.type, args.notes)
+            return {"product_id": args.product, "quantity": quantity}
+        end = args.end + timedelta(days=1) if args.end else None
+        page = ims.query_transactions(args.product, args.type, args.start, end,
+                                      before=args.before, limit=args.limit)
+        return page.rows
+
+    if args.command == "alerts":
+        if args.action == "list":
+            return ims.pending_alerts(args.after, args.limit)
+        return {"acknowledged": ims.acknowledge_alerts(args.up_to)}
+
+    if args.command == "report":
+        if args.name == "low-stock":
+            return ims.low_stock_items()
+        if args.name == "high-value":
+            return ims.high_value_items()
+        if args.name == "categories":
+            return ims.category_summary()
+        today = datetime.now().date()
+        start = args.start.date() if args.start else today - timedelta(days=args.days)
+        end = args.end.date() + timedelta(days=1) if args.end else today + timedelta(days=1)
+        return ims.sales_summary(start, end)
+
+    raise CommandError(f"Unknown command: {args.command}")
+
+
+def emit(result, fmt, out=sys.stdout):
+    """Write a command result in the requested format"""
+    rows = result if isinstance(result, list) else [result]
+
+    if fmt == "json":
+        json.dump(result, out, default=to_json, indent=2)
+        out.write("\n")
+    elif fmt == "csv":
+        if rows:
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    elif rows:
+        headers = list(rows[0])
+        render(([row[h] for h in headers] for row in rows), headers, out=out, fmt="table")
+    else:
+        print("No rows.", file=out)
+
+
+def read_commands(source):
+    """Yield (line number, text) for every non-blank, non-comment line"""
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield number, line
+
+
+def parse_batch_line(parser, line):
+    """
+    Parse one batch line. -h/--help would print usage into the JSON output
+    and exit the batch, so it is reported as a bad line instead.
+    """
+    try:
+        with redirect_stdout(io.StringIO()):
+            args = parser.parse_args(shlex.split(line))
+    except SystemExit:
+        raise CommandError("help is not available in batch mode")
+    if args.command == "batch":
+        raise CommandError("batch cannot be nested")
+    return args
+
+
+def run_batch(ims, parser, commands, group_size, out=sys.stdout):
+    """
+    Run commands in groups of `group_size`, each group in one transaction on
+    one connection. Every command runs under a savepoint, so a failing line
+    is undone and reported without discarding the rest of its group. Writes
+    one JSON object per command once its group has committed; returns the
+    number of failed commands.
+    """
+    commands = iter(commands)
+    failed = 0
+    total = 0
+    started = time.monotonic()
+    pending = list(_take(commands, group_size))
+
+    while pending:
+        results = []
+        try:
+            with ims.transaction():
+                for number, line in pending:
+                    record = {"line": number, "command": line}
+                    try:
+                        args = parse_batch_line(parser, line)
+                        with ims.savepoint(), ims.operation(command_label(args)):
+                            record["result"] = run_command(ims, args)
+                        record["status"] = "ok"
+                    except (CommandError,) + COMMAND_ERRORS as e:
+                        if isinstance(e, Error) and (is_connection_error(e) or e.errno in TRANSACTION_ABORTED):
+                            raise
+                        record["status"] = "error"
+                        record["error"] = str(e)
+                    results.append(record)
+        except COMMAND_ERRORS as e:
+            # The commit, the connection or the transaction failed: nothing in
+            # the group stuck, including the command that was running
+            for number, line in pending[len(results):]:
+                results.append({"line": number, "command": line, "status": "error",
+                                "error": f"Group rolled back: {e}"})
+            for record in results:
+                if record["status"] == "ok":
+                    record["status"] = "error"
+                    record["error"] = f"Group rolled back: {e}"
+                    record.pop("result", None)
+
+        for record in results:
+            failed += record["status"] == "error"
+            out.write(json.dumps(record, default=to_json) + "\n")
+        out.flush()
+        total += len(results)
+        pending = list(_take(commands, group_size))
+
+    elapsed = time.monotonic() - started
+    print(f"Ran {total} commands, {failed} failed, in {elapsed:.2f}s "
+          f"({total / max(elapsed, 1e-9):,.0f} commands/s)", file=sys.stderr)
+    return failed
+
+
+def _take(iterator, count):
+    """Yield up to `count` items from an iterator"""
+    for _ in range(count):
+        try:
+            yield next(iterator)
+        except StopIteration:
+            return
+
+
+def main(argv=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as e:
+        parser.print_usage(sys.stderr)
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    ims = create_service()
+    try:
+        if args.command == "batch":
+            if args.group_size < 1:
+                print("Error: --group-size must be at least 1", file=sys.stderr)
+                return 2
+            source = sys.stdin if args.file == "-" else open(args.file)
+            try:
+                failed = run_batch(ims, parser, read_commands(source), args.group_size)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            return 1 if failed else 0
+
+        try:
+            # Errors raise inside a transaction instead of printing, which
+            # keeps machine-readable output clean
+            with ims.transaction(), ims.operation(command_label(args)):
+                result = run_command(ims, args)
+        except COMMAND_ERRORS as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+
+        emit(result, args.format)
+        return 0
+    finally:
+        ims.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
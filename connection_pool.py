@@ -0,0 +1,203 @@
+"""
+Connection pool for the Inventory Management System
+Keeps a bounded set of MySQL connections that can be shared by several
+threads, so each operation borrows an already-authenticated connection
+instead of opening a new one or queueing behind a single socket.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, health_check_interval=30.0):
+        """
+        connect: callable returning a new DB-API connection
+        size: maximum number of open connections
+        timeout: seconds to wait for a free connection before giving up
+        health_check_interval: idle seconds after which a connection is pinged
+                               before being handed out again
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        # LIFO keeps the most recently used connections warm and lets the
+        # rest go idle long enough to be health-checked
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self._stats = {
+            'created': 0,
+            'checkouts': 0,
+            'in_use': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+
+    def _create(self):
+        """Open a new connection, keeping the open count accurate on failure"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        """Ping connections that have been idle longer than the check interval"""
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot in the pool"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+        with self._lock:
+            self._open -= 1
+            self._stats['discarded'] += 1
+
+    def get_connection(self):
+        """Check out a connection, waiting up to the pool timeout for one to free up"""
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed")
+
+        deadline = time.monotonic() + self.timeout
+        waited = False
+
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+
+            if conn is None:
+                with self._lock:
+                    can_create = self._open < self.size
+                    if can_create:
+                        self._open += 1
+
+                if can_create:
+                    conn = self._create()
+                    idle_since = time.monotonic()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if not waited:
+                        waited = True
+                        with self._lock:
+                            self._stats['waits'] += 1
+
+                    if remaining <= 0:
+                        with self._lock:
+                            self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.size})"
+                        )
+
+                    started = time.monotonic()
+                    try:
+                        conn, idle_since = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+                    finally:
+                        with self._lock:
+                            self._stats['wait_time'] += time.monotonic() - started
+
+            if not self._is_healthy(conn, idle_since):
+                with self._lock:
+                    self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._stats['checkouts'] += 1
+                self._stats['in_use'] += 1
+            return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool, dropping it if it is no longer usable"""
+        with self._lock:
+            self._stats['in_use'] -= 1
+
+        if broken or self._closed:
+            self._discard(conn)
+            return
+
+        # Never hand the next borrower someone else's open transaction
+        try:
+            if getattr(conn, 'in_transaction', False):
+                conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.get_connection()
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            broken = is_connection_error(e)
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def get_stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = self._open
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        return stats
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+def is_connection_error(error):
+    """Return True if the error means the connection itself is unusable"""
+    try:
+        from mysql.connector import errors
+    except ImportError:
+        return False
+
+    return isinstance(error, (errors.InterfaceError, errors.OperationalError))
@@ -0,0 +1,232 @@
+"""
+Synthetic data generator for the Inventory Management System
+Seeds categories, products, inventory and a skewed transaction history at
+production scale so performance can be reproduced and benchmarked locally.
+Rows are produced lazily and loaded in chunks, one commit per chunk, either
+with multi-row INSERTs or LOAD DATA LOCAL INFILE.
+"""
+
+import bisect
+import csv
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+ADJECTIVES = ["Classic", "Compact", "Deluxe", "Eco", "Essential", "Portable", "Premium",
+              "Pro", "Smart", "Ultra", "Vintage", "Wireless"]
+NOUNS = ["Backpack", "Blender", "Camera", "Chair", "Desk Lamp", "Headphones", "Jacket",
+         "Kettle", "Keyboard", "Monitor", "Notebook", "Sneakers", "Speaker", "Watch"]
+SALE_NOTES = ["POS sale", "Online order", "Wholesale order", None, None]
+RESTOCK_NOTES = ["Supplier delivery", "Weekly replenishment", "Returned stock", None]
+
+# Share of transactions that are sales; the rest are restocks
+SALE_RATIO = 0.85
+
+
+class ZipfSampler:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** skew"""
+    def __init__(self, n, skew, rng):
+        self.rng = rng
+        total = 0.0
+        self.cumulative = []
+        for rank in range(n):
+            total += 1.0 / (rank + 1) ** skew
+            self.cumulative.append(total)
+        self.total = total
+
+    def sample(self):
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.total)
+
+
+def scatter(rank, count, first_id):
+    """
+    Map a popularity rank onto an id so popular rows are spread through the
+    table rather than clustered at its start. 2654435761 is coprime with any
+    count that isn't a multiple of it, which makes the mapping a permutation.
+    """
+    return first_id + (rank * 2654435761) % count
+
+
+def generate_categories(count, first_id):
+    """Yield (category_id, name, description) rows"""
+    for i in range(count):
+        category_id = first_id + i
+        yield (category_id, f"Category {category_id}", f"Generated category number {category_id}")
+
+
+def generate_products(count, first_id, category_ids, rng, skew=1.1):
+    """Yield (product_id, name, description, price, category_id) rows with skewed category sizes"""
+    categories = ZipfSampler(len(category_ids), skew, rng)
+    for i in range(count):
+        product_id = first_id + i
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}"
+        description = f"Generated product {product_id}"
+        # Log-normal prices: mostly cheap items with a long expensive tail
+        price = round(min(rng.lognormvariate(3.5, 1.0), 99999999.0), 2)
+        category_id = category_ids[scatter(categories.sample(), len(category_ids), 0)]
+        yield (product_id, name, description, price, category_id)
+
+
+def generate_inventory(product_ids, rng):
+    """Yield (product_id, quantity) rows; roughly 5% of products are low on stock"""
+    for product_id in product_ids:
+        if rng.random() < 0.05:
+            quantity = rng.randint(0, 9)
+        else:
+            quantity = int(rng.expovariate(1 / 150)) + 10
+        yield (product_id, quantity)
+
+
+def generate_transactions(count, first_product_id, product_count, days, rng,
+                          skew=1.1, end=None):
+    """
+    Yield (product_id, quantity, transaction_type, transaction_date, notes) rows
+    in chronological order over the last `days` days. Product popularity
+    follows a Zipf distribution so a few best-sellers dominate the history.
+    """
+    products = ZipfSampler(product_count, skew, rng)
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    span = (end - start).total_seconds()
+    step = span / max(count, 1)
+
+    for i in range(count):
+        product_id = scatter(products.sample(), product_count, first_product_id)
+        moment = start + timedelta(seconds=int(i * step + rng.random() * step))
+        if rng.random() < SALE_RATIO:
+            transaction_type = "sale"
+            quantity = 1 + int(rng.expovariate(0.7))
+            notes = rng.choice(SALE_NOTES)
+        else:
+            transaction_type = "restock"
+            quantity = rng.randint(10, 200)
+            notes = rng.choice(RESTOCK_NOTES)
+        yield (product_id, quantity, transaction_type, moment.strftime("%Y-%m-%d %H:%M:%S"), notes)
+
+
+def chunked(rows, size):
+    """Split an iterable into lists of at most `size` rows"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def report_progress(table, loaded, total, started, final=False):
+    """Print a single updating progress line with throughput"""
+    elapsed = max(time.monotonic() - started, 1e-9)
+    percent = 100.0 * loaded / total if total else 100.0
+    line = f"\r  {table}: {loaded:,}/{total:,} ({percent:.1f}%) {loaded / elapsed:,.0f} rows/s"
+    sys.stdout.write(line + ("\n" if final else ""))
+    sys.stdout.flush()
+
+
+def insert_chunk(cursor, table, columns, chunk):
+    """Load one chunk as a multi-row INSERT"""
+    placeholders = ", ".join(["%s"] * len(columns))
+    # executemany rewrites a simple INSERT ... VALUES into one multi-row statement
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        chunk
+    )
+
+
+def infile_chunk(cursor, table, columns, chunk):
+    """Load one chunk through LOAD DATA LOCAL INFILE (needs local_infile on both ends)"""
+    with tempfile.NamedTemporaryFile("w", newline="", suffix=".csv", delete=False) as handle:
+        writer = csv.writer(handle, lineterminator="\n")
+        for row in chunk:
+            writer.writerow(["\\N" if value is None else value for value in row])
+        path = handle.name
+
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+            (path,)
+        )
+    finally:
+        os.unlink(path)
+
+
+def bulk_load(connection, table, columns, rows, total, batch_size=5000, method="insert"):
+    """Load rows in batches, committing after each one. Returns the number of rows loaded."""
+    load_chunk = infile_chunk if method == "infile" else insert_chunk
+    cursor = connection.cursor()
+    loaded = 0
+    started = time.monotonic()
+
+    try:
+        for chunk in chunked(rows, batch_size):
+            load_chunk(cursor, table, columns, chunk)
+            connection.commit()
+            loaded += len(chunk)
+            report_progress(table, loaded, total, started)
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    report_progress(table, loaded, total, started, final=True)
+    return loaded
+
+
+def next_id(connection, table, column):
+    """Return the first unused id so generated rows never collide with existing ones"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def seed(connection, categories=20, products=1000, transactions=10000, days=365,
+         batch_size=5000, method="insert", random_seed=None, skew=1.1):
+    """Generate and bulk-load a complete synthetic dataset"""
+    rng = random.Random(random_seed)
+    started = time.monotonic()
+
+    cursor = connection.cursor()
+    # The generated rows are consistent by construction; skipping per-row
+    # constraint checks roughly doubles load speed on large tables
+    cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+    cursor.close()
+
+    try:
+        first_category = next_id(connection, "categories", "category_id")
+        first_product = next_id(connection, "products", "product_id")
+        category_ids = list(range(first_category, first_category + categories))
+
+        total = bulk_load(connection, "categories", ("category_id", "name", "description"),
+                          generate_categories(categories, first_category), categories,
+                          batch_size, method)
+        total += bulk_load(connection, "products",
+                           ("product_id", "name", "description", "price", "category_id"),
+                           generate_products(products, first_product, category_ids, rng, skew),
+                           products, batch_size, method)
+        total += bulk_load(connection, "inventory", ("product_id", "quantity"),
+                           generate_inventory(range(first_product, first_product + products), rng),
+                           products, batch_size, method)
+        total += bulk_load(connection, "transactions",
+                           ("product_id", "quantity", "transaction_type", "transaction_date", "notes"),
+                           generate_transactions(transactions, first_product, products, days, rng, skew),
+                           transactions, batch_size, method)
+    finally:
+        cursor = connection.cursor()
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cursor.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Loaded {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    return total
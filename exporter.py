@@ -0,0 +1,374 @@
+"""
+Data export for the Inventory Management System
+Streams the transaction history (optionally limited to a date range) or a
+snapshot of current inventory to CSV or JSONL, gzip-compressed when the
+output name ends in .gz.
+
+Usage:
+    python exporter.py transactions history.csv.gz [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+    python exporter.py transactions history.jsonl --resume
+    python exporter.py inventory snapshot.csv
+    python exporter.py archive old.csv --from 2022-01-01 --to 2022-06-30 [--archive-dir DIR]
+
+Rows are read with an unbuffered cursor and fetchmany, and transactions
+are exported in transaction_id order one keyset chunk per query, so
+memory stays flat however long the history is and no query holds a
+snapshot for the whole run. After every chunk the output is flushed and
+a checkpoint (OUTPUT.checkpoint) records the last exported
+transaction_id; --resume continues from there after an interruption.
+
+The archive dataset reads months that partitions.py has moved out of the
+database into compressed archive files, in the same formats.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+from cli import to_json
+
+# Transactions per keyset query; each chunk is checkpointed
+EXPORT_CHUNK_ROWS = 50000
+
+# Rows pulled from the server per round trip within a chunk
+EXPORT_FETCH_ROWS = 1000
+
+# gzip level 6 is several times faster than the default 9 for a few percent more size
+EXPORT_COMPRESS_LEVEL = 6
+
+TRANSACTION_COLUMNS = ["transaction_id", "product_id", "transaction_type", "quantity",
+                       "transaction_date", "notes"]
+
+INVENTORY_COLUMNS = ["product_id", "sku", "name", "category", "price", "quantity", "total_value"]
+
+# Bounds the primary-key range once, through idx_transactions_date, so each
+# chunk below is a short primary-key range scan even for a narrow date range
+TRANSACTION_ID_RANGE_QUERY = """
+SELECT MIN(transaction_id) AS first_id, MAX(transaction_id) AS last_id
+FROM transactions
+{where}
+"""
+
+EXPORT_TRANSACTIONS_QUERY = """
+SELECT transaction_id, product_id, transaction_type, quantity, transaction_date, notes
+FROM transactions
+WHERE transaction_id > %s AND transaction_id <= %s{dates}
+ORDER BY transaction_id
+LIMIT %s
+"""
+
+EXPORT_INVENTORY_QUERY = """
+SELECT p.product_id, p.sku, p.name, c.name AS category, p.price, i.quantity,
+       p.price * i.quantity AS total_value
+FROM inventory i
+JOIN products p ON i.product_id = p.product_id
+LEFT JOIN categories c ON p.category_id = c.category_id
+ORDER BY i.product_id
+"""
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be started or resumed"""
+
+
+def date_filter(start, end):
+    """Return (SQL conditions, params) restricting transaction_date to [start, end)"""
+    conditions, params = [], []
+    if start:
+        conditions.append("transaction_date >= %s")
+        params.append(start)
+    if end:
+        conditions.append("transaction_date < %s")
+        params.append(end)
+    return conditions, params
+
+
+def encode_rows(rows, fmt, columns):
+    """Render a batch of row dicts as CSV or JSONL text"""
+    if fmt == "jsonl":
+        return "".join(json.dumps({c: row[c] for c in columns}, default=to_json) + "\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([row[c] for c in columns] for row in rows)
+    return buffer.getvalue()
+
+
+class ChunkWriter:
+    """
+    Appends chunks to an export file. With compression every chunk is its
+    own gzip member, so the file is valid (and resumable) at every chunk
+    boundary; gzip and zcat read multi-member files as one stream.
+    """
+    def __init__(self, path, fmt, columns, compress, offset=0):
+        self.fmt = fmt
+        self.columns = columns
+        self.compress = compress
+        if offset:
+            # Drop anything written after the last checkpoint
+            self.raw = open(path, "r+b")
+            self.raw.truncate(offset)
+            self.raw.seek(offset)
+        else:
+            self.raw = open(path, "wb")
+        self.member = None
+
+    def begin(self):
+        if self.compress:
+            self.member = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=EXPORT_COMPRESS_LEVEL)
+
+    def write_header(self):
+        if self.fmt == "csv":
+            self.write_text(",".join(self.columns) + "\r\n")
+
+    def write_rows(self, rows):
+        self.write_text(encode_rows(rows, self.fmt, self.columns))
+
+    def write_text(self, text):
+        (self.member or self.raw).write(text.encode("utf-8"))
+
+    def end(self):
+        """Finish the chunk and make it durable; returns the file size to checkpoint"""
+        if self.member:
+            self.member.close()
+            self.member = None
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        return self.raw.tell()
+
+    def close(self):
+        if self.member:
+            self.member.close()
+        self.raw.close()
+
+
+def checkpoint_path(path):
+    return path + ".checkpoint"
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically so a crash never leaves half of one"""
+    temporary = checkpoint_path(path) + ".tmp"
+    with open(temporary, "w") as out:
+        json.dump(state, out)
+    os.replace(temporary, checkpoint_path(path))
+
+
+def load_checkpoint(path):
+    try:
+        with open(checkpoint_path(path)) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+def report_progress(state, exported, started):
+    """Print a single updating progress line with the position in the id range"""
+    elapsed = max(time.monotonic() - started, 1e-9)
+    sys.stdout.write(f"\r  transactions: {state['rows']:,} rows, through id {state['last_id']:,} "
+                     f"of {state['max_id']:,} ({exported / elapsed:,.0f} rows/s)")
+    sys.stdout.flush()
+
+
+def export_transactions(connection, path, fmt="csv", compress=False, start=None, end=None,
+                        resume=False, chunk_rows=EXPORT_CHUNK_ROWS, fetch_rows=EXPORT_FETCH_ROWS):
+    """
+    Export transactions in [start, end) to path. Returns the number of rows
+    in the file, counting rows from earlier runs when resuming.
+    """
+    dates = [start.isoformat(sep=" ") if start else None, end.isoformat(sep=" ") if end else None]
+    conditions, date_params = date_filter(start, end)
+    cursor = connection.cursor(dictionary=True)
+
+    try:
+        state = load_checkpoint(path) if resume else None
+        if resume and state is None:
+            raise ExportError(f"No checkpoint for {path}; run without --resume to start a new export")
+        if state and (state["dates"], state["format"], state["compress"]) != (dates, fmt, compress):
+            raise ExportError("The checkpoint was written with a different date range or format")
+
+        if state is None:
+            where = "WHERE " + " AND ".join(conditions) if conditions else ""
+            cursor.execute(TRANSACTION_ID_RANGE_QUERY.format(where=where), date_params)
+            bounds = cursor.fetchall()[0]
+            connection.commit()
+            # Rows added after the export starts are left for the next export
+            state = {"dates": dates, "format": fmt, "compress": compress,
+                     "last_id": (bounds["first_id"] or 1) - 1, "max_id": bounds["last_id"] or 0,
+                     "rows": 0, "bytes": 0}
+
+        writer = ChunkWriter(path, fmt, TRANSACTION_COLUMNS, compress, state["bytes"])
+        query = EXPORT_TRANSACTIONS_QUERY.format(dates="".join(f" AND {c}" for c in conditions))
+        started = time.monotonic()
+        exported = 0
+        try:
+            while state["last_id"] < state["max_id"]:
+                writer.begin()
+                if state["bytes"] == 0:
+                    writer.write_header()
+                cursor.execute(query, [state["last_id"], state["max_id"], *date_params, chunk_rows])
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(fetch_rows)
+                    if not rows:
+                        break
+                    writer.write_rows(rows)
+                    count += len(rows)
+                    state["last_id"] = rows[-1]["transaction_id"]
+                # Ends the chunk's read view so no snapshot is held across chunks
+                connection.commit()
+
+                if count < chunk_rows:
+                    state["last_id"] = state["max_id"]
+                state["rows"] += count
+                state["bytes"] = writer.end()
+                save_checkpoint(path, state)
+
+                exported += count
+                report_progress(state, exported, started)
+        finally:
+            writer.close()
+
+        if state["bytes"] == 0:
+            # Nothing matched: still produce a file with the CSV header
+            writer = ChunkWriter(path, fmt, TRANSACTION_COLUMNS, compress)
+            writer.begin()
+            writer.write_header()
+            writer.end()
+            writer.close()
+    finally:
+        cursor.close()
+
+    if exported:
+        sys.stdout.write("\n")
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    return state["rows"]
+
+
+def export_inventory(connection, path, fmt="csv", compress=False, fetch_rows=EXPORT_FETCH_ROWS):
+    """Export current stock for every product from one consistent snapshot; returns rows written"""
+    cursor = connection.cursor(dictionary=True)
+    writer = ChunkWriter(path, fmt, INVENTORY_COLUMNS, compress)
+    rows_written = 0
+    try:
+        connection.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor.execute(EXPORT_INVENTORY_QUERY)
+        writer.begin()
+        writer.write_header()
+        while True:
+            rows = cursor.fetchmany(fetch_rows)
+            if not rows:
+                break
+            writer.write_rows(rows)
+            rows_written += len(rows)
+        connection.commit()
+        writer.end()
+    finally:
+        writer.close()
+        cursor.close()
+    return rows_written
+
+
+def export_archive(directory, path, fmt="csv", compress=False, start=None, end=None,
+                   chunk_rows=EXPORT_FETCH_ROWS):
+    """Export archived transactions dated in [start, end) to path; returns rows written"""
+    from partitions import iter_archived_transactions
+
+    writer = ChunkWriter(path, fmt, TRANSACTION_COLUMNS, compress)
+    rows_written = 0
+    chunk = []
+    try:
+        writer.begin()
+        writer.write_header()
+        for row in iter_archived_transactions(directory, start, end):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                writer.write_rows(chunk)
+                rows_written += len(chunk)
+                chunk = []
+        writer.write_rows(chunk)
+        rows_written += len(chunk)
+        writer.end()
+    finally:
+        writer.close()
+    return rows_written
+
+
+def output_format(path, requested):
+    """Return (format, compress) for an output path, e.g. history.jsonl.gz -> (jsonl, True)"""
+    compress = path.endswith(".gz")
+    base = path[:-3] if compress else path
+    return requested or ("jsonl" if base.endswith((".jsonl", ".ndjson", ".json")) else "csv"), compress
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export transactions or an inventory snapshot")
+    parser.add_argument("dataset", choices=["transactions", "inventory", "archive"])
+    parser.add_argument("output", help="Output file; a .gz suffix compresses it")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Output format (default: from the file extension)")
+    parser.add_argument("--from", dest="start", type=parse_date, help="Transactions from YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=parse_date, help="Transactions to YYYY-MM-DD, inclusive")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted transactions export from its checkpoint")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS,
+                        help="Transactions per query and checkpoint")
+    parser.add_argument("--archive-dir", help="Directory of archived months (default: ARCHIVE_DIR)")
+    args = parser.parse_args(argv)
+
+    if args.chunk_rows < 1:
+        parser.error("--chunk-rows must be at least 1")
+    fmt, compress = output_format(args.output, args.format)
+    end = args.end + timedelta(days=1) if args.end else None
+    started = time.monotonic()
+
+    if args.dataset == "archive":
+        from partitions import ARCHIVE_DIR
+
+        rows = export_archive(args.archive_dir or ARCHIVE_DIR, args.output, fmt, compress, args.start, end)
+        print(f"Exported {rows:,} archived transactions to {args.output} "
+              f"in {time.monotonic() - started:.1f}s")
+        return 0
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.dataset == "transactions":
+            rows = export_transactions(conn, args.output, fmt, compress, args.start, end,
+                                       args.resume, args.chunk_rows)
+        else:
+            rows = export_inventory(conn, args.output, fmt, compress)
+    except (Error, ExportError) as e:
+        print(f"\nExport stopped: {e}")
+        if args.dataset == "transactions" and os.path.exists(checkpoint_path(args.output)):
+            print("Run again with --resume to continue from the last checkpoint.")
+        return 1
+    finally:
+        conn.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Exported {rows:,} {args.dataset} rows to {args.output} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""
+HTTP/JSON API for the Inventory Management System
+Serves the service layer over HTTP/1.1 with keep-alive, so other programs
+can drive the inventory without the menu or one process per command.
+
+Usage:
+    python http_api.py [--host 127.0.0.1] [--port 8080] [--concurrency N]
+
+Endpoints:
+    GET    /products?after=ID&limit=N     POST /products
+    GET    /products/search?q=TEXT&limit=N
+    GET    /products/ID                   PUT  /products/ID    DELETE /products/ID
+    GET    /categories                    POST /categories
+    GET    /inventory                     PUT  /inventory/ID   POST /inventory/ID/adjust
+    GET    /transactions?product_id=&type=&from=&to=&before=&after=&limit=
+    POST   /transactions                  POST /ingest
+    GET    /reports/low-stock | high-value | categories | sales?days=N&from=&to=
+    GET    /metrics                       GET  /health
+
+The MySQL driver is blocking, so the event loop only parses requests and
+writes responses; each database call runs on a worker thread. A semaphore
+caps the calls in flight at the pool size, so workers never queue inside
+the pool, and requests that cannot get a slot in time get a 503.
+
+POST /ingest takes the same body as POST /transactions but goes through the
+ingest pipeline: it holds no worker thread while the event waits for its
+batch, answers once the batch has committed, and gets a 503 at once when
+the pipeline's queue is full.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from mysql.connector import Error
+
+from cli import parse_cursor, to_json
+from connection_pool import PoolTimeoutError
+from ingest import IngestFullError, IngestPipeline
+from service import POOL_CONFIG, StockError
+from sharding import ShardError, create_service
+
+HTTP_CONFIG = {
+    'host': os.getenv('HTTP_HOST', '127.0.0.1'),
+    'port': int(os.getenv('HTTP_PORT', '8080')),
+    # Database calls in flight; defaults to the connection pool size
+    'concurrency': int(os.getenv('HTTP_CONCURRENCY', str(POOL_CONFIG['size']))),
+    # Seconds a request may wait for a free slot before getting a 503
+    'queue_timeout': float(os.getenv('HTTP_QUEUE_TIMEOUT', '5')),
+    # Seconds an idle keep-alive connection is held open
+    'idle_timeout': float(os.getenv('HTTP_IDLE_TIMEOUT', '15')),
+}
+
+MAX_BODY_BYTES = 1024 * 1024
+
+# Latency samples kept per route for the percentiles in /metrics
+LATENCY_SAMPLES = 2048
+
+
+class HTTPError(Exception):
+    """Raised by handlers to answer with an error status"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """Per-route request counts and latency percentiles from a bounded reservoir"""
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = samples
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, error=False):
+        with self._lock:
+            stats = self._routes.setdefault(route, {'count': 0, 'errors': 0, 'max': 0.0, 'samples': []})
+            stats['count'] += 1
+            stats['errors'] += error
+            stats['max'] = max(stats['max'], seconds)
+            samples = stats['samples']
+            if len(samples) < self.samples:
+                samples.append(seconds)
+            else:
+                # Reservoir sampling keeps a uniform sample of every request seen
+                slot = random.randrange(stats['count'])
+                if slot < self.samples:
+                    samples[slot] = seconds
+
+    def snapshot(self):
+        """Return {route: counts and p50/p95/p99/max latency in milliseconds}"""
+        with self._lock:
+            routes = {route: dict(stats, samples=sorted(stats['samples']))
+                      for route, stats in self._routes.items()}
+
+        report = {}
+        for route, stats in sorted(routes.items()):
+            samples = stats['samples']
+            report[route] = {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'p50_ms': percentile(samples, 0.50) * 1000,
+                'p95_ms': percentile(samples, 0.95) * 1000,
+                'p99_ms': percentile(samples, 0.99) * 1000,
+                'max_ms': stats['max'] * 1000,
+            }
+        return report
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+def int_arg(query, name, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be an integer")
+
+
+def date_arg(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return datetime.strptime(values[0], "%Y-%m-%d")
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be a YYYY-MM-DD date")
+
+
+def cursor_arg(query, name):
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return parse_cursor(values[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be a 'YYYY-MM-DD HH:MM:SS,ID' cursor")
+
+
+def field(body, name, kind, required=True, default=None):
+    """Read and convert a JSON body field, answering 400 if it is missing or malformed"""
+    if name not in body or body[name] is None:
+        if required:
+            raise HTTPError(400, f"'{name}' is required")
+        return default
+    value = body[name]
+    try:
+        if kind is int and (isinstance(value, bool) or not isinstance(value, (int, str))):
+            raise ValueError
+        return kind(str(value)) if kind is Decimal else kind(value)
+    except (ValueError, TypeError, InvalidOperation):
+        raise HTTPError(400, f"'{name}' must be {'a number' if kind is not str else 'a string'}")
+
+
+def format_cursor(cursor):
+    if cursor is None:
+        return None
+    moment, transaction_id = cursor
+    return f"{moment:%Y-%m-%d %H:%M:%S},{transaction_id}"
+
+
+def found(result, what):
+    """Turn a read that failed (None) into a 500 so callers never see null as data"""
+    if result is None:
+        raise HTTPError(500, f"Could not load {what}")
+    return result
+
+
+# Handlers take (service, match, query, body) and return (status, result)
+
+def list_products(service, match, query, body):
+    limit = min(int_arg(query, 'limit', 100), 1000)
+    return 200, found(service.list_products(int_arg(query, 'after', 0), limit), "products")
+
+
+def search_products(service, match, query, body):
+    text = query.get('q', [""])[0].strip()
+    if not text:
+        raise HTTPError(400, "'q' is required")
+    limit = min(max(int_arg(query, 'limit', 20), 1), 100)
+    return 200, found(service.search_products(text, limit), "search results")
+
+
+def get_product(service, match, query, body):
+    product = service.get_product(int(match['id']))
+    if not product:
+        raise HTTPError(404, "Product not found")
+    return 200, product
+
+
+def create_product(service, match, query, body):
+    product_id = service.create_product(
+        field(body, 'name', str), field(body, 'description', str, False, ""),
+        field(body, 'price', Decimal), field(body, 'category_id', int),
+        field(body, 'quantity', int, False, 0), field(body, 'sku', str, False)
+    )
+    return 201, {'product_id': product_id}
+
+
+def update_product(service, match, query, body):
+    product = service.get_product(int(match['id']))
+    if not product:
+        raise HTTPError(404, "Product not found")
+    # Fields left out of the body keep their current values
+    service.update_product(
+        product['product_id'],
+        field(body, 'name', str, False, product['name']),
+        field(body, 'description', str, False, product['description']),
+        field(body, 'price', Decimal, False, product['price']),
+        field(body, 'category_id', int, False, product['category_id'])
+    )
+    return 200, service.get_product(product['product_id'])
+
+
+def delete_product(service, match, query, body):
+    if not service.delete_product(int(match['id'])):
+        raise HTTPError(404, "Product not found")
+    return 204, None
+
+
+def list_categories(service, match, query, body):
+    return 200, found(service.list_categories(), "categories")
+
+
+def create_category(service, match, query, body):
+    category_id = service.create_category(field(body, 'name', str), field(body, 'description', str, False, ""))
+    return 201, {'category_id': category_id}
+
+
+def list_inventory(service, match, query, body):
+    return 200, found(service.inventory_levels(), "inventory")
+
+
+def set_inventory(service, match, query, body):
+    product_id = int(match['id'])
+    quantity = field(body, 'quantity', int)
+    if quantity < 0:
+        raise HTTPError(400, "'quantity' cannot be negative")
+    try:
+        quantity = service.set_stock(product_id, quantity)
+    except StockError:
+        if service.get_stock(product_id) is None:
+            raise HTTPError(404, "Product not found")
+        raise
+    return 200, {'product_id': product_id, 'quantity': quantity}
+
+
+def adjust_inventory(service, match, query, body):
+    product_id = int(match['id'])
+    quantity = service.adjust_stock(product_id, field(body, 'delta', int),
+                                    notes=field(body, 'notes', str, False))
+    return 200, {'product_id': product_id, 'quantity': quantity}
+
+
+def record_transaction(service, match, query, body):
+    product_id = field(body, 'product_id', int)
+    quantity = service.record_transaction(product_id, field(body, 'quantity', int),
+                                          field(body, 'type', str), field(body, 'notes', str, False))
+    return 201, {'product_id': product_id, 'quantity': quantity}
+
+
+def list_transactions(service, match, query, body):
+    transaction_type = query.get('type', [None])[0]
+    if transaction_type not in (None, 'sale', 'restock'):
+        raise HTTPError(400, "'type' must be sale or restock")
+    end = date_arg(query, 'to')
+    page = service.query_transactions(
+        int_arg(query, 'product_id'), transaction_type, date_arg(query, 'from'),
+        end + timedelta(days=1) if end else None,
+        before=cursor_arg(query, 'before'), after=cursor_arg(query, 'after'),
+        limit=min(int_arg(query, 'limit', 50), 1000)
+    )
+    if page is None:
+        raise HTTPError(500, "Could not load transactions")
+    return 200, {'rows': page.rows, 'older': format_cursor(page.older), 'newer': format_cursor(page.newer)}
+
+
+def report(service, match, query, body):
+    name = match['name']
+    if name == 'low-stock':
+        return 200, found(service.low_stock_items(), "report")
+    if name == 'high-value':
+        return 200, found(service.high_value_items(), "report")
+    if name == 'categories':
+        return 200, found(service.category_summary(), "report")
+
+    today = datetime.now().date()
+    start, end = date_arg(query, 'from'), date_arg(query, 'to')
+    start = start.date() if start else today - timedelta(days=int_arg(query, 'days', 30))
+    end = end.date() + timedelta(days=1) if end else today + timedelta(days=1)
+    return 200, found(service.sales_summary(start, end), "report")
+
+
+# (method, path pattern, handler, runs in a transaction). Reads skip the
+# transaction so they can be served from the query cache; writes run in
+# one, which also makes database errors raise instead of returning None.
+ROUTES = [
+    ("GET", "/products", list_products, False),
+    ("POST", "/products", create_product, True),
+    ("GET", "/products/search", search_products, False),
+    ("GET", "/products/{id}", get_product, True),
+    ("PUT", "/products/{id}", update_product, True),
+    ("DELETE", "/products/{id}", delete_product, True),
+    ("GET", "/categories", list_categories, False),
+    ("POST", "/categories", create_category, True),
+    ("GET", "/inventory", list_inventory, False),
+    ("PUT", "/inventory/{id}", set_inventory, True),
+    ("POST", "/inventory/{id}/adjust", adjust_inventory, True),
+    ("GET", "/transactions", list_transactions, False),
+    ("POST", "/transactions", record_transaction, True),
+    ("GET", "/reports/{name:low-stock|high-value|categories|sales}", report, False),
+]
+
+
+def compile_route(path):
+    """Turn '/products/{id}' into a regex; {id} matches digits, {name:a|b} the listed words"""
+    def group(match):
+        name, _, choices = match.group(1).partition(":")
+        return f"(?P<{name}>{choices or '[0-9]+'})"
+    return re.compile("^" + re.sub(r"\{([^}]+)\}", group, path) + "$")
+
+
+class InventoryAPI:
+    def __init__(self, service=None, concurrency=None, queue_timeout=None, idle_timeout=None, ingest=None):
+        self.service = service or create_service()
+        self.ingest = ingest or IngestPipeline(self.service)
+        self.concurrency = concurrency or HTTP_CONFIG['concurrency']
+        self.queue_timeout = queue_timeout if queue_timeout is not None else HTTP_CONFIG['queue_timeout']
+        self.idle_timeout = idle_timeout if idle_timeout is not None else HTTP_CONFIG['idle_timeout']
+
+        self.routes = [(method, compile_route(path), path, handler, transactional)
+                       for method, path, handler, transactional in ROUTES]
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="api")
+        self.latency = LatencyStats()
+        self.slots = None
+        self.server = None
+        self.rejected = 0
+
+    async def start(self, host=None, port=None):
+        """Start listening; returns the asyncio server (port 0 picks a free port)"""
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.ingest.start()
+        self.server = await asyncio.start_server(
+            self.handle_connection,
+            host or HTTP_CONFIG['host'],
+            HTTP_CONFIG['port'] if port is None else port
+        )
+        return self.server
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HTTPError as e:
+                    await self.write_response(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+
+                method, target, headers, body, keep_alive = request
+                status, payload = await self.dispatch(method, target, body)
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """Parse one request; returns None when the client closed the connection"""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method.upper(), target, headers, body, keep_alive
+
+    async def dispatch(self, method, target, body):
+        """Route a request, run its handler and record its latency under the route template"""
+        started = time.perf_counter()
+        url = urlsplit(target)
+        route = "unmatched"
+        try:
+            if method == "GET" and url.path in ("/health", "/metrics"):
+                route = f"GET {url.path}"
+                status, payload = 200, ({'status': 'ok'} if url.path == "/health" else self.get_metrics())
+            elif method == "POST" and url.path == "/ingest":
+                route = "POST /ingest"
+                status, payload = await self.ingest_event(body)
+            else:
+                handler, match, transactional, route = self.match_route(method, url.path)
+                try:
+                    data = json.loads(body) if body else {}
+                except ValueError:
+                    raise HTTPError(400, "Request body is not valid JSON")
+                if not isinstance(data, dict):
+                    raise HTTPError(400, "Request body must be a JSON object")
+
+                query = parse_qs(url.query)
+                status, payload = await self.run_blocking(
+                    self.call_handler, route, handler, match, query, data, transactional
+                )
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e)}
+        except StockError as e:
+            status, payload = 409, {'error': str(e)}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except (PoolTimeoutError, IngestFullError, ShardError) as e:
+            status, payload = 503, {'error': str(e)}
+        except Error as e:
+            status, payload = 500, {'error': f"Database error: {e}"}
+        except Exception as e:
+            print(f"Error handling {method} {url.path}: {e!r}", file=sys.stderr)
+            status, payload = 500, {'error': "Internal server error"}
+
+        self.latency.record(route, time.perf_counter() - started, error=status >= 500)
+        return status, payload
+
+    async def ingest_event(self, body):
+        """Queue one sale or restock without waiting for queue space, and answer once it is committed"""
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        product_id = field(data, 'product_id', int)
+        future = self.ingest.submit(product_id, field(data, 'quantity', int), field(data, 'type', str),
+                                    field(data, 'notes', str, False), timeout=0)
+        return 201, {'product_id': product_id, 'quantity': await asyncio.wrap_future(future)}
+
+    def match_route(self, method, path):
+        allowed = []
+        for route_method, pattern, template, handler, transactional in self.routes:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groupdict(), transactional, f"{method} {template}"
+                allowed.append(route_method)
+        if allowed:
+            raise HTTPError(405, f"Method not allowed; use {', '.join(allowed)}")
+        raise HTTPError(404, "No such endpoint")
+
+    async def run_blocking(self, function, *args):
+        """Run a database call on a worker once a concurrency slot frees up"""
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPError(503, "Server busy, try again")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, function, *args)
+        finally:
+            self.slots.release()
+
+    def call_handler(self, route, handler, match, query, body, transactional):
+        with self.service.operation(route):
+            if not transactional:
+                return handler(self.service, match, query, body)
+            with self.service.transaction():
+                return handler(self.service, match, query, body)
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload, default=to_json).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    def get_metrics(self):
+        return {
+            'routes': self.latency.snapshot(),
+            'rejected': self.rejected,
+            'pool': self.service.get_pool_stats(),
+            'cache': self.service.get_cache_stats(),
+            'statements': self.service.get_statement_stats(),
+            'queries': self.service.get_query_stats(),
+            'replicas': self.service.get_replica_stats(),
+            'ingest': self.ingest.get_stats(),
+        }
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.ingest.close)
+        self.executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the inventory over HTTP/JSON")
+    parser.add_argument("--host", default=HTTP_CONFIG['host'])
+    parser.add_argument("--port", type=int, default=HTTP_CONFIG['port'])
+    parser.add_argument("--concurrency", type=int, default=HTTP_CONFIG['concurrency'],
+                        help="Database calls in flight (default: the pool size)")
+    args = parser.parse_args(argv)
+
+    api = InventoryAPI(concurrency=args.concurrency)
+
+    async def serve():
+        server = await api.start(args.host, args.port)
+        for sock in server.sockets:
+            print(f"Serving on http://{sock.getsockname()[0]}:{sock.getsockname()[1]}")
+        try:
+            await server.serve_forever()
+        finally:
+            await api.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        api.service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+"""
+Bulk importer for the Inventory Management System
+Streams a CSV or JSONL file of categories, products or stock levels into the
+database. Rows are validated as they are read and upserted in multi-row
+statements, one transaction per batch, so a 200k-row supplier catalog loads
+in a few hundred round trips and a failure only rolls back one batch.
+
+Usage:
+    python importer.py categories categories.csv
+    python importer.py products catalog.jsonl [--create-categories]
+    python importer.py stock counts.csv [--batch-size 1000] [--rejects rejects.csv]
+
+Columns (CSV header or JSON keys):
+    categories: name, description
+    products:   sku, name, description, price, category, quantity
+    stock:      sku, quantity
+
+Products and stock rows are matched by SKU and categories by name, so
+re-running an import updates rows instead of duplicating them. Rows that
+fail validation, or that the database refuses, are written to a reject
+file in the input's format with the reason added.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+import mysql.connector
+from mysql.connector import Error
+
+from connection_pool import is_connection_error
+from data_generator import chunked, report_progress
+
+IMPORT_BATCH_SIZE = 1000
+
+IMPORT_COLUMNS = {
+    'categories': ('name', 'description'),
+    'products': ('sku', 'name', 'description', 'price', 'category', 'quantity'),
+    'stock': ('sku', 'quantity'),
+}
+
+UPSERT_CATEGORIES_QUERY = """
+INSERT INTO categories (name, description) VALUES {values}
+ON DUPLICATE KEY UPDATE description = VALUES(description)
+"""
+
+UPSERT_PRODUCTS_QUERY = """
+INSERT INTO products (sku, name, description, price, category_id) VALUES {values}
+ON DUPLICATE KEY UPDATE
+    name = VALUES(name),
+    description = VALUES(description),
+    price = VALUES(price),
+    category_id = VALUES(category_id)
+"""
+
+UPSERT_INVENTORY_QUERY = """
+INSERT INTO inventory (product_id, quantity) VALUES {values}
+ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+"""
+
+ENSURE_INVENTORY_QUERY = """
+INSERT INTO inventory (product_id, quantity) VALUES {values}
+ON DUPLICATE KEY UPDATE quantity = quantity
+"""
+
+PRODUCT_IDS_QUERY = "SELECT sku, product_id FROM products WHERE sku IN ({skus})"
+
+
+class RowError(ValueError):
+    """Raised when an input row cannot be imported"""
+
+
+def multi_row(query, rows):
+    """Fill a query's {values} with one placeholder group per row; returns (sql, params)"""
+    group = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    params = [value for row in rows for value in row]
+    return query.format(values=", ".join([group] * len(rows))), params
+
+
+def detect_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_rows(source, fmt):
+    """
+    Yield (line number, row dict, error) for every record in a CSV or JSONL
+    stream. Unparseable JSON lines come back with row set to the raw text.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, {'raw': line}, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, {'raw': line}, "Expected a JSON object"
+            continue
+        yield number, row, None
+
+
+def text(row, name, required=False, limit=None):
+    value = row.get(name)
+    value = str(value).strip() if value is not None else ""
+    if required and not value:
+        raise RowError(f"'{name}' is required")
+    if limit and len(value) > limit:
+        raise RowError(f"'{name}' is longer than {limit} characters")
+    return value or None
+
+
+def quantity(row, required=False):
+    value = text(row, 'quantity', required)
+    if value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise RowError(f"'quantity' must be a whole number, got {value!r}")
+    if number < 0:
+        raise RowError("'quantity' cannot be negative")
+    return number
+
+
+def clean_category(row):
+    return (text(row, 'name', True, 100), text(row, 'description'))
+
+
+def clean_product(row):
+    price = text(row, 'price', True)
+    try:
+        price = Decimal(price)
+    except InvalidOperation:
+        raise RowError(f"'price' must be a number, got {price!r}")
+    if price < 0 or price >= Decimal("100000000"):
+        raise RowError(f"'price' is out of range: {price}")
+    return {
+        'sku': text(row, 'sku', True, 64),
+        'name': text(row, 'name', True, 100),
+        'description': text(row, 'description'),
+        'price': price.quantize(Decimal("0.01")),
+        'category': text(row, 'category', limit=100),
+        'quantity': quantity(row),
+    }
+
+
+def clean_stock(row):
+    return {'sku': text(row, 'sku', True, 64), 'quantity': quantity(row, True)}
+
+
+CLEANERS = {'categories': clean_category, 'products': clean_product, 'stock': clean_stock}
+
+
+class Importer:
+    def __init__(self, connection, kind, batch_size=IMPORT_BATCH_SIZE, create_categories=False):
+        """
+        kind: 'categories', 'products' or 'stock'
+        create_categories: add categories named by product rows that don't
+                           exist yet, instead of rejecting those rows
+        """
+        self.connection = connection
+        self.kind = kind
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.categories = None
+
+    def load_categories(self, cursor):
+        """Map lower-cased category names to ids, once per import"""
+        cursor.execute("SELECT category_id, name FROM categories")
+        self.categories = {name.lower(): category_id for category_id, name in cursor.fetchall()}
+
+    def resolve_categories(self, cursor, rows):
+        """Fill in category ids; returns rows whose category is unknown (with the reason)"""
+        if self.categories is None:
+            self.load_categories(cursor)
+
+        missing = {row['category'].lower(): row['category'] for _, row, _ in rows
+                   if row['category'] and row['category'].lower() not in self.categories}
+        if missing and self.create_categories:
+            sql, params = multi_row(UPSERT_CATEGORIES_QUERY, [(name, None) for name in missing.values()])
+            cursor.execute(sql, params)
+            self.load_categories(cursor)
+            missing = {}
+
+        rejected = []
+        for entry in rows:
+            _, row, _ = entry
+            name = row['category']
+            if name and name.lower() in missing:
+                rejected.append((entry, f"Unknown category {name!r}"))
+            else:
+                row['category_id'] = self.categories.get(name.lower()) if name else None
+        return rejected
+
+    def product_ids(self, cursor, skus):
+        sql = PRODUCT_IDS_QUERY.format(skus=", ".join(["%s"] * len(skus)))
+        cursor.execute(sql, list(skus))
+        return {sku.lower(): product_id for sku, product_id in cursor.fetchall()}
+
+    def write_batch(self, cursor, rows):
+        """
+        Upsert one batch of (line, cleaned row, original row) entries.
+        Returns the entries that had to be rejected, as (entry, reason).
+        """
+        if self.kind == 'categories':
+            # Later rows for the same name win, as they would row by row
+            latest = {row[0].lower(): row for _, row, _ in rows}
+            sql, params = multi_row(UPSERT_CATEGORIES_QUERY, list(latest.values()))
+            cursor.execute(sql, params)
+            self.categories = None
+            return []
+
+        rejected = []
+        if self.kind == 'products':
+            rejected = self.resolve_categories(cursor, rows)
+            refused = {id(entry) for entry, _ in rejected}
+            rows = [entry for entry in rows if id(entry) not in refused]
+            if not rows:
+                return rejected
+            latest = {row['sku'].lower(): row for _, row, _ in rows}
+            sql, params = multi_row(UPSERT_PRODUCTS_QUERY, [
+                (row['sku'], row['name'], row['description'], row['price'], row['category_id'])
+                for row in latest.values()
+            ])
+            cursor.execute(sql, params)
+
+        ids = self.product_ids(cursor, {row['sku'].lower() for _, row, _ in rows})
+        counts, ensure = {}, set()
+        for entry in rows:
+            row = entry[1]
+            product_id = ids.get(row['sku'].lower())
+            if product_id is None:
+                rejected.append((entry, f"Unknown SKU {row['sku']!r}"))
+            elif row['quantity'] is not None:
+                counts[product_id] = row['quantity']
+            else:
+                ensure.add(product_id)
+
+        if counts:
+            sql, params = multi_row(UPSERT_INVENTORY_QUERY, list(counts.items()))
+            cursor.execute(sql, params)
+        ensure -= counts.keys()
+        if ensure:
+            # Products imported without a quantity keep their stock, or start empty
+            sql, params = multi_row(ENSURE_INVENTORY_QUERY, [(product_id, 0) for product_id in sorted(ensure)])
+            cursor.execute(sql, params)
+        return rejected
+
+    def apply(self, rows):
+        """Write a batch in one transaction; returns (imported, rejected entries)"""
+        cursor = self.connection.cursor()
+        try:
+            self.connection.start_transaction()
+            rejected = self.write_batch(cursor, rows)
+            self.connection.commit()
+            return len(rows) - len(rejected), rejected
+        except Error:
+            self.connection.rollback()
+            # Categories created by the failed batch are gone again
+            self.categories = None
+            raise
+        finally:
+            cursor.close()
+
+    def apply_with_fallback(self, rows):
+        """
+        Write a batch; if the database refuses it, retry its rows one at a
+        time so a single bad row is rejected instead of the whole batch
+        """
+        try:
+            return self.apply(rows)
+        except Error as e:
+            if is_connection_error(e) or len(rows) == 1:
+                raise
+
+        imported, rejected = 0, []
+        for entry in rows:
+            try:
+                count, refused = self.apply([entry])
+            except Error as e:
+                if is_connection_error(e):
+                    raise
+                count, refused = 0, [(entry, f"Database error: {e.msg}")]
+            imported += count
+            rejected.extend(refused)
+        return imported, rejected
+
+    def run(self, records, rejects=None, total=None):
+        """
+        Import (line, row, error) records from read_rows. Rejected rows are
+        passed to rejects(line, row, reason). Returns a summary dict.
+        """
+        clean = CLEANERS[self.kind]
+        summary = {'read': 0, 'imported': 0, 'rejected': 0}
+        started = time.monotonic()
+
+        def reject(line, row, reason):
+            summary['rejected'] += 1
+            if rejects:
+                rejects(line, row, reason)
+
+        def valid_rows():
+            for line, row, error in records:
+                summary['read'] += 1
+                if error:
+                    reject(line, row, error)
+                    continue
+                try:
+                    yield line, clean(row), row
+                except RowError as e:
+                    reject(line, row, str(e))
+
+        for batch in chunked(valid_rows(), self.batch_size):
+            imported, refused = self.apply_with_fallback(batch)
+            summary['imported'] += imported
+            for (line, _, row), reason in refused:
+                reject(line, row, reason)
+            report_progress(self.kind, summary['read'], total or summary['read'], started)
+
+        summary['seconds'] = time.monotonic() - started
+        summary['rows_per_second'] = summary['read'] / max(summary['seconds'], 1e-9)
+        if summary['read']:
+            report_progress(self.kind, summary['read'], total or summary['read'], started, final=True)
+        return summary
+
+
+class RejectWriter:
+    """Writes rejected rows in the input's format, with their line number and reason"""
+    def __init__(self, out, fmt, columns):
+        self.out = out
+        self.fmt = fmt
+        self.writer = None
+        self.columns = ['line', 'error'] + list(columns)
+
+    def __call__(self, line, row, reason):
+        if self.fmt == "jsonl":
+            self.out.write(json.dumps(dict(row, line=line, error=reason), default=str) + "\n")
+            return
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.out, fieldnames=self.columns, extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow(dict(row, line=line, error=reason))
+
+
+def count_records(path):
+    """Count data rows for the progress line (a cheap pass compared to the import)"""
+    with open(path, newline='') as source:
+        lines = sum(1 for line in source if line.strip())
+    return lines - 1 if detect_format(path) == "csv" else lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import categories, products or stock levels")
+    parser.add_argument("kind", choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument("file", help="CSV or JSONL file ('-' for stdin)")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="Rows per multi-row statement and transaction")
+    parser.add_argument("--rejects", help="Where to write rejected rows (default: FILE.rejects.EXT)")
+    parser.add_argument("--create-categories", action="store_true",
+                        help="Create categories named by product rows instead of rejecting them")
+    args = parser.parse_args(argv)
+
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    fmt = args.format or detect_format(args.file if args.file != "-" else "")
+    rejects_path = args.rejects
+    if rejects_path is None:
+        base = "import" if args.file == "-" else os.path.splitext(args.file)[0]
+        rejects_path = f"{base}.rejects.{fmt}"
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    source = sys.stdin if args.file == "-" else open(args.file, newline='')
+    total = None if args.file == "-" else count_records(args.file)
+    try:
+        with open(rejects_path, "w", newline='') as out:
+            importer = Importer(conn, args.kind, args.batch_size, args.create_categories)
+            summary = importer.run(read_rows(source, fmt), RejectWriter(out, fmt, IMPORT_COLUMNS[args.kind]),
+                                   total)
+    except Error as e:
+        print(f"\nImport stopped: {e}")
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        conn.close()
+
+    print(f"Read {summary['read']:,} rows: {summary['imported']:,} imported, "
+          f"{summary['rejected']:,} rejected in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_second']:,.0f} rows/s)")
+    if summary['rejected']:
+        print(f"Rejected rows written to {rejects_path}")
+    else:
+        os.remove(rejects_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
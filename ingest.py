@@ -0,0 +1,395 @@
+"""
+Ingest pipeline for the Inventory Management System
+Takes sale and restock events from a high-rate feed (a point-of-sale
+stream, a warehouse scanner) and applies them in batches instead of one
+transaction per event. Each worker thread owns a bounded queue; it collects
+events until INGEST_BATCH_SIZE arrive or INGEST_FLUSH_INTERVAL seconds pass
+since the first, then flushes them in one transaction:
+
+    - one SELECT ... FOR UPDATE locking the batch's inventory rows
+    - one multi-row INSERT INTO transactions for the accepted events
+    - one UPDATE of inventory applying a single net delta per product
+
+When products are sharded (sharding.py) there is one such transaction per
+shard the batch touches.
+
+Events are routed to a worker by product_id, so one product's events are
+applied in the order they were submitted and workers never lock each
+other's rows. A sale that would take stock below zero is rejected on its
+own; the rest of the batch still applies. Every event gets a Future that
+resolves to the product's new quantity once its batch has committed, or to
+the StockError / database error that rejected it. When a worker's queue is
+full, submit() waits up to its timeout and then raises IngestFullError, so
+producers slow down instead of memory growing without bound.
+
+Usage:
+    python ingest.py events.jsonl [--workers N] [--batch-size N] [--flush-interval S]
+    producer | python ingest.py -
+
+Each input line is a JSON object with product_id, quantity, type (sale or
+restock) and optionally notes. One acknowledgement per event is written to
+stdout as a JSON line with its input line number.
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from mysql.connector import Error
+
+from importer import multi_row
+from service import TRANSACTION_TYPES, StockError
+
+INGEST_CONFIG = {
+    # Worker threads, each flushing its own batches on its own connection
+    'workers': int(os.getenv('INGEST_WORKERS', '4')),
+    # Events applied per flush at most
+    'batch_size': int(os.getenv('INGEST_BATCH_SIZE', '500')),
+    # Seconds a batch waits for more events after its first one arrives
+    'flush_interval': float(os.getenv('INGEST_FLUSH_INTERVAL', '0.05')),
+    # Events waiting per worker before submit() blocks
+    'queue_size': int(os.getenv('INGEST_QUEUE_SIZE', '10000')),
+    # Seconds submit() waits for queue space before raising IngestFullError
+    'submit_timeout': float(os.getenv('INGEST_SUBMIT_TIMEOUT', '5')),
+}
+
+# Deadlock and lock wait timeout: InnoDB rolled the batch back, so it is retried whole
+TRANSACTION_ABORTED = (1213, 1205)
+INGEST_RETRIES = 3
+
+LOCK_STOCK_QUERY = """
+SELECT product_id, quantity FROM inventory
+WHERE product_id IN ({ids})
+ORDER BY product_id
+FOR UPDATE
+"""
+
+INSERT_TRANSACTIONS_QUERY = """
+INSERT INTO transactions (product_id, quantity, transaction_type, transaction_date, notes)
+VALUES {values}
+"""
+
+APPLY_DELTAS_QUERY = """
+UPDATE inventory
+SET quantity = quantity + CASE product_id {cases} END
+WHERE product_id IN ({ids})
+"""
+
+# Tells a worker to flush what it has and exit
+STOP = object()
+
+
+class IngestFullError(Exception):
+    """Raised when a worker's queue stays full for the whole submit timeout"""
+
+
+class IngestEvent:
+    """One submitted sale or restock and the Future acknowledging it"""
+    def __init__(self, product_id, quantity, transaction_type, notes=None):
+        self.product_id = product_id
+        self.quantity = quantity
+        self.transaction_type = transaction_type
+        self.notes = notes
+        # Recorded as the transaction date, so batching does not shift it
+        self.received_at = datetime.now().replace(microsecond=0)
+        self.delta = quantity if transaction_type == 'restock' else -quantity
+        self.future = Future()
+
+
+def apply_deltas(deltas):
+    """Build the coalesced inventory UPDATE for {product_id: delta}; returns (sql, params)"""
+    ids = sorted(deltas)
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    params = [value for product_id in ids for value in (product_id, deltas[product_id])]
+    return APPLY_DELTAS_QUERY.format(cases=cases, ids=", ".join(["%s"] * len(ids))), params + ids
+
+
+class IngestPipeline:
+    def __init__(self, service, workers=None, batch_size=None, flush_interval=None, queue_size=None,
+                 submit_timeout=None):
+        """
+        service: InventoryService the batches are written through
+        workers: worker threads (one queue and one connection each)
+        batch_size: events applied per flush at most
+        flush_interval: seconds a batch waits for more events after its first
+        queue_size: events waiting per worker before submit() blocks
+        submit_timeout: default seconds submit() waits for queue space
+        """
+        self.service = service
+        self.workers = workers or INGEST_CONFIG['workers']
+        self.batch_size = batch_size or INGEST_CONFIG['batch_size']
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else INGEST_CONFIG['flush_interval'])
+        self.submit_timeout = (submit_timeout if submit_timeout is not None
+                               else INGEST_CONFIG['submit_timeout'])
+        self.queues = [queue.Queue(maxsize=queue_size or INGEST_CONFIG['queue_size'])
+                       for _ in range(self.workers)]
+        self.threads = []
+        self.closed = False
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'acknowledged': 0,
+            'rejected': 0,
+            'failed': 0,
+            'refused': 0,
+            'flushes': 0,
+            'retries': 0,
+            'flush_time': 0.0,
+        }
+
+    def start(self):
+        """Start the worker threads; returns the pipeline"""
+        if not self.threads:
+            self.threads = [threading.Thread(target=self.run, args=(events,), name=f"ingest-{i}", daemon=True)
+                            for i, events in enumerate(self.queues)]
+            for thread in self.threads:
+                thread.start()
+        return self
+
+    def submit(self, product_id, quantity, transaction_type, notes=None, timeout=None):
+        """
+        Queue a sale or restock and return a Future for the product's new
+        quantity. Raises ValueError for an invalid event and IngestFullError
+        if no queue space frees up within `timeout` seconds (0 never waits).
+        """
+        if self.closed:
+            raise RuntimeError("Ingest pipeline is closed.")
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ValueError(f"Transaction type must be one of {', '.join(TRANSACTION_TYPES)}.")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive.")
+
+        event = IngestEvent(product_id, quantity, transaction_type, notes)
+        timeout = self.submit_timeout if timeout is None else timeout
+        try:
+            self.queues[product_id % self.workers].put(event, block=timeout > 0, timeout=timeout or None)
+        except queue.Full:
+            self.count('refused')
+            raise IngestFullError(f"Ingest queue full; event for product {product_id} not accepted")
+        self.count('submitted')
+        return event.future
+
+    def close(self):
+        """Stop accepting events, flush everything queued and wait for the workers"""
+        self.closed = True
+        # Events queued before start() are still applied
+        self.start()
+        for events in self.queues:
+            events.put(STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def get_stats(self):
+        """Counters plus current queue depths and the mean batch size"""
+        with self.lock:
+            stats = dict(self.stats)
+        applied = stats['acknowledged'] + stats['rejected']
+        stats['events_per_flush'] = round(applied / stats['flushes'], 1) if stats['flushes'] else 0
+        stats['flush_time'] = round(stats['flush_time'], 3)
+        stats['queued'] = [events.qsize() for events in self.queues]
+        return stats
+
+    def run(self, events):
+        """Worker loop: gather a batch per flush interval and apply it"""
+        stopping = False
+        while not stopping:
+            event = events.get()
+            if event is STOP:
+                return
+            batch = [event]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    event = events.get(timeout=remaining) if remaining > 0 else events.get_nowait()
+                except queue.Empty:
+                    break
+                if event is STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            self.flush(batch)
+
+    def flush(self, batch):
+        """Apply a batch and settle every event's Future"""
+        # Callers may cancel a Future while its event is still queued
+        batch = [event for event in batch if event.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        # One transaction per shard the batch touches (just one when unsharded)
+        outcomes, shards = {}, {}
+        for event in batch:
+            try:
+                shards.setdefault(self.service.shard_for(event.product_id), []).append(event)
+            except Exception as e:
+                outcomes[id(event)] = e
+        for shard, events in shards.items():
+            outcomes.update(zip(map(id, events), self.apply_with_retry(shard, events)))
+        self.count('flushes')
+        self.count('flush_time', time.perf_counter() - started)
+
+        for event in batch:
+            outcome = outcomes[id(event)]
+            if isinstance(outcome, StockError):
+                self.count('rejected')
+                event.future.set_exception(outcome)
+            elif isinstance(outcome, Exception):
+                self.count('failed')
+                event.future.set_exception(outcome)
+            else:
+                self.count('acknowledged')
+                event.future.set_result(outcome)
+
+    def apply_with_retry(self, shard, batch):
+        """apply() on one shard, retried whole if InnoDB aborted it; a failure becomes every event's outcome"""
+        for attempt in range(INGEST_RETRIES):
+            try:
+                with shard.operation("ingest"):
+                    return self.apply(shard, batch)
+            except Error as e:
+                if e.errno in TRANSACTION_ABORTED and attempt < INGEST_RETRIES - 1:
+                    self.count('retries')
+                    continue
+                return [e] * len(batch)
+            except Exception as e:
+                return [e] * len(batch)
+
+    def apply(self, shard, batch):
+        """
+        Write a batch of one shard's events in one transaction. Returns, per
+        event in order, the product's quantity after it or the StockError
+        rejecting it; raises if the transaction fails, in which case nothing
+        was written.
+        """
+        ids = sorted({event.product_id for event in batch})
+        with shard.unit_of_work() as work:
+            # Locking in product order keeps concurrent batches from deadlocking
+            rows = shard.execute_query(LOCK_STOCK_QUERY.format(ids=", ".join(["%s"] * len(ids))),
+                                       ids, fetch=True)
+            stock = {row['product_id']: row['quantity'] for row in rows}
+            before = dict(stock)
+
+            outcomes, accepted = [], []
+            for event in batch:
+                current = stock.get(event.product_id)
+                if current is None:
+                    outcomes.append(StockError(f"Product {event.product_id} not found in inventory."))
+                elif current + event.delta < 0:
+                    outcomes.append(StockError(f"Not enough inventory. Current stock: {current}"))
+                else:
+                    stock[event.product_id] = current + event.delta
+                    outcomes.append(stock[event.product_id])
+                    accepted.append(event)
+
+            if accepted:
+                work.execute(*multi_row(INSERT_TRANSACTIONS_QUERY, [
+                    (event.product_id, event.quantity, event.transaction_type, event.received_at, event.notes)
+                    for event in accepted
+                ]))
+                deltas = {product_id: quantity - before[product_id]
+                          for product_id, quantity in stock.items() if quantity != before[product_id]}
+                if deltas:
+                    work.execute(*apply_deltas(deltas))
+        return outcomes
+
+
+def read_events(source):
+    """Yield (line number, event dict or error message) per non-blank input line"""
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+            if not isinstance(event, dict):
+                raise ValueError("expected a JSON object")
+            yield number, {
+                'product_id': int(event['product_id']),
+                'quantity': int(event['quantity']),
+                'transaction_type': event.get('type', event.get('transaction_type')),
+                'notes': event.get('notes'),
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            yield number, f"Invalid event: {e}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a feed of sale and restock events in batches")
+    parser.add_argument("path", help="JSON lines file of events, or - for stdin")
+    parser.add_argument("--workers", type=int, default=INGEST_CONFIG['workers'])
+    parser.add_argument("--batch-size", type=int, default=INGEST_CONFIG['batch_size'])
+    parser.add_argument("--flush-interval", type=float, default=INGEST_CONFIG['flush_interval'],
+                        help="Seconds a batch waits for more events")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be at least 1")
+
+    from sharding import create_service
+
+    service = create_service()
+    pipeline = IngestPipeline(service, args.workers, args.batch_size, args.flush_interval).start()
+    output = threading.Lock()
+    failures = 0
+
+    def acknowledge(number, future):
+        nonlocal failures
+        record = {"line": number}
+        error = future.exception()
+        if error is None:
+            record.update(status="ok", quantity=future.result())
+        else:
+            record.update(status="error", error=str(error))
+        with output:
+            failures += error is not None
+            print(json.dumps(record), flush=True)
+
+    started = time.perf_counter()
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    try:
+        for number, event in read_events(source):
+            if isinstance(event, str):
+                future = Future()
+                future.set_exception(ValueError(event))
+                acknowledge(number, future)
+                continue
+            try:
+                # Waits for queue space, so a fast feed is slowed to the database's pace
+                future = pipeline.submit(**event)
+            except (ValueError, IngestFullError) as e:
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda done, number=number: acknowledge(number, done))
+    except KeyboardInterrupt:
+        print("Interrupted; flushing queued events.", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        pipeline.close()
+        service.close()
+
+    stats = pipeline.get_stats()
+    elapsed = time.perf_counter() - started
+    applied = stats['acknowledged'] + stats['rejected']
+    print(f"Applied {applied:,} events in {stats['flushes']:,} flushes "
+          f"({applied / elapsed if elapsed else 0:,.0f} events/s), "
+          f"{stats['rejected'] + stats['failed']:,} rejected.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+"""
+Schema migrations for the Inventory Management System
+Each migration has a version number and a list of steps; applied versions are
+recorded in the schema_migrations table so running the migrator again only
+applies what is new.
+
+Usage:
+    python migrations.py migrate       Apply pending migrations
+    python migrations.py status        List applied and pending migrations
+    python migrations.py check-plans   EXPLAIN every app query and flag full scans/filesorts
+"""
+
+import argparse
+import sys
+from collections import namedtuple
+
+import mysql.connector
+from mysql.connector import Error
+from tabulate import tabulate
+
+import aggregates
+import alerts
+import partitions
+import sales_rollup
+
+DB_NAME = "inventory_management"
+
+# Held while migrating so two setup runs cannot interleave DDL
+MIGRATION_LOCK = "inventory_management.migrations"
+
+Migration = namedtuple("Migration", ["version", "description", "steps"])
+
+
+class MigrationError(Exception):
+    """Raised when a migration cannot be applied safely"""
+
+
+def index_exists(cursor, table, name):
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+        """,
+        (table, name)
+    )
+    return cursor.fetchone() is not None
+
+
+def add_index(table, name, columns, unique=False):
+    """Return a step that creates an index unless it already exists"""
+    def step(cursor):
+        if index_exists(cursor, table, name):
+            return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+    return step
+
+
+def add_fulltext_index(table, name, columns, parser=None):
+    """Return a step that creates a FULLTEXT index unless it already exists"""
+    def step(cursor):
+        if index_exists(cursor, table, name):
+            return
+        with_parser = f" WITH PARSER {parser}" if parser else ""
+        cursor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} ({columns}){with_parser}")
+    return step
+
+
+def add_column(table, name, definition):
+    """Return a step that adds a column unless it already exists"""
+    def step(cursor):
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+            LIMIT 1
+            """,
+            (table, name)
+        )
+        if cursor.fetchone():
+            return
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return step
+
+
+def require_unique(table, column):
+    """Return a step that refuses to continue if a column holds duplicate values"""
+    def step(cursor):
+        cursor.execute(
+            f"SELECT {column}, COUNT(*) AS copies FROM {table} "
+            f"GROUP BY {column} HAVING copies > 1 LIMIT 5"
+        )
+        duplicates = cursor.fetchall()
+        if duplicates:
+            values = ", ".join(str(row[0]) for row in duplicates)
+            raise MigrationError(
+                f"{table}.{column} has duplicate rows (e.g. {values}); "
+                f"merge them before running this migration"
+            )
+    return step
+
+
+# Version 1 reproduces the tables the original setup script created. They keep
+# IF NOT EXISTS so databases created before migrations existed are adopted as-is.
+CREATE_CATEGORIES_TABLE = """
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+CREATE_PRODUCTS_TABLE = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    price DECIMAL(10, 2) NOT NULL,
+    category_id INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (category_id) REFERENCES categories(category_id)
+)
+"""
+
+CREATE_INVENTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS inventory (
+    inventory_id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+)
+"""
+
+CREATE_TRANSACTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    transaction_type ENUM('sale', 'restock') NOT NULL,
+    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    notes TEXT,
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+)
+"""
+
+MIGRATIONS = [
+    Migration(1, "Initial schema", [
+        CREATE_CATEGORIES_TABLE,
+        CREATE_PRODUCTS_TABLE,
+        CREATE_INVENTORY_TABLE,
+        CREATE_TRANSACTIONS_TABLE,
+    ]),
+    Migration(2, "Indexes for history, report and stock queries", [
+        # One inventory row per product, so product joins cannot fan out
+        require_unique("inventory", "product_id"),
+        add_index("inventory", "uq_inventory_product", "product_id", unique=True),
+        # Low Stock range scan and the inventory listing's ORDER BY quantity
+        add_index("inventory", "idx_inventory_quantity", "quantity"),
+        # Transaction history: newest first, ties broken by id
+        add_index("transactions", "idx_transactions_date", "transaction_date, transaction_id"),
+        # Sales Summary: type + date range, covering the columns it aggregates
+        add_index("transactions", "idx_transactions_type_date",
+                  "transaction_type, transaction_date, product_id, quantity"),
+        # Per-product history and delete_product's cleanup
+        add_index("transactions", "idx_transactions_product_date", "product_id, transaction_date"),
+    ]),
+    Migration(3, "Index for type-filtered transaction history", [
+        # Keeps (date, id) order within a type so history pages need no filesort
+        add_index("transactions", "idx_transactions_type_history",
+                  "transaction_type, transaction_date, transaction_id"),
+    ]),
+    Migration(4, "Trigger-maintained category aggregates", [
+        aggregates.CREATE_CATEGORY_STATS_TABLE,
+        aggregates.install_triggers,
+        "DELETE FROM category_stats",
+        aggregates.REBUILD_CATEGORY_STATS_QUERY,
+    ]),
+    Migration(5, "Trigger-maintained daily sales rollup", [
+        sales_rollup.CREATE_DAILY_SALES_TABLE,
+        sales_rollup.install_triggers,
+        # Very large histories can instead be rolled up in chunks afterwards
+        # with 'python sales_rollup.py backfill'
+        sales_rollup.BACKFILL_ALL_QUERY,
+    ]),
+    Migration(6, "Natural keys for bulk imports", [
+        # Imports upsert products by SKU and categories by name. Products
+        # created by hand may leave sku NULL, which the unique index allows.
+        add_column("products", "sku", "VARCHAR(64) NULL AFTER product_id"),
+        add_index("products", "uq_products_sku", "sku", unique=True),
+        require_unique("categories", "name"),
+        add_index("categories", "uq_categories_name", "name", unique=True),
+    ]),
+    Migration(7, "Reorder points and trigger-maintained low-stock alerts", [
+        # NULL falls back to the category's reorder point, then the default
+        add_column("products", "reorder_point", "INT NULL"),
+        add_column("categories", "reorder_point", "INT NULL"),
+        alerts.CREATE_LOW_STOCK_TABLE,
+        alerts.CREATE_STOCK_ALERTS_TABLE,
+        alerts.install_triggers,
+        # Stock that is already low is listed but not alerted on
+        "DELETE FROM low_stock",
+        alerts.REBUILD_LOW_STOCK_QUERY,
+    ]),
+    Migration(8, "Monthly partitions for transactions", [
+        # MySQL cannot partition a table with foreign keys, and every unique
+        # key must include the partitioning column. delete_product already
+        # removes a product's transactions before the product itself.
+        partitions.drop_foreign_keys("transactions"),
+        "ALTER TABLE transactions MODIFY transaction_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+        partitions.set_primary_key("transactions", "transaction_id, transaction_date"),
+        partitions.partition_transactions,
+    ]),
+    Migration(9, "Product search by name and description", [
+        # The ngram parser indexes every run of ngram_token_size characters,
+        # so substrings and prefixes are index lookups (see search.py)
+        add_fulltext_index("products", "ft_products_search", "name, description", parser="ngram"),
+        # Name prefix lookups for searches shorter than an n-gram
+        add_index("products", "idx_products_name", "name"),
+    ]),
+]
+
+
+def ensure_migrations_table(cursor):
+    """Create the bookkeeping table that records applied versions"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def applied_versions(cursor):
+    """Return the set of migration versions already applied"""
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(connection, target=None):
+    """Apply pending migrations in order, up to `target` if given. Returns the versions applied."""
+    cursor = connection.cursor(buffered=True)
+    applied = []
+
+    cursor.execute("SELECT GET_LOCK(%s, 30)", (MIGRATION_LOCK,))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise MigrationError("Another migration run is in progress")
+
+    try:
+        ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            if target is not None and migration.version > target:
+                break
+
+            print(f"Applying migration {migration.version}: {migration.description}")
+            for step in migration.steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+
+            # MySQL commits DDL implicitly, so a failed step leaves earlier steps
+            # in place; the steps are written to be safe to re-run for that reason
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (migration.version, migration.description)
+            )
+            connection.commit()
+            applied.append(migration.version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.close()
+
+    return applied
+
+
+def migration_status(connection):
+    """Return (version, description, applied) for every known migration"""
+    cursor = connection.cursor(buffered=True)
+    try:
+        ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+    finally:
+        cursor.close()
+
+    return [(m.version, m.description, m.version in done) for m in MIGRATIONS]
+
+
+def query_plan_checks():
+    """
+    Return (label, query, params, allowed) for every query the app runs.
+    `allowed` lists (table alias, issue) pairs that are inherent to the query
+    shape, e.g. a screen that lists every row has to read every row.
+    """
+    # Imported here so setup_database.py can use the migrator without the service layer
+    import search
+    import service
+
+    return [
+        ("View Products", service.VIEW_PRODUCTS_PAGE_QUERY, (0, service.PRODUCTS_PAGE_SIZE + 1), set()),
+        ("View Inventory", service.VIEW_INVENTORY_QUERY, None,
+         {("i", "full scan"), ("i", "filesort")}),
+        ("Transaction History", *service.build_transaction_query(), set()),
+        ("History by Product", *service.build_transaction_query(product_id=1), set()),
+        ("History by Type", *service.build_transaction_query(transaction_type="sale"), set()),
+        ("History Older Page", *service.build_transaction_query(
+            transaction_type="sale", before=("2024-01-01 00:00:00", 1)), set()),
+        ("View Categories", service.VIEW_CATEGORIES_QUERY, None,
+         {("c", "full scan"), ("c", "filesort")}),
+        # Lists the whole maintained set, which only holds low-stock products
+        ("Low Stock Items", service.LOW_STOCK_QUERY, None, {("l", "full scan")}),
+        ("Pending Alerts", service.PENDING_ALERTS_QUERY, (0, 100), set()),
+        # Ordered by price * quantity, which no index can serve
+        ("High Value Items", service.HIGH_VALUE_QUERY, None,
+         {("i", "full scan"), ("i", "filesort"), ("p", "full scan"), ("p", "filesort")}),
+        # Sorting the per-product aggregate is fine; scanning the rollup is not
+        ("Sales Summary", service.SALES_SUMMARY_QUERY, ("2024-01-01", "2024-01-31"),
+         {("d", "filesort"), ("p", "filesort")}),
+        ("Product Details", service.PRODUCT_DETAILS_QUERY, (1,), set()),
+        ("Stock Level", service.STOCK_LEVEL_QUERY, (1,), set()),
+        ("Category Summary", service.CATEGORY_SUMMARY_QUERY, None,
+         {("c", "full scan"), ("c", "filesort")}),
+        ("Adjust Stock", service.ADJUST_STOCK_QUERY, (0, 1, 0, 0), set()),
+        # The full-text index finds the matches; only those are sorted
+        ("Search Products", *search.build_search_query("mysql", "cable"), {("p", "filesort")}),
+        ("Search Name Prefix", *search.build_search_query("mysql", "c"), set()),
+    ]
+
+
+def plan_issues(row):
+    """Return the problems an EXPLAIN row shows"""
+    issues = []
+    if row.get("type") == "ALL":
+        issues.append("full scan")
+    if "filesort" in (row.get("Extra") or ""):
+        issues.append("filesort")
+    return issues
+
+
+def check_query_plans(connection):
+    """
+    EXPLAIN every app query and report full table scans and filesorts that are
+    not inherent to the query. Plans depend on table statistics, so run this
+    against a production-sized database (see setup_database.py --generate).
+    Returns (report rows, number of violations).
+    """
+    cursor = connection.cursor(dictionary=True, buffered=True)
+    report = []
+    violations = 0
+
+    try:
+        for label, query, params, allowed in query_plan_checks():
+            cursor.execute("EXPLAIN " + query, params)
+            for row in cursor.fetchall():
+                table = row.get("table")
+                problems = [
+                    issue for issue in plan_issues(row)
+                    if (table, issue) not in allowed
+                ]
+                violations += len(problems)
+                report.append([
+                    label, table, row.get("type"), row.get("key"), row.get("rows"),
+                    row.get("Extra") or "", ", ".join(problems) if problems else "ok"
+                ])
+    finally:
+        cursor.close()
+
+    return report, violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the inventory database schema")
+    parser.add_argument("command", choices=["migrate", "status", "check-plans"])
+    parser.add_argument("--target", type=int, help="Migrate up to this version only")
+    args = parser.parse_args(argv)
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.command == "migrate":
+            applied = migrate(conn, args.target)
+            print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
+        elif args.command == "status":
+            rows = [[v, d, "applied" if a else "pending"] for v, d, a in migration_status(conn)]
+            print(tabulate(rows, headers=["Version", "Description", "Status"], tablefmt="grid"))
+        else:
+            report, violations = check_query_plans(conn)
+            headers = ["Query", "Table", "Access", "Key", "Rows", "Extra", "Verdict"]
+            print(tabulate(report, headers=headers, tablefmt="grid"))
+            if violations:
+                print(f"\n{violations} plan problem(s) found.")
+                return 1
+            print("\nAll query plans use indexes.")
+    except (Error, MigrationError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Transaction partitioning and archival for the Inventory Management System
+Migration 8 range-partitions transactions by month on transaction_date.
+Partition pYYYYMM holds the rows dated before the first day of the
+following month (the lowest one also holds anything older), and pmax
+catches dates beyond the last month created. Queries with a date range
+only read the months they cover, and old months are removed with a
+metadata-only DROP PARTITION instead of a DELETE.
+
+The archive job exports every month older than the retention period to a
+compressed file, ARCHIVE_DIR/transactions-YYYY-MM.csv.gz, checks the row
+count, and only then drops the partition, so the hot table stays the same
+size. Archived months can still be read with 'python exporter.py archive'.
+daily_sales keeps their totals, so the Sales Summary still covers them.
+
+Usage:
+    python partitions.py status                     List partitions and their row estimates
+    python partitions.py maintain [--ahead N]       Create partitions for the coming months
+    python partitions.py archive [--retention N] [--archive-dir DIR] [--dry-run]
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import re
+import sys
+from datetime import date, datetime
+
+import mysql.connector
+from mysql.connector import Error
+from tabulate import tabulate
+
+# Months kept in the transactions table; older ones are archived
+TRANSACTIONS_RETENTION_MONTHS = int(os.getenv('TRANSACTIONS_RETENTION_MONTHS', '24'))
+
+# Where archived months are written
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+
+# Empty partitions kept ready for future months
+PARTITION_MONTHS_AHEAD = 3
+
+PARTITION_NAME = re.compile(r"^p(\d{4})(\d{2})$")
+ARCHIVE_NAME = re.compile(r"^transactions-(\d{4})-(\d{2})\.csv\.gz$")
+
+PARTITIONS_QUERY = """
+SELECT partition_name, partition_description, table_rows
+FROM information_schema.partitions
+WHERE table_schema = DATABASE() AND table_name = 'transactions' AND partition_name IS NOT NULL
+ORDER BY partition_ordinal_position
+"""
+
+
+class PartitionError(Exception):
+    """Raised when partitions cannot be changed safely"""
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name):
+    """Month a pYYYYMM partition covers, or None for pmax"""
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def partition_definition(month):
+    return (f"PARTITION {partition_name(month)} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{add_months(month, 1):%Y-%m-%d} 00:00:00'))")
+
+
+def month_partitions(cursor):
+    """Return (month, partition name, estimated rows) per monthly partition, oldest first"""
+    cursor.execute(PARTITIONS_QUERY)
+    return [(partition_month(row[0]), row[0], row[2]) for row in cursor.fetchall()
+            if partition_month(row[0]) is not None]
+
+
+def is_partitioned(cursor):
+    cursor.execute(PARTITIONS_QUERY)
+    return bool(cursor.fetchall())
+
+
+def drop_foreign_keys(table):
+    """Return a step that drops every foreign key on a table (partitioned tables cannot have any)"""
+    def step(cursor):
+        cursor.execute(
+            """
+            SELECT constraint_name FROM information_schema.table_constraints
+            WHERE table_schema = DATABASE() AND table_name = %s AND constraint_type = 'FOREIGN KEY'
+            """,
+            (table,)
+        )
+        for (name,) in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {table} DROP FOREIGN KEY {name}")
+    return step
+
+
+def set_primary_key(table, columns):
+    """Return a step that replaces a table's primary key unless it already has these columns"""
+    def step(cursor):
+        cursor.execute(
+            """
+            SELECT column_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = 'PRIMARY'
+            ORDER BY seq_in_index
+            """,
+            (table,)
+        )
+        if [row[0] for row in cursor.fetchall()] == [c.strip() for c in columns.split(",")]:
+            return
+        cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY ({columns})")
+    return step
+
+
+def partition_transactions(cursor, today=None, retention=TRANSACTIONS_RETENTION_MONTHS,
+                           ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Partition transactions by month, from its oldest row (or the start of
+    the retention period, if that is earlier) to `ahead` months from now.
+    Does nothing if the table is already partitioned.
+    """
+    if is_partitioned(cursor):
+        return
+    current = month_start(today or date.today())
+    cursor.execute("SELECT MIN(transaction_date) FROM transactions")
+    oldest = cursor.fetchone()[0]
+    first = add_months(current, -retention)
+    if oldest is not None:
+        first = min(first, month_start(oldest))
+
+    months = []
+    month = first
+    while month <= add_months(current, ahead):
+        months.append(month)
+        month = add_months(month, 1)
+    definitions = ",\n    ".join([partition_definition(m) for m in months]
+                                 + ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+    cursor.execute(f"ALTER TABLE transactions PARTITION BY RANGE (UNIX_TIMESTAMP(transaction_date)) (\n"
+                   f"    {definitions}\n)")
+
+
+def ensure_partitions(connection, today=None, ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Split the months up to `ahead` months from now out of pmax. pmax is
+    normally empty then, so this is a quick metadata change. Returns the
+    partitions created.
+    """
+    cursor = connection.cursor()
+    try:
+        existing = month_partitions(cursor)
+        if not existing:
+            raise PartitionError("transactions is not partitioned; run 'python migrations.py migrate'")
+        target = add_months(month_start(today or date.today()), ahead)
+        month = add_months(existing[-1][0], 1)
+        months = []
+        while month <= target:
+            months.append(month)
+            month = add_months(month, 1)
+        if months:
+            definitions = ", ".join([partition_definition(m) for m in months]
+                                    + ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+            cursor.execute(f"ALTER TABLE transactions REORGANIZE PARTITION pmax INTO ({definitions})")
+        return [partition_name(m) for m in months]
+    finally:
+        cursor.close()
+
+
+def archive_path(directory, month):
+    return os.path.join(directory, f"transactions-{month:%Y-%m}.csv.gz")
+
+
+def expired_partitions(connection, retention, today=None):
+    """Return (month, name) for partitions entirely older than the retention period, oldest first"""
+    cutoff = add_months(month_start(today or date.today()), -retention)
+    cursor = connection.cursor()
+    try:
+        # The newest monthly partition is never dropped, so RANGE always has one below pmax
+        partitions = month_partitions(cursor)[:-1]
+    finally:
+        cursor.close()
+    return [(month, name) for month, name, _ in partitions if add_months(month, 1) <= cutoff]
+
+
+def archive_partition(connection, month, name, directory):
+    """
+    Export one partition to its archive file and drop it once the file holds
+    every row. The partition is the oldest left, so its rows are exactly
+    those dated before the end of its month. Returns the rows archived.
+    """
+    from exporter import export_transactions
+
+    end = datetime.combine(add_months(month, 1), datetime.min.time())
+    path = archive_path(directory, month)
+    temporary = path + ".partial"
+    resume = os.path.exists(temporary + ".checkpoint")
+    # Resumable like any export; the file only gets its final name when complete
+    rows = export_transactions(connection, temporary, "csv", True, None, end, resume=resume)
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM transactions PARTITION ({name})")
+        expected = cursor.fetchone()[0]
+        connection.commit()
+        if rows != expected:
+            raise PartitionError(f"{name} holds {expected} rows but {rows} were archived; "
+                                 f"it was written to meanwhile, so it is kept")
+        with open(temporary, "rb") as archived:
+            os.fsync(archived.fileno())
+        os.replace(temporary, path)
+        cursor.execute(f"ALTER TABLE transactions DROP PARTITION {name}")
+    finally:
+        cursor.close()
+    return rows
+
+
+def archive_expired(connection, directory=ARCHIVE_DIR, retention=TRANSACTIONS_RETENTION_MONTHS,
+                    today=None, dry_run=False):
+    """Archive and drop every partition older than `retention` months; returns [(name, rows)]"""
+    os.makedirs(directory, exist_ok=True)
+    archived = []
+    for month, name in expired_partitions(connection, retention, today):
+        if dry_run:
+            archived.append((name, None))
+            continue
+        print(f"Archiving {name} to {archive_path(directory, month)}")
+        archived.append((name, archive_partition(connection, month, name, directory)))
+    return archived
+
+
+def archived_months(directory=ARCHIVE_DIR):
+    """Return (month, path) for every archive file, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    months = []
+    for entry in os.listdir(directory):
+        match = ARCHIVE_NAME.match(entry)
+        if match:
+            months.append((date(int(match.group(1)), int(match.group(2)), 1), os.path.join(directory, entry)))
+    return sorted(months)
+
+
+def iter_archived_transactions(directory=ARCHIVE_DIR, start=None, end=None):
+    """
+    Yield archived transactions dated in [start, end) as row dicts, oldest
+    month first. A file holds rows dated before the end of its month, so
+    files ending before `start` are skipped without being opened.
+    """
+    for month, path in archived_months(directory):
+        if start is not None and add_months(month, 1) <= month_start(start):
+            continue
+        with gzip.open(path, "rt", newline="") as source:
+            for row in csv.DictReader(source):
+                when = datetime.fromisoformat(row["transaction_date"])
+                if (start is not None and when < start) or (end is not None and when >= end):
+                    continue
+                yield {
+                    "transaction_id": int(row["transaction_id"]),
+                    "product_id": int(row["product_id"]),
+                    "transaction_type": row["transaction_type"],
+                    "quantity": int(row["quantity"]),
+                    "transaction_date": when,
+                    "notes": row["notes"] or None,
+                }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage transaction partitions and archives")
+    parser.add_argument("command", choices=["status", "maintain", "archive"])
+    parser.add_argument("--ahead", type=int, default=PARTITION_MONTHS_AHEAD,
+                        help="Months of empty partitions to keep ready")
+    parser.add_argument("--retention", type=int, default=TRANSACTIONS_RETENTION_MONTHS,
+                        help="Months of transactions kept in the database")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Directory for archived months")
+    parser.add_argument("--dry-run", action="store_true", help="List the partitions that would be archived")
+    args = parser.parse_args(argv)
+
+    if args.retention < 1:
+        parser.error("--retention must be at least 1 month")
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.command == "status":
+            cursor = conn.cursor()
+            try:
+                cursor.execute(PARTITIONS_QUERY)
+                rows = [[name, partition_month(name) or "later", estimate]
+                        for name, _, estimate in cursor.fetchall()]
+            finally:
+                cursor.close()
+            if not rows:
+                print("transactions is not partitioned.")
+                return 1
+            print(tabulate(rows, headers=["Partition", "Month", "Rows (estimate)"], tablefmt="grid"))
+            archived = archived_months(args.archive_dir)
+            if archived:
+                print(f"\n{len(archived)} archived months in {args.archive_dir}, "
+                      f"{archived[0][0]:%Y-%m} to {archived[-1][0]:%Y-%m}")
+            return 0
+
+        if args.command == "maintain":
+            created = ensure_partitions(conn, ahead=args.ahead)
+            print(f"Created partitions {', '.join(created)}." if created else "Partitions are up to date.")
+            return 0
+
+        archived = archive_expired(conn, args.archive_dir, args.retention, dry_run=args.dry_run)
+        if not archived:
+            print(f"Nothing older than {args.retention} months to archive.")
+        elif args.dry_run:
+            print(f"Would archive {', '.join(name for name, _ in archived)}.")
+        else:
+            print(f"Archived {sum(rows for _, rows in archived):,} transactions "
+                  f"from {len(archived)} partitions.")
+        return 0
+    except (Error, PartitionError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
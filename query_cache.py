@@ -0,0 +1,157 @@
+"""
+Query result cache for the Inventory Management System
+An opt-in LRU/TTL cache in front of execute_query. Each cached read is
+tagged with the tables it reads; a write evicts only the entries tagged
+with a table it touches, so unrelated screens stay cached.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+WRITE_TARGET = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+    re.IGNORECASE
+)
+
+
+def read_tables(query):
+    """Return the set of tables a SELECT reads"""
+    return {name.lower() for name in TABLE_REFERENCE.findall(query)}
+
+
+def written_table(query):
+    """Return the table a write statement modifies, or None if it can't be determined"""
+    match = WRITE_TARGET.match(query)
+    return match.group(1).lower() if match else None
+
+
+def is_cacheable(query):
+    return query.lstrip()[:6].upper() == "SELECT"
+
+
+class QueryCache:
+    def __init__(self, max_entries=256, ttl=30.0, dependents=None):
+        """
+        max_entries: entries kept before the least recently used is evicted
+        ttl: seconds an entry may be served; bounds staleness from writers
+             outside this process
+        dependents: table -> tables that triggers update when it is written
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dependents = dependents or {}
+
+        self._entries = OrderedDict()
+        self._tagged = {}
+        self._generations = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _key(self, query, params):
+        return (query, tuple(params) if params else ())
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for table in entry[2]:
+                keys = self._tagged.get(table)
+                if keys:
+                    keys.discard(key)
+
+    def get(self, query, params=None):
+        """Return a copy of the cached rows, or None on a miss"""
+        key = self._key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            rows, expires, _ = entry
+            if time.monotonic() >= expires:
+                self._drop(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return list(rows)
+
+    def snapshot(self, query):
+        """
+        Record the invalidation state before a read is executed. put() ignores
+        the result if a write to one of its tables happened in between, so a
+        slow read can never cache rows that predate a newer write.
+        """
+        tables = read_tables(query)
+        with self._lock:
+            return (tables, self._global_generation,
+                    {table: self._generations.get(table, 0) for table in tables})
+
+    def put(self, query, params, rows, snapshot):
+        """Cache rows for a query unless its tables were written since the snapshot"""
+        tables, global_generation, generations = snapshot
+        key = self._key(query, params)
+        with self._lock:
+            if global_generation != self._global_generation:
+                return
+            if any(self._generations.get(t, 0) != g for t, g in generations.items()):
+                return
+
+            self._drop(key)
+            self._entries[key] = (list(rows), time.monotonic() + self.ttl, tables)
+            for table in tables:
+                self._tagged.setdefault(table, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate_tables(self, tables):
+        """Evict every entry that reads any of the tables (and their trigger-fed tables)"""
+        pending = list(tables)
+        seen = set()
+        with self._lock:
+            while pending:
+                table = pending.pop().lower()
+                if table in seen:
+                    continue
+                seen.add(table)
+                pending.extend(self.dependents.get(table, ()))
+
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._tagged.pop(table, ())):
+                    if key in self._entries:
+                        self._drop(key)
+                        self._stats['invalidations'] += 1
+
+    def invalidate_for(self, query):
+        """Evict whatever a write statement could have changed"""
+        table = written_table(query)
+        if table:
+            self.invalidate_tables([table])
+        else:
+            self.clear()
+
+    def clear(self):
+        """Evict everything (used for statements whose effect can't be scoped)"""
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._tagged.clear()
+            self._global_generation += 1
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and the current entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,194 @@
+"""
+Query instrumentation for the Inventory Management System
+Aggregates wall time, rows and errors per (operation, statement fingerprint)
+for every query the service layer runs, and writes statements slower than a
+threshold to a slow-query log together with their EXPLAIN plan.
+"""
+
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from tabulate import tabulate
+
+# Statement shapes tracked per operation before the rest are pooled as "(other)"
+MAX_FINGERPRINTS = 1000
+
+# A slow statement shape is EXPLAINed at most this often
+EXPLAIN_INTERVAL = 60.0
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+VALUES_LIST = re.compile(r"(\(\?\+\))(?:\s*,\s*\(\?\+\))+")
+CASE_LIST = re.compile(r"WHEN \? THEN \?(?:\s+WHEN \? THEN \?)+", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_fingerprints = {}
+
+
+def fingerprint(query):
+    """
+    Normalize a statement so every execution of the same shape aggregates
+    together: literals and placeholders become ?, lists of them (?+), and
+    whitespace is collapsed.
+    """
+    cached = _fingerprints.get(query)
+    if cached is not None:
+        return cached
+
+    text = STRING_LITERAL.sub("?", query.replace("%s", "?"))
+    text = NUMBER_LITERAL.sub("?", text)
+    text = PLACEHOLDER_LIST.sub("(?+)", text)
+    text = VALUES_LIST.sub(r"\1", text)
+    text = CASE_LIST.sub("WHEN ? THEN ?+", text)
+    text = WHITESPACE.sub(" ", text).strip()
+
+    if len(_fingerprints) >= MAX_FINGERPRINTS:
+        _fingerprints.clear()
+    _fingerprints[query] = text
+    return text
+
+
+def explain_summary(rows):
+    """Render EXPLAIN rows on one line each, flagging full scans and filesorts"""
+    from migrations import plan_issues
+
+    lines = []
+    for row in rows:
+        issues = plan_issues(row)
+        lines.append(
+            f"  table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+            f"rows={row.get('rows')} extra={row.get('Extra') or ''}"
+            + (f"  <- {', '.join(issues)}" if issues else "")
+        )
+    return "\n".join(lines)
+
+
+class QueryStats:
+    def __init__(self, slow_ms=200.0, slow_log=None):
+        """
+        slow_ms: statements taking at least this long are logged with their
+                 EXPLAIN plan (0 disables the slow-query log)
+        slow_log: path of the slow-query log; stderr if not given
+        """
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+
+        self._entries = {}
+        self._explained = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def _entry(self, operation, shape):
+        key = (operation, shape)
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= MAX_FINGERPRINTS:
+                key = (operation, "(other)")
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = {'calls': 0, 'errors': 0, 'cached': 0, 'rows': 0, 'total': 0.0, 'max': 0.0}
+                self._entries[key] = entry
+        return entry
+
+    def record(self, query, operation, seconds, rows, error=False):
+        """Add one execution; returns True if it crossed the slow-query threshold"""
+        shape = fingerprint(query)
+        with self._lock:
+            entry = self._entry(operation, shape)
+            entry['calls'] += 1
+            entry['errors'] += error
+            entry['rows'] += max(rows or 0, 0)
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+        return bool(self.slow_ms) and seconds * 1000 >= self.slow_ms
+
+    def record_cache_hit(self, query, operation):
+        with self._lock:
+            self._entry(operation, fingerprint(query))['cached'] += 1
+
+    def should_explain(self, query):
+        """True at most once per EXPLAIN_INTERVAL for each statement shape"""
+        shape = fingerprint(query)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained.get(shape, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+                return False
+            self._explained[shape] = now
+            return True
+
+    def log_slow(self, query, operation, seconds, rows, plan=None):
+        """Append a slow statement (and its plan, if one was taken) to the slow-query log"""
+        lines = [
+            f"# {datetime.now().isoformat(sep=' ', timespec='seconds')} {seconds * 1000:.1f} ms "
+            f"rows={rows} operation={operation}",
+            fingerprint(query),
+        ]
+        if plan:
+            lines.append(plan)
+        text = "\n".join(lines) + "\n"
+
+        with self._log_lock:
+            if self.slow_log:
+                with open(self.slow_log, "a") as out:
+                    out.write(text)
+            else:
+                sys.stderr.write(text)
+
+    def snapshot(self):
+        """Return per-statement and per-operation counters, slowest in total first"""
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._entries.items()}
+
+        statements = []
+        operations = {}
+        for (operation, shape), entry in entries.items():
+            statements.append({
+                'operation': operation,
+                'query': shape,
+                'calls': entry['calls'],
+                'cached': entry['cached'],
+                'errors': entry['errors'],
+                'rows': entry['rows'],
+                'total_ms': entry['total'] * 1000,
+                'avg_ms': entry['total'] * 1000 / entry['calls'] if entry['calls'] else 0.0,
+                'max_ms': entry['max'] * 1000,
+            })
+            totals = operations.setdefault(operation, {'queries': 0, 'cached': 0, 'errors': 0, 'total_ms': 0.0})
+            totals['queries'] += entry['calls']
+            totals['cached'] += entry['cached']
+            totals['errors'] += entry['errors']
+            totals['total_ms'] += entry['total'] * 1000
+
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {'operations': dict(sorted(operations.items(), key=lambda item: -item[1]['total_ms'])),
+                'statements': statements}
+
+    def format_report(self, limit=15):
+        """Return a text dump: database time per operation, then the costliest statements"""
+        snapshot = self.snapshot()
+        if not snapshot['statements']:
+            return "No queries recorded."
+
+        operations = tabulate(
+            [[name, o['queries'], o['cached'], o['errors'], f"{o['total_ms']:.1f}"]
+             for name, o in snapshot['operations'].items()],
+            headers=["Operation", "Queries", "Cached", "Errors", "DB ms"], tablefmt="grid"
+        )
+        statements = tabulate(
+            [[s['operation'], s['query'][:60] + ("..." if len(s['query']) > 60 else ""), s['calls'],
+              s['rows'], f"{s['total_ms']:.1f}", f"{s['avg_ms']:.2f}", f"{s['max_ms']:.2f}"]
+             for s in snapshot['statements'][:limit]],
+            headers=["Operation", "Statement", "Calls", "Rows", "Total ms", "Avg ms", "Max ms"],
+            tablefmt="grid"
+        )
+        return f"{operations}\n\nTop statements by total time:\n{statements}"
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._explained.clear()
@@ -0,0 +1,216 @@
+"""
+Table rendering for the Inventory Management System
+Writes rows as they arrive instead of building a whole grid first. Column
+widths come from the first RENDER_SAMPLE_ROWS rows (or are given up front
+from the schema, in which case nothing is held back at all); later cells
+wider than their column are cut with "...". Memory stays bounded by the
+sample however many rows are written.
+
+On a terminal the table is piped through $PAGER (less -FRX by default,
+which exits at once when the table fits on one screen); quitting the pager
+stops reading rows. When output is not a terminal, rows are written as CSV
+or JSON lines (RENDER_FORMAT) so they can be piped into other tools.
+"""
+
+import csv
+import json
+import os
+import shlex
+import subprocess
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+# Rows used to size columns when widths are not given
+RENDER_SAMPLE_ROWS = int(os.getenv('RENDER_SAMPLE_ROWS', '50'))
+
+# No column is wider than this; longer values are truncated
+RENDER_MAX_WIDTH = int(os.getenv('RENDER_MAX_WIDTH', '40'))
+
+# Output format when stdout is not a terminal: csv or json (JSON lines)
+RENDER_FORMAT = os.getenv('RENDER_FORMAT', 'csv')
+
+# Pager for tables written to a terminal; empty disables paging
+PAGER = os.getenv('PAGER', 'less -FRX')
+
+FORMATS = ("table", "csv", "json")
+NUMBERS = (int, float, Decimal)
+
+
+def format_cell(value):
+    """Text of one table cell"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value)
+
+
+def json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def is_terminal(out):
+    isatty = getattr(out, "isatty", None)
+    return bool(isatty and isatty())
+
+
+class TableWriter:
+    def __init__(self, out, headers, widths=None, sample=RENDER_SAMPLE_ROWS, max_width=RENDER_MAX_WIDTH):
+        """
+        out: text stream the grid is written to
+        headers: column titles
+        widths: column widths (None entries are sized from the sample)
+        sample: rows held back to size the remaining columns
+        max_width: upper bound on a sized column's width
+        """
+        self.out = out
+        self.headers = [str(h) for h in headers]
+        self.widths = list(widths) if widths else [None] * len(self.headers)
+        self.sample = sample
+        self.max_width = max_width
+        self.rows = 0
+
+        self._pending = []
+        self._numeric = [True] * len(self.headers)
+        self._started = False
+
+    def _size(self):
+        """Fix every open column width from the held-back rows"""
+        for i, header in enumerate(self.headers):
+            cells = [row[i] for row in self._pending]
+            self._numeric[i] = bool(cells) and all(isinstance(c, NUMBERS) or c is None for c in cells)
+            if self.widths[i] is None:
+                longest = max([len(format_cell(c)) for c in cells] + [0])
+                self.widths[i] = max(len(header), min(longest, self.max_width))
+
+    def _border(self, fill="-"):
+        return "+" + "+".join(fill * (w + 2) for w in self.widths) + "+\n"
+
+    def _line(self, cells, numeric):
+        parts = []
+        for text, width, right in zip(cells, self.widths, numeric):
+            if len(text) > width:
+                text = text[:max(width - 3, 0)] + "..." if width > 3 else text[:width]
+            parts.append(text.rjust(width) if right else text.ljust(width))
+        return "| " + " | ".join(parts) + " |\n"
+
+    def _start(self):
+        self._size()
+        self.out.write(self._border())
+        self.out.write(self._line(self.headers, [False] * len(self.headers)))
+        self.out.write(self._border("="))
+        self._started = True
+        pending, self._pending = self._pending, []
+        for row in pending:
+            self._write(row)
+        self.out.flush()
+
+    def _write(self, row):
+        self.out.write(self._line([format_cell(c) for c in row], self._numeric))
+        self.rows += 1
+
+    def write(self, row):
+        """Add one row; it is written at once unless columns are still being sized"""
+        if self._started:
+            self._write(row)
+            return
+        self._pending.append(list(row))
+        if None not in self.widths or len(self._pending) >= self.sample:
+            self._start()
+
+    def close(self):
+        """Write any held-back rows and the closing border; nothing at all if there were no rows"""
+        if not self._started and self._pending:
+            self._start()
+        if self._started:
+            self.out.write(self._border())
+            self.out.flush()
+
+
+def write_table(rows, headers, out, widths=None):
+    writer = TableWriter(out, headers, widths)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+    return writer.rows
+
+
+def write_csv(rows, headers, out):
+    writer = csv.writer(out)
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow([format_cell(c) for c in row])
+        count += 1
+    out.flush()
+    return count
+
+
+def write_json(rows, headers, out):
+    count = 0
+    for row in rows:
+        out.write(json.dumps({h: json_value(c) for h, c in zip(headers, row)}) + "\n")
+        count += 1
+    out.flush()
+    return count
+
+
+def open_pager():
+    """Start the pager with a text pipe on its input, or return None"""
+    if not PAGER:
+        return None
+    try:
+        return subprocess.Popen(shlex.split(PAGER), stdin=subprocess.PIPE, text=True)
+    except OSError:
+        return None
+
+
+def render(rows, headers, out=None, fmt=None, widths=None, pager=None):
+    """
+    Stream `rows` (sequences in `headers` order) to `out` (stdout by default)
+    and return how many were written.
+
+    fmt: table, csv or json; by default a table on a terminal and
+         RENDER_FORMAT otherwise
+    widths: column widths from the schema, skipping the sizing sample
+    pager: page the table (default: when writing a table to a terminal)
+    """
+    out = out or sys.stdout
+    terminal = is_terminal(out)
+    fmt = fmt or ("table" if terminal else RENDER_FORMAT)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+    if fmt == "csv":
+        return write_csv(rows, headers, out)
+    if fmt == "json":
+        return write_json(rows, headers, out)
+
+    process = open_pager() if (terminal if pager is None else pager) else None
+    if process is None:
+        return write_table(rows, headers, out, widths)
+
+    writer = TableWriter(process.stdin, headers, widths)
+    try:
+        for row in rows:
+            writer.write(row)
+        writer.close()
+    except BrokenPipeError:
+        # The pager was quit early: stop reading rows
+        pass
+    finally:
+        written = writer.rows
+        close = getattr(rows, "close", None)
+        if close:
+            close()
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+    return written
@@ -0,0 +1,197 @@
+"""
+Read replica routing for the Inventory Management System
+Sends the heavy reads (reports, inventory and catalog listings) to read
+replicas listed in REPLICA_DATABASES, so they do not compete with the
+point-of-sale writes on the primary. Writes, reads inside a transaction
+(such as the stock re-read of record_transaction) and single-product
+lookups always use the primary.
+
+Each replica's lag is probed at most every REPLICA_CHECK_INTERVAL seconds
+(Seconds_Behind_Source from SHOW REPLICA STATUS). A read falls back to the
+primary when:
+
+    lagging        every replica is more than REPLICA_MAX_LAG seconds behind
+    unavailable    no replica can be reached, or replication has stopped
+    recent_write   the calling thread wrote one of the tables the read uses
+                   after the last point the replica is known to have applied,
+                   so the replica might not show that write yet
+
+A database that is not replicating from anything (SHOW REPLICA STATUS is
+empty) counts as up to date, so a second local schema can stand in as a
+replica when testing. Queries and time per destination, fallbacks per
+reason and each replica's last lag are reported by get_stats().
+"""
+
+import itertools
+import os
+import threading
+import time
+
+from mysql.connector import Error
+
+from connection_pool import PoolTimeoutError, is_connection_error
+from query_cache import read_tables
+
+REPLICA_CONFIG = {
+    # Comma-separated replica databases (as for SHARD_DATABASES); empty reads from the primary
+    'databases': os.getenv('REPLICA_DATABASES', ''),
+    # Replicas further behind than this many seconds are skipped
+    'max_lag': float(os.getenv('REPLICA_MAX_LAG', '5')),
+    # Seconds between lag probes of one replica
+    'check_interval': float(os.getenv('REPLICA_CHECK_INTERVAL', '2')),
+}
+
+FALLBACK_REASONS = ('lagging', 'unavailable', 'recent_write')
+
+
+class Replica:
+    """One replica database: its backend, its connection pool and the last lag probe"""
+    def __init__(self, name, backend, pool):
+        self.name = name
+        self.backend = backend
+        self.pool = pool
+        # Seconds behind the primary, or None if unreachable or not replicating
+        self.lag = None
+        # time.monotonic() when the lag was probed (0 = never)
+        self.checked_at = 0.0
+        self.error = None
+        self.probing = threading.Lock()
+
+    def applied_until(self):
+        """Monotonic time up to which the replica has applied the primary's writes"""
+        return self.checked_at - self.lag
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, max_lag=None, check_interval=None, dependents=None):
+        """
+        replicas: Replica objects to spread reads over
+        max_lag: seconds behind the primary a replica may be and still serve reads
+        check_interval: seconds between lag probes of one replica
+        dependents: {table: tables its triggers write}, so a write to one
+                    table also holds back reads of the tables it feeds
+        """
+        self.replicas = list(replicas)
+        self.max_lag = max_lag if max_lag is not None else REPLICA_CONFIG['max_lag']
+        self.check_interval = check_interval if check_interval is not None else REPLICA_CONFIG['check_interval']
+        self.dependents = dependents or {}
+        self.rotation = itertools.count()
+        # Per-thread {table: monotonic time of the thread's last write}
+        self.local = threading.local()
+
+        self.lock = threading.Lock()
+        self.routes = {name: {'queries': 0, 'total': 0.0} for name in ['primary'] + [r.name for r in self.replicas]}
+        self.fallbacks = dict.fromkeys(FALLBACK_REASONS, 0)
+
+    def note_write(self, tables):
+        """Record that this thread just wrote `tables` (None in it: a table that could not be told)"""
+        now = time.monotonic()
+        written = getattr(self.local, 'written', None)
+        if written is None:
+            written = self.local.written = {}
+        pending, seen = list(tables), set()
+        while pending:
+            table = pending.pop()
+            table = table.lower() if table is not None else None
+            if table in seen:
+                continue
+            seen.add(table)
+            if table is not None:
+                pending.extend(self.dependents.get(table, ()))
+            written[table] = now
+
+    def last_write(self, query):
+        """When this thread last wrote a table the query reads, or None"""
+        written = getattr(self.local, 'written', None)
+        if not written:
+            return None
+        times = [written[t] for t in read_tables(query) | {None} if t in written]
+        return max(times) if times else None
+
+    def probe(self, replica):
+        """Refresh a replica's lag if it is due; one thread probes while others use the last result"""
+        now = time.monotonic()
+        if now - replica.checked_at < self.check_interval or not replica.probing.acquire(blocking=False):
+            return
+        try:
+            conn = replica.pool.get_connection()
+        except (PoolTimeoutError, Error) as e:
+            replica.lag, replica.error, replica.checked_at = None, str(e), now
+            replica.probing.release()
+            return
+        broken = False
+        try:
+            replica.lag = replica.backend.replica_lag(conn)
+            replica.error = None if replica.lag is not None else "replication is not running"
+        except Error as e:
+            broken = is_connection_error(e)
+            replica.lag, replica.error = None, str(e)
+        finally:
+            replica.checked_at = now
+            replica.pool.release(conn, broken=broken)
+            replica.probing.release()
+
+    def choose(self, query):
+        """
+        The replica to run a read on, or None to use the primary (the reason
+        is counted). Replicas are taken in turn among those fit to serve it.
+        """
+        wrote = self.last_write(query)
+        reasons = set()
+        start = next(self.rotation)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            self.probe(replica)
+            if replica.lag is None:
+                reasons.add('unavailable')
+            elif replica.lag > self.max_lag:
+                reasons.add('lagging')
+            elif wrote is not None and wrote >= replica.applied_until():
+                reasons.add('recent_write')
+            else:
+                return replica
+        reason = next((r for r in FALLBACK_REASONS if r in reasons), 'unavailable')
+        with self.lock:
+            self.fallbacks[reason] += 1
+        return None
+
+    def mark_failed(self, replica, error):
+        """Stop routing to a replica that failed a read until its next lag probe"""
+        replica.lag, replica.error, replica.checked_at = None, str(error), time.monotonic()
+        with self.lock:
+            self.fallbacks['unavailable'] += 1
+
+    def record(self, destination, seconds):
+        with self.lock:
+            route = self.routes[destination]
+            route['queries'] += 1
+            route['total'] += seconds
+
+    def get_stats(self):
+        """Queries and time per destination, fallbacks per reason and each replica's state"""
+        with self.lock:
+            routes = {name: {'queries': r['queries'], 'total_ms': round(r['total'] * 1000, 3),
+                             'avg_ms': round(r['total'] * 1000 / r['queries'], 3) if r['queries'] else 0.0}
+                      for name, r in self.routes.items()}
+            fallbacks = dict(self.fallbacks)
+        replicas = {r.name: {'lag': r.lag, 'available': r.lag is not None and r.lag <= self.max_lag,
+                             'error': r.error} for r in self.replicas}
+        return {'routes': routes, 'fallbacks': fallbacks, 'replicas': replicas}
+
+    def format_report(self):
+        """Text summary for the Query Statistics screen"""
+        stats = self.get_stats()
+        lines = ["Read routing:"]
+        for name, route in stats['routes'].items():
+            state = stats['replicas'].get(name)
+            lag = "" if state is None else (f", lag {state['lag']:.1f}s" if state['lag'] is not None
+                                            else f", unavailable ({state['error']})")
+            lines.append(f"  {name}: {route['queries']} reads, {route['total_ms']:.1f} ms{lag}")
+        lines.append("  fallbacks to primary: " + ", ".join(f"{reason} {count}"
+                                                           for reason, count in stats['fallbacks'].items()))
+        return "\n".join(lines)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+            replica.backend.close()
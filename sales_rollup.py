@@ -0,0 +1,226 @@
+"""
+Daily sales rollup for the Inventory Management System
+daily_sales holds units sold per product per day. A trigger on transactions
+(installed by migration 5) adds every recorded sale to it, so the Sales
+Summary reads days x products-sold rows for any window instead of scanning
+the raw transaction history. This module backfills and verifies it.
+
+Usage:
+    python sales_rollup.py backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python sales_rollup.py verify [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+CREATE_DAILY_SALES_TABLE = """
+CREATE TABLE IF NOT EXISTS daily_sales (
+    sale_date DATE NOT NULL,
+    product_id INT NOT NULL,
+    units_sold BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, product_id)
+)
+"""
+
+DAILY_SALES_TRIGGERS = {
+    "transactions_rollup_insert": """
+CREATE TRIGGER transactions_rollup_insert AFTER INSERT ON transactions FOR EACH ROW
+BEGIN
+    IF NEW.transaction_type = 'sale' THEN
+        INSERT INTO daily_sales (sale_date, product_id, units_sold)
+        VALUES (DATE(NEW.transaction_date), NEW.product_id, NEW.quantity)
+        ON DUPLICATE KEY UPDATE units_sold = units_sold + VALUES(units_sold);
+    END IF;
+END
+""",
+    "transactions_rollup_delete": """
+CREATE TRIGGER transactions_rollup_delete AFTER DELETE ON transactions FOR EACH ROW
+BEGIN
+    IF OLD.transaction_type = 'sale' THEN
+        UPDATE daily_sales SET units_sold = units_sold - OLD.quantity
+        WHERE sale_date = DATE(OLD.transaction_date) AND product_id = OLD.product_id;
+    END IF;
+END
+""",
+}
+
+# Aggregates raw sales for [start, end); served by idx_transactions_type_date
+COMPUTE_DAILY_SALES_QUERY = """
+SELECT DATE(transaction_date) AS sale_date, product_id, SUM(quantity) AS units_sold
+FROM transactions
+WHERE transaction_type = 'sale'
+AND transaction_date >= %s AND transaction_date < %s
+GROUP BY DATE(transaction_date), product_id
+"""
+
+# Initial backfill run by the migration. The trigger is already live by then,
+# so rows it created meanwhile are overwritten with the recomputed total.
+BACKFILL_ALL_QUERY = """
+INSERT INTO daily_sales (sale_date, product_id, units_sold)
+SELECT DATE(transaction_date), product_id, SUM(quantity)
+FROM transactions
+WHERE transaction_type = 'sale'
+GROUP BY DATE(transaction_date), product_id
+ON DUPLICATE KEY UPDATE units_sold = VALUES(units_sold)
+"""
+
+# Days recomputed per backfill transaction, to keep lock time and undo small
+BACKFILL_CHUNK_DAYS = 7
+
+
+def install_triggers(cursor):
+    """(Re)create the trigger that feeds daily_sales"""
+    for name, statement in DAILY_SALES_TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+
+
+def as_date(value):
+    """A DATE or TIMESTAMP value as a date; SQLite returns computed ones (MIN, DATE()) as text"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def history_bounds(connection):
+    """Return the [first day, day after last) range covered by recorded sales"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT MIN(transaction_date), MAX(transaction_date) FROM transactions "
+            "WHERE transaction_type = 'sale'"
+        )
+        first, last = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    if first is None:
+        return None, None
+    return as_date(first), as_date(last) + timedelta(days=1)
+
+
+def backfill_daily_sales(connection, start=None, end=None, chunk_days=BACKFILL_CHUNK_DAYS):
+    """
+    Recompute daily_sales for [start, end) from raw transactions, one chunk of
+    days per transaction. Defaults to the whole history. Returns rows written.
+    """
+    if start is None or end is None:
+        first, last = history_bounds(connection)
+        if first is None:
+            return 0
+        start = start or first
+        end = end or last
+
+    cursor = connection.cursor()
+    written = 0
+    try:
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+            connection.start_transaction()
+            cursor.execute(
+                "DELETE FROM daily_sales WHERE sale_date >= %s AND sale_date < %s",
+                (chunk_start, chunk_end)
+            )
+            cursor.execute(
+                "INSERT INTO daily_sales (sale_date, product_id, units_sold) " + COMPUTE_DAILY_SALES_QUERY,
+                (chunk_start, chunk_end)
+            )
+            written += cursor.rowcount
+            connection.commit()
+            print(f"  Rolled up sales for {chunk_start} to {chunk_end - timedelta(days=1)}")
+            chunk_start = chunk_end
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return written
+
+
+def verify_daily_sales(connection, start=None, end=None):
+    """
+    Compare daily_sales with raw transactions for [start, end).
+    Returns a list of (sale_date, product_id, expected, actual) mismatches.
+    """
+    if start is None or end is None:
+        first, last = history_bounds(connection)
+        if first is None:
+            return []
+        start = start or first
+        end = end or last
+
+    cursor = connection.cursor()
+    try:
+        connection.start_transaction(readonly=True, isolation_level="REPEATABLE READ")
+        cursor.execute(COMPUTE_DAILY_SALES_QUERY, (start, end))
+        expected = {(as_date(row[0]), row[1]): row[2] for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT sale_date, product_id, units_sold FROM daily_sales "
+            "WHERE sale_date >= %s AND sale_date < %s",
+            (start, end)
+        )
+        actual = {(as_date(row[0]), row[1]): row[2] for row in cursor.fetchall()}
+        connection.commit()
+    finally:
+        cursor.close()
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        want, have = expected.get(key, 0), actual.get(key, 0)
+        if want != have:
+            mismatches.append((key[0], key[1], want, have))
+    return mismatches
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the daily_sales rollup table")
+    parser.add_argument("command", choices=["backfill", "verify"])
+    parser.add_argument("--start", type=parse_date, help="First day to process (default: first sale)")
+    parser.add_argument("--end", type=parse_date, help="Last day to process, inclusive (default: last sale)")
+    args = parser.parse_args(argv)
+
+    end = args.end + timedelta(days=1) if args.end else None
+
+    from service import DB_CONFIG
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return 1
+
+    try:
+        if args.command == "backfill":
+            rows = backfill_daily_sales(conn, args.start, end)
+            print(f"Backfilled {rows} product-day rows.")
+            return 0
+
+        mismatches = verify_daily_sales(conn, args.start, end)
+        if not mismatches:
+            print("daily_sales matches the transaction history.")
+            return 0
+        for sale_date, product_id, want, have in mismatches[:50]:
+            print(f"{sale_date} product {product_id}: expected {want} units, found {have}")
+        print(f"\n{len(mismatches)} mismatched rows. Run 'python sales_rollup.py backfill' to repair.")
+        return 1
+    except Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Product search for the Inventory Management System
+Finds products by name and description. Every word of the search must
+appear in the product, as the start of a word or anywhere inside one, so
+'lap', 'top' and 'stand lap' all find 'Laptop Stand'.
+
+Lookups go through a full-text index that the database keeps current on
+every product insert, update and delete: a FULLTEXT index with the ngram
+parser on MySQL (migration 9) and an FTS5 table with the trigram tokenizer
+on SQLite. Both index every short run of characters, so a substring is an
+index lookup rather than a LIKE '%...%' scan of the catalog. Words shorter
+than the n-gram size cannot be looked up that way; they are checked against
+the candidates the longer words found, or, when the whole search is short
+(a user who has typed two letters), matched as a name prefix on the name
+index.
+
+The index returns up to SEARCH_CANDIDATES products, name prefixes first,
+and they are ranked here by how they match (MATCH_CLASSES, best first),
+then by shorter name, so 'cable' puts the product named 'Cable' before
+'Cable Tie', and both before 'USB-C Cable'.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+SEARCH_CONFIG = {
+    # Products read from the full-text index per search, before ranking
+    'candidates': int(os.getenv('SEARCH_CANDIDATES', '200')),
+    # Results returned when the caller does not say
+    'limit': int(os.getenv('SEARCH_LIMIT', '20')),
+}
+
+# How a product matched, best first
+MATCH_CLASSES = ('exact', 'prefix', 'word', 'name', 'description')
+
+# Searches longer than this are cut, as no product name is longer
+MAX_SEARCH_LENGTH = 100
+
+WORD = re.compile(r"\w+")
+
+SearchQuery = namedtuple("SearchQuery", ["query", "min_term"])
+
+SEARCH_COLUMNS = """
+SELECT p.product_id, p.name, p.description, p.price, c.name as category, i.quantity"""
+
+SEARCH_JOINS = """
+LEFT JOIN categories c ON p.category_id = c.category_id
+LEFT JOIN inventory i ON p.product_id = i.product_id"""
+
+# ngram_token_size defaults to 2; words shorter than it match nothing
+MYSQL_SEARCH_QUERY = SEARCH_COLUMNS + """
+FROM products p""" + SEARCH_JOINS + """
+WHERE MATCH (p.name, p.description) AGAINST (%s IN BOOLEAN MODE)
+ORDER BY p.name LIKE %s ESCAPE '!' DESC, MATCH (p.name, p.description) AGAINST (%s IN BOOLEAN MODE) DESC
+LIMIT %s
+"""
+
+# The trigram tokenizer needs at least 3 characters per word
+SQLITE_SEARCH_QUERY = SEARCH_COLUMNS + """
+FROM products_search s
+JOIN products p ON p.product_id = s.rowid""" + SEARCH_JOINS + """
+WHERE products_search MATCH %s
+ORDER BY p.name LIKE %s ESCAPE '!' DESC, s.rank
+LIMIT %s
+"""
+
+SEARCH_QUERIES = {
+    'mysql': SearchQuery(MYSQL_SEARCH_QUERY, 2),
+    'sqlite': SearchQuery(SQLITE_SEARCH_QUERY, 3),
+}
+
+# Range read on idx_products_name, for searches too short for the full-text index
+NAME_PREFIX_QUERY = SEARCH_COLUMNS + """
+FROM products p""" + SEARCH_JOINS + """
+WHERE p.name LIKE %s ESCAPE '!'
+ORDER BY p.name
+LIMIT %s
+"""
+
+# The SQLite counterpart of migration 9's FULLTEXT index. It stores no text
+# of its own (content='products'); triggers in sqlite_backend.py feed it.
+CREATE_SQLITE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_search USING fts5(
+    name, description, content='products', content_rowid='product_id', tokenize='trigram'
+)"""
+
+REBUILD_SQLITE_SEARCH_QUERY = "INSERT INTO products_search (products_search) VALUES ('rebuild')"
+
+
+def normalize(text):
+    """Return the search as lower-case text with single spaces, and its distinct words"""
+    text = " ".join((text or "").replace('"', " ").split()).casefold()[:MAX_SEARCH_LENGTH]
+    return text, list(dict.fromkeys(text.split()))
+
+
+def like_prefix(text):
+    """A LIKE pattern (with ESCAPE '!') matching names that start with `text`"""
+    return re.sub(r"([!%_])", r"!\1", text) + "%"
+
+
+def build_search_query(backend, text, candidates=None):
+    """
+    Return (query, params) reading the candidate products for a search on
+    the named storage backend, or None for a search with no words.
+    """
+    text, terms = normalize(text)
+    if not terms:
+        return None
+    candidates = candidates or SEARCH_CONFIG['candidates']
+    search = SEARCH_QUERIES[backend]
+    indexed = [term for term in terms if len(term) >= search.min_term]
+    if not indexed:
+        return NAME_PREFIX_QUERY, (like_prefix(text), candidates)
+    if backend == 'mysql':
+        against = " ".join(f'+"{term}"' for term in indexed)
+        return search.query, (against, like_prefix(text), against, candidates)
+    return search.query, (" ".join(f'"{term}"' for term in indexed), like_prefix(text), candidates)
+
+
+def match_class(product, text, terms):
+    """Return the best of MATCH_CLASSES a product matches the search with, or None"""
+    name = product['name'].casefold()
+    if name == text:
+        return 'exact'
+    if name.startswith(text):
+        return 'prefix'
+    words = WORD.findall(name)
+    if all(any(word.startswith(term) for word in words) for term in terms):
+        return 'word'
+    if text in name or all(term in name for term in terms):
+        return 'name'
+    description = (product['description'] or "").casefold()
+    if all(term in name or term in description for term in terms):
+        return 'description'
+    return None
+
+
+def rank_products(products, text, limit=None):
+    """
+    Return the products that match every word of the search, best first,
+    each with its 'match' class added. Used on one database's candidates and
+    on the candidates of every shard together.
+    """
+    text, terms = normalize(text)
+    ranked = []
+    for product in products:
+        match = match_class(product, text, terms)
+        if match is not None:
+            ranked.append(dict(product, match=match))
+    ranked.sort(key=lambda p: (MATCH_CLASSES.index(p['match']), len(p['name']),
+                               p['name'].casefold(), p['product_id']))
+    return ranked[:limit or SEARCH_CONFIG['limit']]
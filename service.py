@@ -0,0 +1,1182 @@
+"""
+Service layer for the Inventory Management System
+All database access and business operations, free of prompts and printing
+of results, so the interactive menu (app.py), the command-line interface
+(cli.py) and the HTTP API (http_api.py) share one implementation.
+"""
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.abstracts import MySQLConnectionAbstract
+import os
+from dotenv import load_dotenv
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import alerts
+from connection_pool import ConnectionPool, PoolTimeoutError, is_connection_error
+from query_cache import QueryCache, is_cacheable, written_table
+from query_stats import EXPLAINABLE, QueryStats, explain_summary
+from replicas import REPLICA_CONFIG, Replica, ReplicaRouter
+from search import SEARCH_CONFIG, build_search_query, rank_products
+from statements import StatementRegistry
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', '3306')),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': 'inventory_management',
+    'charset': 'utf8mb4',
+    # The C extension parses packets in C; the pure-Python protocol is the
+    # fallback where it is not installed (or with DB_USE_PURE=1)
+    'use_pure': os.getenv('DB_USE_PURE', '0' if mysql.connector.HAVE_CEXT else '1') == '1'
+}
+
+# Storage backend: 'mysql' (DB_CONFIG above) or 'sqlite', an embedded
+# database in SQLITE_PATH (a file, or :memory: for a throwaway one)
+STORAGE_CONFIG = {
+    'backend': os.getenv('DB_BACKEND', 'mysql'),
+    'sqlite_path': os.getenv('SQLITE_PATH', 'inventory.db')
+}
+
+# Rows per page on the product catalog screen
+PRODUCTS_PAGE_SIZE = int(os.getenv('PRODUCTS_PAGE_SIZE', '20'))
+
+# Rows pulled from the server per round trip when streaming results
+FETCH_BATCH_SIZE = 1000
+
+# Connection pool configuration
+POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', '5')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+}
+
+# Statements a unit of work queues before sending them as one pipelined batch
+UNIT_OF_WORK_BATCH = int(os.getenv('UNIT_OF_WORK_BATCH', '100'))
+
+# Query result cache configuration (QUERY_CACHE_SIZE=0 disables it)
+QUERY_CACHE_CONFIG = {
+    'max_entries': int(os.getenv('QUERY_CACHE_SIZE', '0')),
+    'ttl': float(os.getenv('QUERY_CACHE_TTL', '30'))
+}
+
+# Query instrumentation: statements at least QUERY_SLOW_MS long are written
+# with their EXPLAIN plan to SLOW_QUERY_LOG (stderr if unset; 0 ms disables)
+QUERY_STATS_CONFIG = {
+    'slow_ms': float(os.getenv('QUERY_SLOW_MS', '200')),
+    'slow_log': os.getenv('SLOW_QUERY_LOG') or None
+}
+
+# Tables whose triggers write to other tables; a write to the key must also
+# invalidate cached reads of the values
+TRIGGER_DEPENDENTS = {
+    'products': ('category_stats', 'low_stock', 'stock_alerts'),
+    'categories': ('low_stock', 'stock_alerts'),
+    'inventory': ('category_stats', 'low_stock', 'stock_alerts'),
+    'transactions': ('daily_sales',)
+}
+
+# Registered statements are prepared once per MySQL connection and reused
+# (DB_PREPARED_STATEMENTS=0 sends every statement as text instead)
+STATEMENTS = StatementRegistry(enabled=os.getenv('DB_PREPARED_STATEMENTS', '1') == '1')
+
+# Queries issued by the application. Kept at module level so tooling
+# (e.g. the EXPLAIN check in migrations.py) can inspect exactly what runs.
+
+# Keyset pagination: each page starts after the last product_id shown, so
+# page N costs the same index range read as page 1
+VIEW_PRODUCTS_PAGE_QUERY = STATEMENTS.register("products_page", """
+SELECT p.product_id, p.name, p.description, p.price, c.name as category, i.quantity
+FROM products p
+LEFT JOIN categories c ON p.category_id = c.category_id
+LEFT JOIN inventory i ON p.product_id = i.product_id
+WHERE p.product_id > %s
+ORDER BY p.product_id
+LIMIT %s
+""")
+
+VIEW_INVENTORY_QUERY = STATEMENTS.register("inventory_levels", """
+SELECT p.product_id, p.name, i.quantity, p.price, (p.price * i.quantity) as total_value
+FROM inventory i
+JOIN products p ON i.product_id = p.product_id
+ORDER BY i.quantity DESC
+""")
+
+# Transaction history, newest first. Filters and the keyset cursor are
+# filled in by build_transaction_query; (transaction_date, transaction_id)
+# is unique, so it identifies a position in the history exactly.
+TRANSACTION_HISTORY_QUERY = """
+SELECT t.transaction_id, t.product_id, p.name as product, t.quantity, t.transaction_type,
+       t.transaction_date, t.notes
+FROM transactions t
+JOIN products p ON t.product_id = p.product_id
+{where}
+ORDER BY t.transaction_date {order}, t.transaction_id {order}
+LIMIT %s
+"""
+
+TRANSACTIONS_PAGE_SIZE = int(os.getenv('TRANSACTIONS_PAGE_SIZE', '50'))
+
+# One page of transaction history. older/newer are (transaction_date,
+# transaction_id) cursors for the neighbouring pages, or None at either end.
+TransactionPage = namedtuple('TransactionPage', ['rows', 'older', 'newer'])
+
+_transaction_queries = {}
+_transaction_queries_lock = threading.Lock()
+
+def build_transaction_query(product_id=None, transaction_type=None, start_date=None,
+                            end_date=None, before=None, after=None, limit=TRANSACTIONS_PAGE_SIZE):
+    """
+    Build the history query for the given filters. `before` selects the rows
+    older than a cursor (the next page), `after` the rows newer than it (the
+    previous page). `end_date` is exclusive.
+    """
+    conditions = []
+    params = []
+    
+    if product_id is not None:
+        conditions.append("t.product_id = %s")
+        params.append(product_id)
+    if transaction_type is not None:
+        conditions.append("t.transaction_type = %s")
+        params.append(transaction_type)
+    if start_date is not None:
+        conditions.append("t.transaction_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("t.transaction_date < %s")
+        params.append(end_date)
+    
+    if after is not None:
+        conditions.append("(t.transaction_date, t.transaction_id) > (%s, %s)")
+        params.extend(after)
+        order = "ASC"
+    else:
+        if before is not None:
+            conditions.append("(t.transaction_date, t.transaction_id) < (%s, %s)")
+            params.extend(before)
+        order = "DESC"
+    
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    params.append(limit)
+    
+    # There are a few dozen filter combinations; each is built and
+    # registered once so it can stay prepared like the fixed statements
+    key = (where, order)
+    with _transaction_queries_lock:
+        query = _transaction_queries.get(key)
+        if query is None:
+            query = STATEMENTS.register(
+                f"transaction_history_{len(_transaction_queries) + 1}",
+                TRANSACTION_HISTORY_QUERY.format(where=where, order=order)
+            )
+            _transaction_queries[key] = query
+    return query, tuple(params)
+
+# Category figures come from category_stats, which triggers keep current,
+# so these screens read one row per category instead of the whole catalog
+VIEW_CATEGORIES_QUERY = STATEMENTS.register("categories", """
+SELECT c.category_id, c.name, c.description, COALESCE(s.product_count, 0) as product_count
+FROM categories c
+LEFT JOIN category_stats s ON s.category_id = c.category_id
+ORDER BY c.name
+""")
+
+INVENTORY_TOTAL_QUERY = STATEMENTS.register("inventory_total", """
+SELECT COALESCE(SUM(total_value), 0) as total_value FROM category_stats
+""")
+
+# Read from the trigger-maintained low_stock set, which holds only the
+# products below their reorder point, instead of filtering all inventory
+LOW_STOCK_QUERY = STATEMENTS.register("low_stock", """
+SELECT p.product_id, p.name, l.quantity, l.reorder_point, c.name as category
+FROM low_stock l
+JOIN products p ON l.product_id = p.product_id
+JOIN categories c ON p.category_id = c.category_id
+ORDER BY l.quantity
+""")
+
+PENDING_ALERTS_QUERY = STATEMENTS.register("pending_alerts", alerts.PENDING_ALERTS_QUERY)
+
+ACKNOWLEDGE_ALERTS_QUERY = STATEMENTS.register("acknowledge_alerts", alerts.ACKNOWLEDGE_ALERTS_QUERY)
+
+HIGH_VALUE_QUERY = STATEMENTS.register("high_value", """
+SELECT p.name, i.quantity, p.price, (p.price * i.quantity) as total_value
+FROM inventory i
+JOIN products p ON i.product_id = p.product_id
+ORDER BY total_value DESC
+LIMIT 10
+""")
+
+# Answered from the daily_sales rollup: cost grows with days x products sold
+# in the window, not with the number of raw transactions
+SALES_SUMMARY_QUERY = STATEMENTS.register("sales_summary", """
+SELECT p.name, SUM(d.units_sold) as units_sold,
+       SUM(d.units_sold) * p.price as revenue
+FROM daily_sales d
+JOIN products p ON d.product_id = p.product_id
+WHERE d.sale_date >= %s AND d.sale_date < %s
+GROUP BY p.product_id
+HAVING units_sold > 0
+ORDER BY revenue DESC
+""")
+
+CATEGORY_SUMMARY_QUERY = STATEMENTS.register("category_summary", """
+SELECT c.category_id, c.name as category, COALESCE(s.product_count, 0) as product_count,
+       COALESCE(s.total_units, 0) as total_units,
+       COALESCE(s.total_value, 0) as total_value
+FROM categories c
+LEFT JOIN category_stats s ON s.category_id = c.category_id
+ORDER BY total_value DESC
+""")
+
+# Applies a relative stock change only if the result stays at or above the
+# floor. LAST_INSERT_ID(expr) makes the server report the new quantity in the
+# UPDATE's OK packet, so no follow-up SELECT is needed to read it back.
+ADJUST_STOCK_QUERY = STATEMENTS.register("adjust_stock", """
+UPDATE inventory
+SET quantity = LAST_INSERT_ID(quantity + %s)
+WHERE product_id = %s AND quantity + %s >= %s
+""")
+
+PRODUCT_DETAILS_QUERY = STATEMENTS.register("product_details", """
+SELECT p.product_id, p.sku, p.name, p.description, p.price, p.category_id, p.reorder_point,
+       c.name as category, c.reorder_point as category_reorder_point
+FROM products p
+LEFT JOIN categories c ON p.category_id = c.category_id
+WHERE p.product_id = %s
+""")
+
+STOCK_LEVEL_QUERY = STATEMENTS.register("stock_level", """
+SELECT p.name, i.quantity
+FROM products p
+JOIN inventory i ON p.product_id = i.product_id
+WHERE p.product_id = %s
+""")
+
+CATEGORY_CHOICES_QUERY = STATEMENTS.register(
+    "category_choices", "SELECT category_id, name FROM categories ORDER BY category_id"
+)
+
+INSERT_TRANSACTION_QUERY = STATEMENTS.register("insert_transaction", """
+INSERT INTO transactions (product_id, quantity, transaction_type, notes)
+VALUES (%s, %s, %s, %s)
+""")
+
+STOCK_QUANTITY_QUERY = STATEMENTS.register(
+    "stock_quantity", "SELECT quantity FROM inventory WHERE product_id = %s"
+)
+
+SET_STOCK_QUERY = STATEMENTS.register(
+    "set_stock", "UPDATE inventory SET quantity = %s WHERE product_id = %s"
+)
+
+INSERT_CATEGORY_QUERY = STATEMENTS.register(
+    "insert_category", "INSERT INTO categories (name, description) VALUES (%s, %s)"
+)
+
+INSERT_PRODUCT_QUERY = STATEMENTS.register("insert_product", """
+INSERT INTO products (sku, name, description, price, category_id)
+VALUES (%s, %s, %s, %s, %s)
+""")
+
+# Queued right after INSERT_PRODUCT_QUERY in the same batch, so the new
+# product's id is taken from the session instead of a round trip
+INSERT_INVENTORY_QUERY = STATEMENTS.register(
+    "insert_inventory", "INSERT INTO inventory (product_id, quantity) VALUES (LAST_INSERT_ID(), %s)"
+)
+
+UPDATE_PRODUCT_QUERY = STATEMENTS.register("update_product", """
+UPDATE products
+SET name = %s, description = %s, price = %s, category_id = %s
+WHERE product_id = %s
+""")
+
+SET_REORDER_POINT_QUERY = STATEMENTS.register(
+    "set_reorder_point", "UPDATE products SET reorder_point = %s WHERE product_id = %s"
+)
+
+SET_CATEGORY_REORDER_POINT_QUERY = STATEMENTS.register(
+    "set_category_reorder_point", "UPDATE categories SET reorder_point = %s WHERE category_id = %s"
+)
+
+# delete_product removes children first because of the foreign key constraints
+DELETE_PRODUCT_QUERIES = (
+    STATEMENTS.register("delete_inventory", "DELETE FROM inventory WHERE product_id = %s"),
+    STATEMENTS.register("delete_transactions", "DELETE FROM transactions WHERE product_id = %s"),
+    STATEMENTS.register("delete_product", "DELETE FROM products WHERE product_id = %s"),
+)
+
+TRANSACTION_TYPES = ('sale', 'restock')
+
+class StockError(Exception):
+    """Raised when a stock change is rejected (unknown product or guard violated)"""
+
+# Service methods that only carry queries; current_operation() looks past them
+QUERY_PLUMBING = {
+    'execute_query', 'run_query', 'run_in_transaction', 'run_statement', 'iter_query', 'timed_execute',
+    'record_query', 'current_operation', 'run_batch', 'flush', 'flush_pending', 'unit_of_work', '__exit__',
+    '<genexpr>', '<listcomp>'
+}
+
+# Connections that accept several statements in one round trip
+PIPELINED_CONNECTIONS = (MySQLConnectionAbstract,)
+
+class StatementResult:
+    """Outcome of a statement queued in a unit of work, filled in when its batch is sent"""
+    def __init__(self, query):
+        self.query = query
+        self.rowcount = None
+        self.lastrowid = None
+        self.done = False
+
+class UnitOfWork:
+    """
+    Write statements queued by InventoryService.unit_of_work(). They are
+    sent in batches, several statements per round trip where the connection
+    allows it, and committed together when the with-block ends.
+    """
+    def __init__(self, service, conn, batch_size=UNIT_OF_WORK_BATCH):
+        self.service = service
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = []
+    
+    def execute(self, query, params=()):
+        """Queue a write and return its StatementResult, complete once flushed"""
+        result = StatementResult(query)
+        self.pending.append((query, tuple(params), result))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return result
+    
+    def flush(self):
+        """Send the queued statements now; errors propagate and abort the unit"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.service.run_batch(self.conn, batch)
+    
+    def discard(self):
+        """Drop statements queued but not yet sent"""
+        self.pending = []
+
+class MySQLBackend:
+    """Storage on a MySQL server, reached with DB_CONFIG unless given another config"""
+    name = 'mysql'
+    
+    def __init__(self, config=None):
+        self.config = config or DB_CONFIG
+    
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+    
+    def replica_lag(self, conn):
+        """
+        Seconds this server's replication is behind its source: 0 if it is
+        not a replica at all, None if replication is stopped
+        """
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Error as e:
+                if e.errno != 1064:
+                    raise
+                # Servers before 8.0.22 only know the old name
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if row is None:
+            return 0.0
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return None if lag is None else float(lag)
+    
+    def pool_size(self, requested):
+        return requested
+    
+    def close(self):
+        pass
+
+def database_config(spec):
+    """DB_CONFIG pointed at 'database', 'host/database' or 'host:port/database'"""
+    config = dict(DB_CONFIG)
+    location, _, database = spec.strip().rpartition("/")
+    if location:
+        host, _, port = location.partition(":")
+        config['host'] = host or config['host']
+        if port:
+            config['port'] = int(port)
+    config['database'] = database
+    return config
+
+def create_replica_router(backends, names=None, max_lag=None, check_interval=None):
+    """A ReplicaRouter over replica backends, each with its own connection pool"""
+    names = names or [f"replica{i}" for i in range(len(backends))]
+    replicas = [
+        Replica(name, backend, ConnectionPool(backend.connect,
+                                              **dict(POOL_CONFIG, size=backend.pool_size(POOL_CONFIG['size']))))
+        for name, backend in zip(names, backends)
+    ]
+    return ReplicaRouter(replicas, max_lag, check_interval, dependents=TRIGGER_DEPENDENTS)
+
+def create_backend(name=None, path=None):
+    """
+    Return the storage backend named by STORAGE_CONFIG (or `name`). Backends
+    provide connect() returning mysql.connector-compatible connections,
+    pool_size(), replica_lag() and close(); the service and its queries are
+    the same on each.
+    """
+    name = (name or STORAGE_CONFIG['backend']).lower()
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        from sqlite_backend import SQLiteBackend
+        return SQLiteBackend(path or STORAGE_CONFIG['sqlite_path'])
+    raise ValueError(f"Unknown storage backend '{name}'; expected mysql or sqlite.")
+
+class InventoryService:
+    def __init__(self, pool=None, cache=None, stats=None, backend=None, statements=None, replicas=None):
+        # REPLICA_DATABASES are replicas of the default database, not of one given here
+        if replicas is None and backend is None and REPLICA_CONFIG['databases'].strip():
+            specs = [spec.strip() for spec in REPLICA_CONFIG['databases'].split(",") if spec.strip()]
+            replicas = create_replica_router(
+                [create_backend(path=spec) if STORAGE_CONFIG['backend'].lower() == 'sqlite'
+                 else MySQLBackend(database_config(spec)) for spec in specs], specs
+            )
+        self.backend = backend or create_backend()
+        if pool is None:
+            pool = ConnectionPool(self.create_connection,
+                                  **dict(POOL_CONFIG, size=self.backend.pool_size(POOL_CONFIG['size'])))
+        self.pool = pool
+        if cache is None and QUERY_CACHE_CONFIG['max_entries'] > 0:
+            cache = QueryCache(dependents=TRIGGER_DEPENDENTS, **QUERY_CACHE_CONFIG)
+        self.cache = cache
+        self.stats = stats or QueryStats(**QUERY_STATS_CONFIG)
+        self.statements = statements or STATEMENTS
+        self.pipelined_connections = PIPELINED_CONNECTIONS
+        # Routes reads marked replica=True to read replicas; None reads everything from the primary
+        self.replicas = replicas
+        # Per-thread state: the connection and tables written by transaction(),
+        # and the operation label set by operation()
+        self.local = threading.local()
+    
+    def create_connection(self):
+        """Create a new database connection on the storage backend for the pool"""
+        return self.backend.connect()
+    
+    def get_connection(self, pool=None):
+        """Check a connection out of the pool (or a replica's), or return None if none is available"""
+        try:
+            return (pool or self.pool).get_connection()
+        except PoolTimeoutError as e:
+            print(f"Error getting database connection: {e}")
+        except Error as e:
+            print(f"Error connecting to MySQL: {e}")
+        return None
+    
+    def pinned_connection(self):
+        """Return the connection of the transaction open in this thread, if any"""
+        return getattr(self.local, 'connection', None)
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run every query issued in the with-block on one pooled connection and
+        commit once at the end, rolling everything back if an exception escapes.
+        
+        Inside the block, queries raise mysql.connector errors instead of
+        printing them and returning None, so a failure aborts the whole unit.
+        Nested calls join the outer transaction.
+        """
+        if self.pinned_connection() is not None:
+            yield self.pinned_connection()
+            return
+        
+        conn = self.pool.get_connection()
+        self.local.connection = conn
+        self.local.written = set()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            broken = is_connection_error(e)
+            try:
+                conn.rollback()
+            except Error:
+                broken = True
+            raise
+        finally:
+            written = self.local.written
+            self.local.connection = None
+            self.local.written = None
+            self.pool.release(conn, broken=broken)
+            if self.replicas is not None and written:
+                self.replicas.note_write(written)
+            # Invalidate again now the writes are visible to other connections
+            if self.cache is not None and written:
+                if None in written:
+                    self.cache.clear()
+                else:
+                    self.cache.invalidate_tables(written)
+    
+    @contextmanager
+    def operation(self, name):
+        """Attribute the queries issued in the with-block to a named screen, command or endpoint"""
+        outer = getattr(self.local, 'operation', None)
+        self.local.operation = name
+        try:
+            yield
+        finally:
+            self.local.operation = outer
+    
+    def current_operation(self):
+        """The label set by operation(), else the public service method running the query"""
+        name = getattr(self.local, 'operation', None)
+        if name:
+            return name
+        frame = sys._getframe(1)
+        while frame is not None and frame.f_code.co_name in QUERY_PLUMBING:
+            frame = frame.f_back
+        return frame.f_code.co_name if frame is not None else "other"
+    
+    def timed_execute(self, conn, cursor, query, params=None, fetch=False):
+        """
+        Execute a statement on a cursor and record its wall time, rows and
+        any error in the query stats. Returns the rows when fetching.
+        """
+        started = time.perf_counter()
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchall() if fetch else None
+        except Error as e:
+            self.stats.record(query, self.current_operation(), time.perf_counter() - started, 0, error=True)
+            self.statements.failed(conn, query, e)
+            raise
+        
+        count = len(rows) if fetch else cursor.rowcount
+        self.record_query(conn, query, params, time.perf_counter() - started, count)
+        return rows
+    
+    def record_query(self, conn, query, params, seconds, rows):
+        """Add an execution to the stats, logging it with its plan if it was slow"""
+        operation = self.current_operation()
+        if not self.stats.record(query, operation, seconds, rows):
+            return
+        
+        plan = None
+        if query.lstrip()[:7].upper().startswith(EXPLAINABLE) and self.stats.should_explain(query):
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                cursor.execute("EXPLAIN " + query, params or ())
+                plan = explain_summary(cursor.fetchall())
+            except Error as e:
+                plan = f"  EXPLAIN failed: {e}"
+            finally:
+                cursor.close()
+        self.stats.log_slow(query, operation, seconds, rows, plan)
+    
+    @contextmanager
+    def savepoint(self, name="statement"):
+        """Inside transaction(), undo only the with-block's writes if it fails"""
+        conn = self.pinned_connection()
+        # Queued statements must reach the server on the right side of the savepoint
+        self.flush_pending()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {name}")
+            try:
+                yield
+                self.flush_pending()
+            except BaseException:
+                work = getattr(self.local, 'work', None)
+                if work is not None:
+                    work.discard()
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                raise
+        finally:
+            cursor.close()
+    
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Group writes into one transaction that commits once. Statements given
+        to the yielded UnitOfWork are queued and sent in pipelined batches (one
+        round trip per batch on MySQL) when it is flushed, before any read on
+        the connection, and when the block ends; execute_query calls in the
+        block join the same transaction. Any failure rolls everything back.
+        Nested calls join the outer unit of work or transaction.
+        """
+        work = getattr(self.local, 'work', None)
+        if work is not None:
+            yield work
+            return
+        
+        with self.transaction() as conn:
+            work = UnitOfWork(self, conn)
+            self.local.work = work
+            try:
+                yield work
+                work.flush()
+            finally:
+                self.local.work = None
+    
+    def flush_pending(self):
+        """Send this thread's queued unit-of-work statements, if any"""
+        work = getattr(self.local, 'work', None)
+        if work is not None:
+            work.flush()
+    
+    def run_batch(self, conn, batch):
+        """
+        Execute queued (query, params, StatementResult) entries on the pinned
+        connection. Several statements go to MySQL as one multi-statement
+        round trip; otherwise each runs on its own (prepared) cursor.
+        """
+        if len(batch) > 1 and isinstance(conn, self.pipelined_connections):
+            text = ";\n".join(query.strip().rstrip(";") for query, _, _ in batch)
+            params = [value for _, values, _ in batch for value in values]
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            try:
+                for (query, _, result), executed in zip(batch, cursor.execute(text, params, multi=True)):
+                    result.rowcount, result.lastrowid, result.done = executed.rowcount, executed.lastrowid, True
+            except Error:
+                self.stats.record(text, self.current_operation(), time.perf_counter() - started, 0, error=True)
+                raise
+            finally:
+                cursor.close()
+            # The round trip is shared, so each statement is charged an equal part
+            share = (time.perf_counter() - started) / len(batch)
+            for query, _, result in batch:
+                self.stats.record(query, self.current_operation(), share, result.rowcount)
+        else:
+            for query, params, result in batch:
+                cursor = self.statements.cursor(conn, query)
+                try:
+                    self.timed_execute(conn, cursor, query, params)
+                    result.rowcount, result.lastrowid, result.done = cursor.rowcount, cursor.lastrowid, True
+                finally:
+                    cursor.close()
+        
+        for query, _, _ in batch:
+            # None marks a write whose table could not be determined
+            self.local.written.add(written_table(query))
+            if self.cache is not None:
+                self.cache.invalidate_for(query)
+    
+    def execute_query(self, query, params=None, fetch=False, return_id=False, replica=False):
+        """
+        Execute a query, serving repeated reads from the result cache when
+        enabled. replica=True lets a read run on a read replica (see replicas.py).
+        """
+        # Reads inside a transaction may see its uncommitted writes, so they
+        # must neither be served from nor stored in the shared cache
+        if self.cache is None or self.pinned_connection() is not None:
+            result = self.run_query(query, params, fetch, return_id, replica)
+            if self.cache is not None and not fetch:
+                self.cache.invalidate_for(query)
+            return result
+        
+        if fetch and is_cacheable(query):
+            rows = self.cache.get(query, params)
+            if rows is not None:
+                self.stats.record_cache_hit(query, self.current_operation())
+                return rows
+            
+            snapshot = self.cache.snapshot(query)
+            rows = self.run_query(query, params, fetch, replica=replica)
+            if rows is not None:
+                self.cache.put(query, params, rows, snapshot)
+            return rows
+        
+        result = self.run_query(query, params, fetch, return_id)
+        if not fetch:
+            self.cache.invalidate_for(query)
+        return result
+    
+    def run_query(self, query, params=None, fetch=False, return_id=False, replica=False):
+        """
+        Execute a query on a pooled connection, bypassing the cache. Returns
+        the rows when fetching, otherwise the new row's id if return_id is set
+        or the affected row count. A read with replica=True goes to a read
+        replica when one is fit to serve it.
+        """
+        pinned = self.pinned_connection()
+        if pinned is not None:
+            return self.run_in_transaction(pinned, query, params, fetch, return_id)
+        
+        if replica and fetch and self.replicas is not None:
+            started = time.perf_counter()
+            target = self.replicas.choose(query)
+            rows = self.read_replica(target, query, params) if target is not None else None
+            if rows is not None:
+                self.replicas.record(target.name, time.perf_counter() - started)
+                return rows
+            rows = self.run_query(query, params, fetch)
+            self.replicas.record('primary', time.perf_counter() - started)
+            return rows
+        
+        # Reads are safe to retry once on a fresh connection if the pooled
+        # one turns out to have been dropped by the server
+        attempts = 2 if fetch else 1
+        
+        for attempt in range(attempts):
+            conn = self.get_connection()
+            if not conn:
+                return None
+            
+            broken = False
+            cursor = None
+            try:
+                cursor = self.statements.cursor(conn, query)
+                rows = self.timed_execute(conn, cursor, query, params, fetch)
+                
+                if fetch:
+                    return rows
+                conn.commit()
+                if self.replicas is not None:
+                    self.replicas.note_write([written_table(query)])
+                return cursor.lastrowid if return_id else cursor.rowcount
+            except Error as e:
+                broken = is_connection_error(e)
+                if not (broken and attempt + 1 < attempts):
+                    print(f"Error executing query: {e}")
+                    return None
+            finally:
+                if cursor is not None:
+                    try:
+                        cursor.close()
+                    except Error:
+                        broken = True
+                self.pool.release(conn, broken=broken)
+        
+        return None
+    
+    def read_replica(self, replica, query, params):
+        """
+        Run a read on a replica and return its rows, or None after marking
+        the replica failed so the caller can use the primary instead
+        """
+        try:
+            conn = replica.pool.get_connection()
+        except (PoolTimeoutError, Error) as e:
+            self.replicas.mark_failed(replica, e)
+            return None
+        broken = False
+        cursor = None
+        try:
+            cursor = self.statements.cursor(conn, query)
+            return self.timed_execute(conn, cursor, query, params, fetch=True)
+        except Error as e:
+            broken = is_connection_error(e)
+            self.replicas.mark_failed(replica, e)
+            return None
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Error:
+                    broken = True
+            replica.pool.release(conn, broken=broken)
+    
+    def run_in_transaction(self, conn, query, params, fetch, return_id):
+        """Execute a query on the pinned connection without committing; errors propagate"""
+        self.flush_pending()
+        result = self.run_statement(conn, query, params, fetch, return_id)
+        if not fetch:
+            # None marks a write whose table could not be determined
+            self.local.written.add(written_table(query))
+        return result
+    
+    def run_statement(self, conn, query, params=None, fetch=False, return_id=False):
+        """
+        Execute one statement on a connection the caller holds, through its
+        prepared cursor if it is registered. Errors propagate.
+        """
+        cursor = self.statements.cursor(conn, query)
+        try:
+            rows = self.timed_execute(conn, cursor, query, params, fetch)
+            if fetch:
+                return rows
+            return cursor.lastrowid if return_id else cursor.rowcount
+        finally:
+            cursor.close()
+    
+    def iter_query(self, query, params=None, batch_size=FETCH_BATCH_SIZE, replica=False):
+        """
+        Stream the rows of a query without buffering the whole result.
+        
+        Uses an unbuffered cursor and fetchmany, so memory stays proportional
+        to batch_size however many rows match. The pooled connection is held
+        until the generator is exhausted or closed. replica=True streams from
+        a read replica when one is fit to serve the query.
+        """
+        pinned = self.pinned_connection()
+        if pinned is not None:
+            self.flush_pending()
+        routed = replica and pinned is None and self.replicas is not None
+        target = self.replicas.choose(query) if routed else None
+        conn = pinned or (self.get_connection(target.pool) if target else None)
+        if target is not None and not conn:
+            self.replicas.mark_failed(target, "no connection available")
+            target = None
+        pool = target.pool if target else self.pool
+        conn = conn or self.get_connection()
+        if not conn:
+            return
+        
+        broken = False
+        cursor = None
+        finished = False
+        # Time spent by the consumer between rows is included, as the
+        # connection is held for all of it
+        started = time.perf_counter()
+        count = 0
+        failed = False
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield from rows
+            finished = True
+        except Error as e:
+            failed = True
+            self.stats.record(query, self.current_operation(), time.perf_counter() - started, count, error=True)
+            if pinned is not None:
+                raise
+            broken = is_connection_error(e)
+            print(f"Error executing query: {e}")
+        finally:
+            if cursor is not None:
+                try:
+                    # A consumer that stops early leaves rows on the wire that
+                    # must be drained before the connection can be reused
+                    if not finished and not broken:
+                        conn.consume_results()
+                    cursor.close()
+                except Error:
+                    broken = True
+            # Recorded once the results are drained, so a slow query can be EXPLAINed
+            if not failed and not broken:
+                self.record_query(conn, query, params, time.perf_counter() - started, count)
+            if routed:
+                self.replicas.record(target.name if target else 'primary', time.perf_counter() - started)
+            if pinned is None:
+                pool.release(conn, broken=broken)
+    
+    def iter_product_pages(self, page_size=PRODUCTS_PAGE_SIZE, after_id=0):
+        """
+        Yield (products, has_more) pages in product_id order using keyset
+        pagination. One extra row is requested to know if another page follows.
+        """
+        while True:
+            page = list(self.iter_query(VIEW_PRODUCTS_PAGE_QUERY, (after_id, page_size + 1), replica=True))
+            has_more = len(page) > page_size
+            page = page[:page_size]
+            if page:
+                yield page, has_more
+            if not has_more:
+                return
+            after_id = page[-1]['product_id']
+    
+    def query_transactions(self, product_id=None, transaction_type=None, start_date=None,
+                           end_date=None, before=None, after=None, limit=TRANSACTIONS_PAGE_SIZE):
+        """
+        Return a TransactionPage of history matching the filters, newest first.
+        
+        Pass a page's `older` cursor as `before` to get the next older page, or
+        its `newer` cursor as `after` to go back. Every page is an index range
+        read from the cursor position, so deep pages cost the same as the first.
+        Returns None on a database error.
+        """
+        query, params = build_transaction_query(
+            product_id, transaction_type, start_date, end_date, before, after, limit + 1
+        )
+        rows = self.execute_query(query, params, fetch=True)
+        if rows is None:
+            return None
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is not None:
+            rows.reverse()
+        if not rows:
+            return TransactionPage([], None, None)
+        
+        first = (rows[0]['transaction_date'], rows[0]['transaction_id'])
+        last = (rows[-1]['transaction_date'], rows[-1]['transaction_id'])
+        
+        if after is not None:
+            # Paging back: the page we came from is still older than this one
+            return TransactionPage(rows, last, first if has_more else None)
+        return TransactionPage(rows, last if has_more else None, first if before is not None else None)
+    
+    def sales_summary(self, start_date, end_date):
+        """
+        Return units sold and revenue per product for sales on days in
+        [start_date, end_date), best sellers first. None on a database error.
+        """
+        return self.execute_query(SALES_SUMMARY_QUERY, (start_date, end_date), fetch=True, replica=True)
+    
+    def iter_sales_summary(self, start_date, end_date):
+        """Stream the rows of sales_summary() without buffering them"""
+        return self.iter_query(SALES_SUMMARY_QUERY, (start_date, end_date), replica=True)
+    
+    def list_products(self, after_id=0, limit=PRODUCTS_PAGE_SIZE):
+        """Return up to `limit` products with ids above `after_id`, in id order"""
+        return self.execute_query(VIEW_PRODUCTS_PAGE_QUERY, (after_id, limit), fetch=True, replica=True)
+    
+    def search_products(self, text, limit=None):
+        """
+        Return up to `limit` products whose name or description matches
+        `text`, best match first, each with its 'match' class (see search.py).
+        [] for a search with no words, None on a database error.
+        """
+        search = build_search_query(self.backend.name, text, SEARCH_CONFIG['candidates'])
+        if search is None:
+            return []
+        rows = self.execute_query(*search, fetch=True, replica=True)
+        return None if rows is None else rank_products(rows, text, limit)
+    
+    def list_categories(self):
+        """Return categories with their product counts"""
+        return self.execute_query(VIEW_CATEGORIES_QUERY, fetch=True, replica=True)
+    
+    def inventory_levels(self):
+        """Return every inventory row with its stock value, fullest first"""
+        return self.execute_query(VIEW_INVENTORY_QUERY, fetch=True, replica=True)
+    
+    def iter_inventory_levels(self):
+        """Stream the rows of inventory_levels() without buffering them"""
+        return self.iter_query(VIEW_INVENTORY_QUERY, replica=True)
+    
+    def inventory_total(self):
+        """Return the total value of all stock"""
+        rows = self.execute_query(INVENTORY_TOTAL_QUERY, fetch=True, replica=True)
+        return rows[0]['total_value'] if rows else None
+    
+    def low_stock_items(self):
+        """Return products below their reorder point, lowest stock first"""
+        return self.execute_query(LOW_STOCK_QUERY, fetch=True, replica=True)
+    
+    def iter_low_stock_items(self):
+        """Stream the rows of low_stock_items() without buffering them"""
+        return self.iter_query(LOW_STOCK_QUERY, replica=True)
+    
+    def high_value_items(self):
+        """Return the 10 products with the highest stock value"""
+        return self.execute_query(HIGH_VALUE_QUERY, fetch=True, replica=True)
+    
+    def category_summary(self):
+        """Return product count, units and stock value per category"""
+        return self.execute_query(CATEGORY_SUMMARY_QUERY, fetch=True, replica=True)
+    
+    def shard_for(self, product_id):
+        """The service holding a product's rows: this one, unless sharded (see sharding.py)"""
+        return self
+    
+    def get_product(self, product_id):
+        """Return a product with its category name, or None if it doesn't exist"""
+        rows = self.execute_query(PRODUCT_DETAILS_QUERY, (product_id,), fetch=True)
+        return rows[0] if rows else None
+    
+    def get_stock(self, product_id):
+        """Return a product's name and current quantity, or None if it has no inventory row"""
+        rows = self.execute_query(STOCK_LEVEL_QUERY, (product_id,), fetch=True)
+        return rows[0] if rows else None
+    
+    def category_choices(self):
+        """Return (category_id, name) rows for category pickers"""
+        return self.execute_query(CATEGORY_CHOICES_QUERY, fetch=True)
+    
+    def create_category(self, name, description=None):
+        """Insert a category and return its id"""
+        return self.execute_query(INSERT_CATEGORY_QUERY, (name, description), return_id=True)
+    
+    def create_product(self, name, description, price, category_id, quantity=0, sku=None):
+        """
+        Insert a product with its initial inventory row in one round trip and
+        one commit, and return the new product id. Raises mysql.connector
+        errors on failure.
+        """
+        if quantity < 0:
+            raise StockError("Inventory cannot be negative.")
+        
+        with self.unit_of_work() as work:
+            product = work.execute(INSERT_PRODUCT_QUERY, (sku, name, description, price, category_id))
+            work.execute(INSERT_INVENTORY_QUERY, (quantity,))
+            # Inside an outer unit of work the caller may need the id right away
+            work.flush()
+        return product.lastrowid
+    
+    def update_product(self, product_id, name, description, price, category_id):
+        """Update a product's details; returns the number of rows changed"""
+        return self.execute_query(UPDATE_PRODUCT_QUERY, (name, description, price, category_id, product_id))
+    
+    def delete_product(self, product_id):
+        """
+        Delete a product with its inventory row and transaction history in
+        one round trip and one commit. Returns True if the product existed.
+        Raises mysql.connector errors on failure.
+        """
+        with self.unit_of_work() as work:
+            results = [work.execute(query, (product_id,)) for query in DELETE_PRODUCT_QUERIES]
+        return results[-1].rowcount > 0
+    
+    def record_transaction(self, product_id, quantity, transaction_type, notes=None):
+        """
+        Record a sale or restock of `quantity` units and apply it to stock.
+        Returns the new quantity; raises StockError if a sale exceeds stock.
+        """
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ValueError(f"Transaction type must be one of {', '.join(TRANSACTION_TYPES)}.")
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive.")
+        
+        delta = quantity if transaction_type == 'restock' else -quantity
+        return self.adjust_stock(product_id, delta, transaction_type, notes)
+    
+    def set_stock(self, product_id, quantity):
+        """
+        Set a product's stock to an absolute quantity and return it. Raises
+        StockError for a negative quantity or a product with no inventory row.
+        """
+        if quantity < 0:
+            raise StockError("Inventory cannot be negative.")
+        
+        result = self.execute_query(SET_STOCK_QUERY, (quantity, product_id))
+        if result is None:
+            return None
+        if result == 0:
+            # MySQL reports 0 changed rows when the quantity was already set
+            exists = self.execute_query(STOCK_QUANTITY_QUERY, (product_id,), fetch=True)
+            if not exists:
+                raise StockError(f"Product {product_id} not found in inventory.")
+        return quantity
+    
+    def adjust_stock(self, product_id, delta, transaction_type=None, notes=None,
+                     minimum=0, record=True):
+        """
+        Atomically apply a relative stock change and log it as a transaction.
+        
+        The guarded UPDATE and the transaction INSERT run in one unit of work
+        with a single commit, so concurrent terminals cannot lose each other's
+        updates.
+        Returns the new quantity, raises StockError if the product has no
+        inventory row or the change would take stock below `minimum`, and
+        returns None on a database error.
+        """
+        if transaction_type is None:
+            transaction_type = 'restock' if delta > 0 else 'sale'
+        
+        # Inside transaction() or unit_of_work() the change joins the caller's unit
+        pinned = self.pinned_connection()
+        try:
+            with self.unit_of_work() as work:
+                # What happens next depends on the guard, so it is sent at once
+                change = work.execute(ADJUST_STOCK_QUERY, (delta, product_id, delta, minimum))
+                work.flush()
+                
+                if change.rowcount == 0:
+                    # Only the failure path pays for working out why. Nothing was
+                    # changed, so a caller's transaction can carry on.
+                    rows = self.execute_query(STOCK_QUANTITY_QUERY, (product_id,), fetch=True)
+                    row = rows[0] if rows else None
+                    if row is None:
+                        raise StockError(f"Product {product_id} not found in inventory.")
+                    if row['quantity'] + delta >= minimum:
+                        # MySQL counts changed rows, not matched ones: a delta of
+                        # 0 passed the guard but changed nothing
+                        return row['quantity']
+                    raise StockError(f"Not enough inventory. Current stock: {row['quantity']}")
+                
+                if record and delta != 0:
+                    # Goes out with the commit, or with the caller's next batch
+                    work.execute(INSERT_TRANSACTION_QUERY, (product_id, abs(delta), transaction_type, notes))
+            return change.lastrowid
+        except PoolTimeoutError as e:
+            print(f"Error getting database connection: {e}")
+            return None
+        except Error as e:
+            if pinned is not None:
+                raise
+            print(f"Error updating stock: {e}")
+            return None
+    
+    def set_reorder_point(self, product_id, point):
+        """
+        Set the stock level below which a product counts as low (None falls
+        back to its category's). Returns the number of products changed.
+        """
+        if point is not None and point < 0:
+            raise ValueError("Reorder point cannot be negative.")
+        return self.execute_query(SET_REORDER_POINT_QUERY, (point, product_id))
+    
+    def set_category_reorder_point(self, category_id, point):
+        """
+        Set the reorder point of every product in a category that has none of
+        its own (None restores the default). Returns the number of categories changed.
+        """
+        if point is not None and point < 0:
+            raise ValueError("Reorder point cannot be negative.")
+        return self.execute_query(SET_CATEGORY_REORDER_POINT_QUERY, (point, category_id))
+    
+    def pending_alerts(self, after_id=0, limit=100):
+        """Return undelivered stock alerts with ids above `after_id`, oldest first"""
+        return self.execute_query(PENDING_ALERTS_QUERY, (after_id, limit), fetch=True)
+    
+    def acknowledge_alerts(self, up_to_id):
+        """Mark every pending alert up to and including `up_to_id` delivered"""
+        return self.execute_query(ACKNOWLEDGE_ALERTS_QUERY, (up_to_id,))
+    
+    def get_pool_stats(self):
+        """Return connection pool counters (created, in use, waits, ...)"""
+        return self.pool.get_stats()
+    
+    def get_cache_stats(self):
+        """Return query cache hit/miss counters, or None if the cache is disabled"""
+        return self.cache.get_stats() if self.cache is not None else None
+    
+    def get_statement_stats(self):
+        """Return prepared statement counters (statements prepared, executions reusing them)"""
+        return self.statements.get_stats()
+    
+    def get_query_stats(self):
+        """Return per-operation and per-statement query counters"""
+        return self.stats.snapshot()
+    
+    def get_replica_stats(self):
+        """Return read routing counters per destination and fallback reason, or None without replicas"""
+        return self.replicas.get_stats() if self.replicas is not None else None
+    
+    def query_report(self, limit=15):
+        """Return the query counters as a text table, with read routing when replicas are used"""
+        report = self.stats.format_report(limit)
+        if self.replicas is not None:
+            report += "\n\n" + self.replicas.format_report()
+        return report
+    
+    def close(self):
+        """Close all pooled database connections and release the storage backend"""
+        self.pool.close()
+        self.backend.close()
+        if self.replicas is not None:
+            self.replicas.close()
@@ -1,7 +1,11 @@
 import mysql.connector
 from mysql.connector import Error
+import argparse
 import os
 from dotenv import load_dotenv
+from migrations import migrate, MigrationError
+from partitions import ensure_partitions, PartitionError
+import data_generator
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -9,59 +13,16 @@ load_dotenv()
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', '3306')),
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', ''),
     'charset': 'utf8mb4',
-    'use_pure': True
+    'use_pure': os.getenv('DB_USE_PURE', '0' if mysql.connector.HAVE_CEXT else '1') == '1'
 }
 
-# Database and table creation queries
+# Database creation query (tables are created by the migrations in migrations.py)
 CREATE_DB_QUERY = "CREATE DATABASE IF NOT EXISTS inventory_management"
 
-CREATE_CATEGORIES_TABLE = """
-CREATE TABLE IF NOT EXISTS categories (
-    category_id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    description TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-"""
-
-CREATE_PRODUCTS_TABLE = """
-CREATE TABLE IF NOT EXISTS products (
-    product_id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(100) NOT NULL,
-    description TEXT,
-    price DECIMAL(10, 2) NOT NULL,
-    category_id INT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (category_id) REFERENCES categories(category_id)
-)
-"""
-
-CREATE_INVENTORY_TABLE = """
-CREATE TABLE IF NOT EXISTS inventory (
-    inventory_id INT AUTO_INCREMENT PRIMARY KEY,
-    product_id INT NOT NULL,
-    quantity INT NOT NULL DEFAULT 0,
-    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
-)
-"""
-
-CREATE_TRANSACTIONS_TABLE = """
-CREATE TABLE IF NOT EXISTS transactions (
-    transaction_id INT AUTO_INCREMENT PRIMARY KEY,
-    product_id INT NOT NULL,
-    quantity INT NOT NULL,
-    transaction_type ENUM('sale', 'restock') NOT NULL,
-    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    notes TEXT,
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
-)
-"""
-
 # Sample data
 SAMPLE_CATEGORIES = [
     ("Electronics", "Electronic devices and accessories"),
@@ -119,6 +80,20 @@ def execute_query(connection, query, params=None):
     finally:
         cursor.close()
 
+def execute_many(connection, query, rows):
+    """Execute a statement for many parameter rows and commit once"""
+    cursor = connection.cursor()
+    try:
+        cursor.executemany(query, rows)
+        connection.commit()
+        return cursor.rowcount
+    except Error as e:
+        connection.rollback()
+        print(f"Error executing query: {e}")
+        return None
+    finally:
+        cursor.close()
+
 def create_database():
     """Create the database if it doesn't exist"""
     conn = create_connection()
@@ -127,16 +102,20 @@ def create_database():
         conn.close()
 
 def create_tables():
-    """Create tables in the database"""
+    """Create or upgrade tables by applying pending schema migrations"""
     conn = create_connection("inventory_management")
     if conn:
-        print("Creating tables...")
-        execute_query(conn, CREATE_CATEGORIES_TABLE)
-        execute_query(conn, CREATE_PRODUCTS_TABLE)
-        execute_query(conn, CREATE_INVENTORY_TABLE)
-        execute_query(conn, CREATE_TRANSACTIONS_TABLE)
-        conn.close()
-        print("Tables created successfully")
+        print("Applying schema migrations...")
+        try:
+            applied = migrate(conn)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+            created = ensure_partitions(conn)
+            if created:
+                print(f"Created transaction partitions {', '.join(created)}")
+        except (Error, MigrationError, PartitionError) as e:
+            print(f"Error applying migrations: {e}")
+        finally:
+            conn.close()
 
 def insert_sample_data():
     """Insert sample data into the tables"""
@@ -144,30 +123,72 @@ def insert_sample_data():
     if conn:
         print("Inserting sample data...")
         
-        # Insert categories
-        for category in SAMPLE_CATEGORIES:
-            execute_query(conn, "INSERT INTO categories (name, description) VALUES (%s, %s)", category)
-        
-        # Insert products
-        for product in SAMPLE_PRODUCTS:
-            execute_query(conn, "INSERT INTO products (name, description, price, category_id) VALUES (%s, %s, %s, %s)", product)
-        
-        # Insert inventory
-        for item in SAMPLE_INVENTORY:
-            execute_query(conn, "INSERT INTO inventory (product_id, quantity) VALUES (%s, %s)", item)
+        # One multi-row statement and commit per table
+        execute_many(conn, "INSERT INTO categories (name, description) VALUES (%s, %s)", SAMPLE_CATEGORIES)
+        execute_many(conn, "INSERT INTO products (name, description, price, category_id) VALUES (%s, %s, %s, %s)", SAMPLE_PRODUCTS)
+        execute_many(conn, "INSERT INTO inventory (product_id, quantity) VALUES (%s, %s)", SAMPLE_INVENTORY)
         
         conn.close()
         print("Sample data inserted successfully")
 
-def main():
+def generate_data(args):
+    """Seed a synthetic large-scale dataset"""
+    config_extra = {'allow_local_infile': True} if args.method == 'infile' else {}
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG, database="inventory_management", **config_extra)
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return
+    
+    print(f"Generating {args.categories:,} categories, {args.products:,} products "
+          f"and {args.transactions:,} transactions over {args.days} days...")
+    try:
+        data_generator.seed(
+            conn,
+            categories=args.categories,
+            products=args.products,
+            transactions=args.transactions,
+            days=args.days,
+            batch_size=args.batch_size,
+            method=args.method,
+            random_seed=args.seed,
+            skew=args.skew
+        )
+    except Error as e:
+        print(f"\nError generating data: {e}")
+    finally:
+        conn.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Set up the Inventory Management System database")
+    parser.add_argument("--generate", action="store_true",
+                        help="Seed a synthetic dataset instead of the sample data")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365, help="Length of the transaction history")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT and commit")
+    parser.add_argument("--method", choices=["insert", "infile"], default="insert",
+                        help="Multi-row INSERTs or LOAD DATA LOCAL INFILE")
+    parser.add_argument("--skew", type=float, default=1.1,
+                        help="Zipf exponent for product popularity and category sizes")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible datasets")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     print("Setting up the Inventory Management System database...")
     create_database()
     create_tables()
     
-    # Ask user if they want to insert sample data
-    choice = input("Do you want to insert sample data? (y/n): ").lower()
-    if choice == 'y':
-        insert_sample_data()
+    if args.generate:
+        generate_data(args)
+    else:
+        # Ask user if they want to insert sample data
+        choice = input("Do you want to insert sample data? (y/n): ").lower()
+        if choice == 'y':
+            insert_sample_data()
     
     print("Database setup completed!")
 
@@ -0,0 +1,718 @@
+"""
+Product sharding for the Inventory Management System
+Spreads products, inventory and transactions across several databases by
+product_id, so neither catalog size nor write throughput is capped by one
+server. Categories are small and every product refers to one, so they are
+replicated to every shard under the same ids.
+
+ShardedInventoryService offers the InventoryService methods the menu, the
+command line and the HTTP API use, including transaction() and savepoint()
+(which yield nothing: there is no single connection to hand out). Lower
+level calls such as execute_query and unit_of_work go to a shard itself. Anything about one product (details,
+stock changes, its history) goes to the one shard holding it. Catalog-wide
+reads (product pages, inventory, reports, alerts) run on every shard in
+parallel and their results are merged in the order a single database would
+return them.
+
+Shards are listed in SHARD_DATABASES, comma-separated: database names, or
+host:port/database (host and port default to DB_CONFIG's); file paths with
+DB_BACKEND=sqlite. Products map to shards by:
+
+    hash   (product_id - 1) % shards. Each shard's connections step
+           AUTO_INCREMENT by the shard count from their own offset, so the
+           ids a shard hands out always map back to it (MySQL only).
+    range  (product_id - 1) // SHARD_RANGE_SIZE. Each shard's id sequences
+           start at the bottom of its range; 'init' sets them.
+
+New products go to the shard that has handed out the fewest product ids,
+worked out from each shard's highest id, so short-lived processes spread
+them as evenly as a long-running one. Products must be created through
+the router (app.py, cli.py, http_api.py all are): an id written straight
+into a shard outside its range would be routed elsewhere.
+
+Usage:
+    python sharding.py init        Migrate every shard, set id sequences, copy categories
+    python sharding.py status      Products and id range per shard
+    python sharding.py sync        Copy categories from the first shard to the others
+"""
+
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from mysql.connector import Error
+from tabulate import tabulate
+
+from service import (STORAGE_CONFIG, PRODUCTS_PAGE_SIZE, TRANSACTIONS_PAGE_SIZE, InventoryService,
+                     MySQLBackend, TransactionPage, create_backend, database_config)
+from search import rank_products
+
+SHARD_CONFIG = {
+    # Comma-separated shard databases; empty runs unsharded on DB_CONFIG
+    'databases': os.getenv('SHARD_DATABASES', ''),
+    # hash or range
+    'strategy': os.getenv('SHARD_STRATEGY', 'hash'),
+    # Product ids per shard with the range strategy
+    'range_size': int(os.getenv('SHARD_RANGE_SIZE', '10000000')),
+}
+
+# Ids are signed INT columns; with the range strategy each shard's
+# transactions and alerts get an equal slice of this space
+ID_SPACE = 2 ** 31
+
+INSERT_CATEGORY_REPLICA_QUERY = """
+INSERT INTO categories (category_id, name, description, reorder_point)
+VALUES (%s, %s, %s, %s)
+"""
+
+UPDATE_CATEGORY_REPLICA_QUERY = """
+UPDATE categories SET name = %s, description = %s, reorder_point = %s
+WHERE category_id = %s
+"""
+
+DELETE_CATEGORY_QUERY = "DELETE FROM categories WHERE category_id = %s"
+
+CATEGORY_ROWS_QUERY = """
+SELECT category_id, name, description, reorder_point FROM categories ORDER BY category_id
+"""
+
+LAST_PRODUCT_QUERY = "SELECT MAX(product_id) as last_id FROM products"
+
+SHARD_STATUS_QUERY = """
+SELECT COUNT(*) as products, MIN(product_id) as first_id, MAX(product_id) as last_id FROM products
+"""
+
+
+class ShardError(Exception):
+    """Raised when a product id does not belong to any shard, or a shard hands out foreign ids"""
+
+
+class HashSharding:
+    """Products spread by id modulo the shard count"""
+    name = 'hash'
+    # Product ids a shard can hand out (None: no limit)
+    capacity = None
+
+    def __init__(self, count):
+        self.count = count
+
+    def shard_of(self, product_id):
+        return (product_id - 1) % self.count
+
+    def session(self, index):
+        """Session settings that make shard `index` generate only its own ids"""
+        return {'auto_increment_increment': self.count, 'auto_increment_offset': index + 1}
+
+    def ids_used(self, index, last_id):
+        """How many product ids shard `index` has handed out, given its highest one"""
+        return 0 if last_id is None else max(0, (last_id - 1 - index) // self.count + 1)
+
+    def sequence_starts(self, index):
+        return {}
+
+
+class RangeSharding:
+    """Products spread by contiguous id ranges of `size` ids per shard"""
+    name = 'range'
+
+    def __init__(self, count, size=SHARD_CONFIG['range_size']):
+        self.count = count
+        self.size = size
+        self.capacity = size
+
+    def shard_of(self, product_id):
+        index = (product_id - 1) // self.size
+        if not 0 <= index < self.count:
+            raise ShardError(f"Product {product_id} is outside every shard's range")
+        return index
+
+    def session(self, index):
+        return {}
+
+    def ids_used(self, index, last_id):
+        """How many product ids shard `index` has handed out, given its highest one"""
+        return 0 if last_id is None else max(0, last_id - index * self.size)
+
+    def sequence_starts(self, index):
+        """First id of each id sequence on shard `index`"""
+        stride = ID_SPACE // self.count
+        return {'products': index * self.size + 1,
+                'transactions': index * stride + 1,
+                'stock_alerts': index * stride + 1}
+
+
+STRATEGIES = {'hash': HashSharding, 'range': RangeSharding}
+
+
+class ShardBackend(MySQLBackend):
+    """A MySQL shard whose connections get per-shard session settings"""
+    def __init__(self, config, session=None):
+        super().__init__(config)
+        self.session = session or {}
+
+    def connect(self):
+        conn = super().connect()
+        if self.session:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SET SESSION " + ", ".join(f"{name} = %s" for name in self.session),
+                               tuple(self.session.values()))
+            finally:
+                cursor.close()
+        return conn
+
+
+def set_sequence_start(service, table, start):
+    """Make `table`'s next generated id at least `start`; repeating it is harmless"""
+    with service.transaction():
+        if service.backend.name == 'sqlite':
+            service.execute_query("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s",
+                                  (start - 1, table))
+            service.execute_query(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                (table, start - 1, table)
+            )
+        else:
+            # MySQL never moves AUTO_INCREMENT below the highest id in use
+            service.execute_query(f"ALTER TABLE {table} AUTO_INCREMENT = {int(start)}")
+
+
+def sum_counters(stats):
+    """Add up per-shard counter dicts into one of the same shape; None if no shard has any"""
+    total = None
+    for shard_stats in stats:
+        if shard_stats is None:
+            continue
+        total = total or {}
+        for key, value in shard_stats.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def merge_query_stats(snapshots):
+    """Combine per-shard QueryStats snapshots, adding up the same operation and statement"""
+    operations, statements = {}, {}
+    for snapshot in snapshots:
+        for name, totals in snapshot['operations'].items():
+            merged = operations.setdefault(name, dict.fromkeys(totals, 0))
+            for key, value in totals.items():
+                merged[key] += value
+        for statement in snapshot['statements']:
+            merged = statements.get((statement['operation'], statement['query']))
+            if merged is None:
+                statements[(statement['operation'], statement['query'])] = dict(statement)
+                continue
+            for key in ('calls', 'cached', 'errors', 'rows', 'total_ms'):
+                merged[key] += statement[key]
+            merged['max_ms'] = max(merged['max_ms'], statement['max_ms'])
+    for merged in statements.values():
+        merged['avg_ms'] = merged['total_ms'] / merged['calls'] if merged['calls'] else 0.0
+    return {'operations': dict(sorted(operations.items(), key=lambda item: -item[1]['total_ms'])),
+            'statements': sorted(statements.values(), key=lambda s: s['total_ms'], reverse=True)}
+
+
+def merge_replica_stats(stats):
+    """Combine per-shard ReplicaRouter stats: reads per destination and fallbacks added up"""
+    stats = [shard_stats for shard_stats in stats if shard_stats is not None]
+    if not stats:
+        return None
+    routes = {}
+    for shard_stats in stats:
+        for name, route in shard_stats['routes'].items():
+            merged = routes.setdefault(name, {'queries': 0, 'total_ms': 0.0})
+            merged['queries'] += route['queries']
+            merged['total_ms'] = round(merged['total_ms'] + route['total_ms'], 3)
+    for merged in routes.values():
+        merged['avg_ms'] = round(merged['total_ms'] / merged['queries'], 3) if merged['queries'] else 0.0
+    return {'routes': routes,
+            'fallbacks': sum_counters(shard_stats['fallbacks'] for shard_stats in stats),
+            'replicas': {name: state for shard_stats in stats for name, state in shard_stats['replicas'].items()}}
+
+
+class ShardedInventoryService:
+    def __init__(self, shards, strategy=None, names=None):
+        """
+        shards: one InventoryService per shard, in shard order
+        strategy: HashSharding or RangeSharding over len(shards)
+        names: labels for the shards in stats and status output
+        """
+        self.shards = list(shards)
+        self.strategy = strategy or HashSharding(len(self.shards))
+        self.names = names or [f"shard{i}" for i in range(len(self.shards))]
+        self.executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        # Per-thread operation label, open cross-shard transaction and savepoint
+        self.local = threading.local()
+
+    def shard_for(self, product_id):
+        """
+        The shard service holding a product's rows. An id outside every
+        shard's range belongs to no product, so the first shard answers for
+        it the way one database answers for an unknown id (None, no rows, or
+        a not-found StockError).
+        """
+        try:
+            return self.shards[self.strategy.shard_of(product_id)]
+        except ShardError:
+            return self.shards[0]
+
+    @contextmanager
+    def operation(self, name):
+        """Attribute the queries issued in the with-block, on every shard, to a named operation"""
+        outer = getattr(self.local, 'operation', None)
+        self.local.operation = name
+        try:
+            yield
+        finally:
+            self.local.operation = outer
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the block's writes in one transaction per shard it touches,
+        committed shard by shard at the end and all rolled back if an
+        exception escapes. A shard joins when the block first routes to it.
+        A failure between two shards' commits cannot be undone, so keep
+        multi-shard work idempotent.
+        """
+        if getattr(self.local, 'joined', None) is not None:
+            yield
+            return
+        with ExitStack() as stack:
+            self.local.joined = (stack, set())
+            try:
+                yield
+            finally:
+                self.local.joined = None
+
+    @contextmanager
+    def savepoint(self, name="statement"):
+        """
+        Inside transaction(), undo only the with-block's writes if it fails.
+        A savepoint is opened on each shard when the block first routes to
+        it, and all of them are released or rolled back together.
+        """
+        outer = getattr(self.local, 'savepoint', None)
+        with ExitStack() as stack:
+            self.local.savepoint = (stack, set(), name)
+            try:
+                yield
+            finally:
+                self.local.savepoint = outer
+
+    def call(self, shard, method, *args, **kwargs):
+        """Call a method on one shard, inside this thread's transaction, savepoint and operation"""
+        with ExitStack() as stack:
+            name = getattr(self.local, 'operation', None)
+            if name is not None:
+                stack.enter_context(shard.operation(name))
+            joined = getattr(self.local, 'joined', None)
+            if joined is not None and id(shard) not in joined[1]:
+                joined[0].enter_context(shard.transaction())
+                joined[1].add(id(shard))
+            savepoint = getattr(self.local, 'savepoint', None)
+            if savepoint is not None and id(shard) not in savepoint[1]:
+                savepoint[0].enter_context(shard.savepoint(savepoint[2]))
+                savepoint[1].add(id(shard))
+            return getattr(shard, method)(*args, **kwargs)
+
+    def route(self, product_id, method, *args, **kwargs):
+        return self.call(self.shard_for(product_id), method, product_id, *args, **kwargs)
+
+    def gather(self, method, *args, **kwargs):
+        """Run a read on every shard in parallel; returns the results in shard order, or None if any failed"""
+        name = getattr(self.local, 'operation', None)
+
+        def run(shard):
+            if name is None:
+                return getattr(shard, method)(*args, **kwargs)
+            with shard.operation(name):
+                return getattr(shard, method)(*args, **kwargs)
+
+        results = list(self.executor.map(run, self.shards))
+        return None if any(result is None for result in results) else results
+
+    def broadcast(self, method, *args, **kwargs):
+        """Apply a write to every shard in turn; returns the results in shard order"""
+        return [self.call(shard, method, *args, **kwargs) for shard in self.shards]
+
+    def merge_streams(self, method, key, args=(), reverse=False):
+        """
+        Merge the row streams of an iter_* method from every shard, keeping
+        their sort order. Each shard's query is started in parallel; rows
+        are then read only as the merged stream is consumed.
+        """
+        def first(shard):
+            rows = iter(getattr(shard, method)(*args))
+            return itertools.chain([row for row in itertools.islice(rows, 1)], rows)
+
+        return heapq.merge(*self.executor.map(first, self.shards), key=key, reverse=reverse)
+
+    # Single-product operations
+
+    def get_product(self, product_id):
+        return self.route(product_id, 'get_product')
+
+    def get_stock(self, product_id):
+        return self.route(product_id, 'get_stock')
+
+    def update_product(self, product_id, name, description, price, category_id):
+        return self.route(product_id, 'update_product', name, description, price, category_id)
+
+    def delete_product(self, product_id):
+        return self.route(product_id, 'delete_product')
+
+    def record_transaction(self, product_id, quantity, transaction_type, notes=None):
+        return self.route(product_id, 'record_transaction', quantity, transaction_type, notes)
+
+    def set_stock(self, product_id, quantity):
+        return self.route(product_id, 'set_stock', quantity)
+
+    def adjust_stock(self, product_id, delta, transaction_type=None, notes=None, minimum=0, record=True):
+        return self.route(product_id, 'adjust_stock', delta, transaction_type, notes, minimum, record)
+
+    def set_reorder_point(self, product_id, point):
+        return self.route(product_id, 'set_reorder_point', point)
+
+    def placement(self):
+        """
+        The index of the shard a new product goes to: the one that has handed
+        out the fewest product ids, lowest index on a tie. Read from the
+        databases (one primary key lookup per shard), so every process
+        places products the same way. Inside transaction() a shard that
+        already joined is read on its connection, so the block's own new
+        products count.
+        """
+        used = []
+        for index, shard in enumerate(self.shards):
+            rows = shard.execute_query(LAST_PRODUCT_QUERY, fetch=True)
+            # A shard that cannot be read is only chosen if none can
+            used.append(self.strategy.ids_used(index, rows[0]['last_id']) if rows else float('inf'))
+        fewest = min(used)
+        capacity = self.strategy.capacity
+        if capacity is not None and capacity <= fewest < float('inf'):
+            raise ShardError(f"All shard ranges are full ({len(self.shards)} shards of {capacity} product ids); "
+                             f"add a database to SHARD_DATABASES and run 'python sharding.py init'")
+        return used.index(fewest)
+
+    def create_product(self, name, description, price, category_id, quantity=0, sku=None):
+        """
+        Insert a product on the shard chosen by placement() and return its
+        id. Raises ShardError if every shard's id range is full, or if the
+        shard handed out an id that maps elsewhere.
+        """
+        index = self.placement()
+        shard = self.shards[index]
+        product_id = self.call(shard, 'create_product', name, description, price, category_id, quantity, sku)
+        try:
+            owner = self.strategy.shard_of(product_id)
+        except ShardError:
+            owner = None
+        if owner != index:
+            self.call(shard, 'delete_product', product_id)
+            raise ShardError(f"{self.names[index]} generated product id {product_id}, which is not in its "
+                             f"range; run 'python sharding.py init'")
+        return product_id
+
+    # Categories, replicated to every shard
+
+    def list_categories(self):
+        """Categories with their product counts summed over the shards"""
+        results = self.gather('list_categories')
+        if results is None:
+            return None
+        counts = {}
+        for rows in results:
+            for row in rows:
+                counts[row['category_id']] = counts.get(row['category_id'], 0) + row['product_count']
+        return [dict(row, product_count=counts[row['category_id']]) for row in results[0]]
+
+    def category_choices(self):
+        return self.call(self.shards[0], 'category_choices')
+
+    def create_category(self, name, description=None):
+        """
+        Insert a category on the first shard, then under the same id on the
+        others. If a copy fails the category is removed again and the error
+        is raised.
+        """
+        category_id = self.call(self.shards[0], 'create_category', name, description)
+        if category_id is None:
+            return None
+        copied = [self.shards[0]]
+        try:
+            for shard in self.shards[1:]:
+                with shard.transaction():
+                    shard.execute_query(INSERT_CATEGORY_REPLICA_QUERY, (category_id, name, description, None))
+                copied.append(shard)
+        except Error:
+            for shard in copied:
+                shard.execute_query(DELETE_CATEGORY_QUERY, (category_id,))
+            raise
+        return category_id
+
+    def set_category_reorder_point(self, category_id, point):
+        return self.broadcast('set_category_reorder_point', category_id, point)[0]
+
+    def sync_categories(self):
+        """Copy the first shard's categories to the others, adding or updating rows; returns rows changed"""
+        source = self.shards[0].execute_query(CATEGORY_ROWS_QUERY, fetch=True)
+        if source is None:
+            return None
+        changed = 0
+        for shard in self.shards[1:]:
+            with shard.transaction():
+                existing = {row['category_id']: row for row in shard.execute_query(CATEGORY_ROWS_QUERY, fetch=True)}
+                for row in source:
+                    values = (row['name'], row['description'], row['reorder_point'])
+                    current = existing.get(row['category_id'])
+                    if current is None:
+                        shard.execute_query(INSERT_CATEGORY_REPLICA_QUERY, (row['category_id'],) + values)
+                        changed += 1
+                    elif (current['name'], current['description'], current['reorder_point']) != values:
+                        shard.execute_query(UPDATE_CATEGORY_REPLICA_QUERY, values + (row['category_id'],))
+                        changed += 1
+        return changed
+
+    # Catalog-wide reads, scattered to every shard and merged
+
+    def list_products(self, after_id=0, limit=PRODUCTS_PAGE_SIZE):
+        results = self.gather('list_products', after_id, limit)
+        if results is None:
+            return None
+        return list(heapq.merge(*results, key=lambda row: row['product_id']))[:limit]
+
+    def search_products(self, text, limit=None):
+        """Each shard's best matches, ranked again together"""
+        results = self.gather('search_products', text, limit)
+        if results is None:
+            return None
+        return rank_products(itertools.chain(*results), text, limit)
+
+    def iter_product_pages(self, page_size=PRODUCTS_PAGE_SIZE, after_id=0):
+        """Yield (products, has_more) pages in product_id order, as InventoryService does"""
+        while True:
+            page = self.list_products(after_id, page_size + 1) or []
+            has_more = len(page) > page_size
+            page = page[:page_size]
+            if page:
+                yield page, has_more
+            if not has_more:
+                return
+            after_id = page[-1]['product_id']
+
+    def inventory_levels(self):
+        return list(self.iter_inventory_levels())
+
+    def iter_inventory_levels(self):
+        return self.merge_streams('iter_inventory_levels', lambda row: row['quantity'], reverse=True)
+
+    def inventory_total(self):
+        results = self.gather('inventory_total')
+        return None if results is None else sum(results)
+
+    def low_stock_items(self):
+        return list(self.iter_low_stock_items())
+
+    def iter_low_stock_items(self):
+        return self.merge_streams('iter_low_stock_items', lambda row: row['quantity'])
+
+    def high_value_items(self):
+        results = self.gather('high_value_items')
+        if results is None:
+            return None
+        return list(heapq.merge(*results, key=lambda row: row['total_value'], reverse=True))[:10]
+
+    def category_summary(self):
+        """Product count, units and stock value per category, summed over the shards"""
+        results = self.gather('category_summary')
+        if results is None:
+            return None
+        totals = {}
+        for rows in results:
+            for row in rows:
+                total = totals.setdefault(row['category_id'], dict(row, product_count=0, total_units=0,
+                                                                     total_value=0))
+                for column in ('product_count', 'total_units', 'total_value'):
+                    total[column] += row[column] or 0
+        return sorted(totals.values(), key=lambda row: row['total_value'], reverse=True)
+
+    def sales_summary(self, start_date, end_date):
+        results = self.gather('sales_summary', start_date, end_date)
+        if results is None:
+            return None
+        # Each product's sales live on one shard, so the rows only need interleaving
+        return list(heapq.merge(*results, key=lambda row: row['revenue'], reverse=True))
+
+    def iter_sales_summary(self, start_date, end_date):
+        return self.merge_streams('iter_sales_summary', lambda row: row['revenue'],
+                                  (start_date, end_date), reverse=True)
+
+    def query_transactions(self, product_id=None, transaction_type=None, start_date=None,
+                           end_date=None, before=None, after=None, limit=TRANSACTIONS_PAGE_SIZE):
+        """
+        A TransactionPage as InventoryService returns. With a product it is
+        read from that product's shard; otherwise each shard's page from the
+        same cursor is merged, which works because transaction ids are
+        unique across shards.
+        """
+        args = (transaction_type, start_date, end_date, before, after, limit)
+        if product_id is not None:
+            return self.route(product_id, 'query_transactions', *args)
+
+        pages = self.gather('query_transactions', None, *args)
+        if pages is None:
+            return None
+        key = lambda row: (row['transaction_date'], row['transaction_id'])
+        rows = sorted((row for page in pages for row in page.rows), key=key, reverse=True)
+        if after is not None:
+            # The `limit` rows nearest the cursor are the oldest of the newer ones
+            more = len(rows) > limit or any(page.newer is not None for page in pages)
+            rows = rows[-limit:]
+        else:
+            more = len(rows) > limit or any(page.older is not None for page in pages)
+            rows = rows[:limit]
+        if not rows:
+            return TransactionPage([], None, None)
+
+        first, last = key(rows[0]), key(rows[-1])
+        if after is not None:
+            return TransactionPage(rows, last, first if more else None)
+        return TransactionPage(rows, last if more else None, first if before is not None else None)
+
+    def pending_alerts(self, after_id=0, limit=100):
+        """
+        Undelivered alerts from every shard in alert_id order. Ids are unique
+        across shards, so acknowledging up to the last one returned covers
+        exactly the alerts returned.
+        """
+        results = self.gather('pending_alerts', after_id, limit)
+        if results is None:
+            return None
+        return list(heapq.merge(*results, key=lambda row: row['alert_id']))[:limit]
+
+    def acknowledge_alerts(self, up_to_id):
+        results = self.broadcast('acknowledge_alerts', up_to_id)
+        return None if any(result is None for result in results) else sum(results)
+
+    # Stats, added up over the shards in the shape InventoryService returns
+
+    def get_pool_stats(self):
+        return sum_counters(shard.get_pool_stats() for shard in self.shards)
+
+    def get_cache_stats(self):
+        stats = sum_counters(shard.get_cache_stats() for shard in self.shards)
+        if stats is not None:
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def get_statement_stats(self):
+        # Shards usually share one statement registry; count each registry once
+        registries = {id(shard.statements): shard for shard in self.shards}
+        return sum_counters(shard.get_statement_stats() for shard in registries.values())
+
+    def get_query_stats(self):
+        return merge_query_stats(shard.get_query_stats() for shard in self.shards)
+
+    def get_replica_stats(self):
+        return merge_replica_stats(shard.get_replica_stats() for shard in self.shards)
+
+    def query_report(self, limit=15):
+        return "\n\n".join(f"== {name} ==\n{shard.query_report(limit)}"
+                           for name, shard in zip(self.names, self.shards))
+
+    def prepare(self):
+        """Set every shard's id sequences for the strategy and copy categories to all of them"""
+        for index, shard in enumerate(self.shards):
+            for table, start in self.strategy.sequence_starts(index).items():
+                set_sequence_start(shard, table, start)
+        return self.sync_categories()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+
+
+def create_sharded_service(databases=None, strategy=None, range_size=None):
+    """A ShardedInventoryService over the SHARD_DATABASES list (or `databases`)"""
+    specs = [spec.strip() for spec in (databases or SHARD_CONFIG['databases']).split(",") if spec.strip()]
+    name = strategy or SHARD_CONFIG['strategy']
+    if name not in STRATEGIES:
+        raise ShardError(f"Unknown shard strategy {name!r}; use hash or range")
+    sharding = (RangeSharding(len(specs), range_size or SHARD_CONFIG['range_size'])
+                if name == 'range' else HashSharding(len(specs)))
+
+    if STORAGE_CONFIG['backend'].lower() == 'sqlite':
+        if name == 'hash':
+            raise ShardError("Hash sharding relies on MySQL's auto_increment_offset; use SHARD_STRATEGY=range")
+        backends = [create_backend('sqlite', spec) for spec in specs]
+    else:
+        backends = [ShardBackend(database_config(spec), sharding.session(i)) for i, spec in enumerate(specs)]
+    return ShardedInventoryService([InventoryService(backend=backend) for backend in backends], sharding, specs)
+
+
+def create_service():
+    """The service the front ends use: sharded when SHARD_DATABASES is set, otherwise one database"""
+    if SHARD_CONFIG['databases'].strip():
+        return create_sharded_service()
+    return InventoryService()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage product shards")
+    parser.add_argument("command", choices=["init", "status", "sync"])
+    args = parser.parse_args(argv)
+
+    if not SHARD_CONFIG['databases'].strip():
+        print("SHARD_DATABASES is not set; nothing is sharded.")
+        return 1
+
+    try:
+        service = create_sharded_service()
+    except ShardError as e:
+        print(f"Error: {e}")
+        return 1
+
+    try:
+        if args.command == "init":
+            if STORAGE_CONFIG['backend'].lower() != 'sqlite':
+                import mysql.connector
+                from migrations import migrate
+                for backend in (shard.backend for shard in service.shards):
+                    conn = mysql.connector.connect(**backend.config)
+                    try:
+                        migrate(conn)
+                    finally:
+                        conn.close()
+            changed = service.prepare()
+            print(f"Initialized {len(service.shards)} shards ({service.strategy.name}); "
+                  f"{changed} category rows copied.")
+            return 0
+
+        if args.command == "sync":
+            print(f"{service.sync_categories()} category rows copied.")
+            return 0
+
+        rows = []
+        for name, shard in zip(service.names, service.shards):
+            status = shard.execute_query(SHARD_STATUS_QUERY, fetch=True)[0]
+            rows.append([name, status['products'], status['first_id'], status['last_id']])
+        print(f"Strategy: {service.strategy.name}")
+        print(tabulate(rows, headers=["Shard", "Products", "First ID", "Last ID"], tablefmt="grid"))
+        return 0
+    except (Error, ShardError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
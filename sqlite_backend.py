@@ -0,0 +1,583 @@
+"""
+Embedded SQLite storage for the Inventory Management System
+Runs the service layer against a SQLite file, or an in-process :memory:
+database, instead of a MySQL server. Connections are wrapped so they look
+like mysql.connector ones to InventoryService and ConnectionPool: the
+service's statements are translated on the fly (placeholders,
+LAST_INSERT_ID, EXPLAIN, FOR UPDATE) and sqlite3 errors are raised as the
+matching mysql.connector errors.
+
+The schema below mirrors migrations 1-9, with the category_stats,
+daily_sales and low_stock triggers rewritten in SQLite syntax and product
+search (migration 9's FULLTEXT index) done by an FTS5 table that triggers
+keep in step with products. It is
+created on first connect, so a fresh file or :memory: database is usable
+immediately; files created by an older version are upgraded in place.
+Migration 8 only changes how MySQL stores transactions (monthly
+partitions) and has no counterpart here.
+
+MySQL-only tools (migrations.py, importer.py's upserts, LOAD DATA seeding)
+still need a MySQL server.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from mysql.connector import errors
+
+import alerts
+import search
+
+# Bumped alongside migrations.py when the mirrored schema changes
+SCHEMA_VERSION = 9
+
+# Seconds a writer waits for another connection's write lock
+BUSY_TIMEOUT = 10.0
+
+CENT = Decimal("0.01")
+
+
+def category_of(product):
+    return f"(SELECT category_id FROM products WHERE product_id = {product})"
+
+
+def price_of(product):
+    return f"COALESCE((SELECT price FROM products WHERE product_id = {product}), 0)"
+
+
+def units_of(product):
+    return f"(SELECT COALESCE(SUM(quantity), 0) FROM inventory WHERE product_id = {product})"
+
+
+def bump(category, products, units, value):
+    """SQLite version of aggregates.bump: add deltas to a category_stats row"""
+    return f"""
+    INSERT INTO category_stats (category_id, product_count, total_units, total_value)
+    VALUES (COALESCE({category}, 0), {products}, {units}, {value})
+    ON CONFLICT (category_id) DO UPDATE SET
+        product_count = product_count + excluded.product_count,
+        total_units = total_units + excluded.total_units,
+        total_value = ROUND(total_value + excluded.total_value, 2);"""
+
+
+def reorder_point_of(product):
+    return (
+        f"(SELECT COALESCE(p.reorder_point, c.reorder_point, {alerts.DEFAULT_REORDER_POINT}) "
+        "FROM products p LEFT JOIN categories c ON c.category_id = p.category_id "
+        f"WHERE p.product_id = {product})"
+    )
+
+
+def crossing(product, old, new):
+    """SQLite version of alerts.crossing, with the reorder point read by subquery"""
+    point = reorder_point_of(product)
+    return f"""
+    INSERT INTO stock_alerts (product_id, kind, quantity, reorder_point)
+    SELECT {product}, CASE WHEN {new} < point THEN 'low' ELSE 'restored' END, {new}, point
+    FROM (SELECT {point} AS point)
+    WHERE ({new} < point) <> ({old} IS NOT NULL AND {old} < point);
+    DELETE FROM low_stock WHERE product_id = {product} AND {new} >= {point};
+    INSERT INTO low_stock (product_id, quantity, reorder_point)
+    SELECT {product}, {new}, point FROM (SELECT {point} AS point) WHERE {new} < point
+    ON CONFLICT (product_id) DO UPDATE SET
+        quantity = excluded.quantity, reorder_point = excluded.reorder_point;"""
+
+
+def resync(source, scope, point):
+    """SQLite version of alerts.resync"""
+    return f"""
+    INSERT INTO stock_alerts (product_id, kind, quantity, reorder_point)
+    SELECT i.product_id, CASE WHEN i.quantity < {point} THEN 'low' ELSE 'restored' END, i.quantity, {point}
+    FROM {source} WHERE {scope}
+    AND (i.quantity < {point}) <> EXISTS (SELECT 1 FROM low_stock l WHERE l.product_id = i.product_id);
+    DELETE FROM low_stock WHERE product_id IN (
+        SELECT i.product_id FROM {source} WHERE {scope} AND i.quantity >= {point}
+    );
+    INSERT INTO low_stock (product_id, quantity, reorder_point)
+    SELECT i.product_id, i.quantity, {point} FROM {source} WHERE {scope} AND i.quantity < {point}
+    ON CONFLICT (product_id) DO UPDATE SET
+        quantity = excluded.quantity, reorder_point = excluded.reorder_point;"""
+
+
+def trigger(name, event, *statements, when=None):
+    condition = f"\nWHEN {when}" if when else ""
+    return f"\nCREATE TRIGGER IF NOT EXISTS {name} {event}{condition}\nBEGIN{''.join(statements)}\nEND;\n"
+
+
+# The category_stats, daily_sales and low_stock triggers of migrations 4, 5 and 7. SQLite
+# triggers have no variables, so the product's category and price are read
+# with scalar subqueries where the MySQL versions SELECT ... INTO.
+TRIGGERS = [
+    trigger("products_stats_insert", "AFTER INSERT ON products",
+            bump("NEW.category_id", 1, 0, 0)),
+    trigger("products_stats_update", "AFTER UPDATE ON products",
+            bump("OLD.category_id", -1, "-" + units_of("NEW.product_id"),
+                 "-OLD.price * " + units_of("NEW.product_id")),
+            bump("NEW.category_id", 1, units_of("NEW.product_id"),
+                 "NEW.price * " + units_of("NEW.product_id")),
+            when="NOT (OLD.category_id IS NEW.category_id) OR OLD.price <> NEW.price"),
+    trigger("products_stats_delete", "AFTER DELETE ON products",
+            bump("OLD.category_id", -1, 0, 0)),
+    trigger("inventory_stats_insert", "AFTER INSERT ON inventory",
+            bump(category_of("NEW.product_id"), 0, "NEW.quantity",
+                 price_of("NEW.product_id") + " * NEW.quantity")),
+    trigger("inventory_stats_update", "AFTER UPDATE ON inventory",
+            bump(category_of("OLD.product_id"), 0, "-OLD.quantity",
+                 "-" + price_of("OLD.product_id") + " * OLD.quantity"),
+            bump(category_of("NEW.product_id"), 0, "NEW.quantity",
+                 price_of("NEW.product_id") + " * NEW.quantity"),
+            when="OLD.quantity <> NEW.quantity OR OLD.product_id <> NEW.product_id"),
+    trigger("inventory_stats_delete", "AFTER DELETE ON inventory",
+            bump(category_of("OLD.product_id"), 0, "-OLD.quantity",
+                 "-" + price_of("OLD.product_id") + " * OLD.quantity")),
+    trigger("transactions_rollup_insert", "AFTER INSERT ON transactions", """
+    INSERT INTO daily_sales (sale_date, product_id, units_sold)
+    VALUES (DATE(NEW.transaction_date), NEW.product_id, NEW.quantity)
+    ON CONFLICT (sale_date, product_id) DO UPDATE SET units_sold = units_sold + excluded.units_sold;""",
+            when="NEW.transaction_type = 'sale'"),
+    trigger("transactions_rollup_delete", "AFTER DELETE ON transactions", """
+    UPDATE daily_sales SET units_sold = units_sold - OLD.quantity
+    WHERE sale_date = DATE(OLD.transaction_date) AND product_id = OLD.product_id;""",
+            when="OLD.transaction_type = 'sale'"),
+    trigger("inventory_low_stock_insert", "AFTER INSERT ON inventory",
+            crossing("NEW.product_id", "NULL", "NEW.quantity")),
+    trigger("inventory_low_stock_update", "AFTER UPDATE ON inventory",
+            crossing("NEW.product_id", "OLD.quantity", "NEW.quantity"),
+            when="OLD.quantity <> NEW.quantity"),
+    trigger("inventory_low_stock_delete", "AFTER DELETE ON inventory",
+            "\n    DELETE FROM low_stock WHERE product_id = OLD.product_id;"),
+    trigger("products_low_stock_update", "AFTER UPDATE ON products",
+            resync("inventory i", "i.product_id = NEW.product_id",
+                   "COALESCE(NEW.reorder_point, (SELECT c.reorder_point FROM categories c "
+                   f"WHERE c.category_id = NEW.category_id), {alerts.DEFAULT_REORDER_POINT})"),
+            when="NOT (OLD.reorder_point IS NEW.reorder_point) OR NOT (OLD.category_id IS NEW.category_id)"),
+    trigger("categories_low_stock_update", "AFTER UPDATE ON categories",
+            resync("inventory i JOIN products p ON p.product_id = i.product_id",
+                   "p.category_id = NEW.category_id AND p.reorder_point IS NULL",
+                   f"COALESCE(NEW.reorder_point, {alerts.DEFAULT_REORDER_POINT})"),
+            when="NOT (OLD.reorder_point IS NEW.reorder_point)"),
+    # products_search is an external-content FTS5 table: rows are removed by
+    # passing the old values to the special 'delete' command
+    trigger("products_search_insert", "AFTER INSERT ON products", """
+    INSERT INTO products_search (rowid, name, description) VALUES (NEW.product_id, NEW.name, NEW.description);"""),
+    trigger("products_search_update", "AFTER UPDATE OF name, description ON products", """
+    INSERT INTO products_search (products_search, rowid, name, description)
+    VALUES ('delete', OLD.product_id, OLD.name, OLD.description);
+    INSERT INTO products_search (rowid, name, description) VALUES (NEW.product_id, NEW.name, NEW.description);"""),
+    trigger("products_search_delete", "AFTER DELETE ON products", """
+    INSERT INTO products_search (products_search, rowid, name, description)
+    VALUES ('delete', OLD.product_id, OLD.name, OLD.description);"""),
+]
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS categories (
+    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    reorder_point INT NULL
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sku VARCHAR(64) NULL COLLATE NOCASE,
+    name VARCHAR(100) NOT NULL COLLATE NOCASE,
+    description TEXT,
+    price DECIMAL(10, 2) NOT NULL,
+    category_id INT REFERENCES categories(category_id),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    reorder_point INT NULL
+);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    inventory_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INT NOT NULL REFERENCES products(product_id),
+    quantity INT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INT NOT NULL REFERENCES products(product_id),
+    quantity INT NOT NULL,
+    transaction_type TEXT NOT NULL CHECK (transaction_type IN ('sale', 'restock')),
+    transaction_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    notes TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_product ON inventory (product_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory (quantity);
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date, transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_date
+    ON transactions (transaction_type, transaction_date, product_id, quantity);
+CREATE INDEX IF NOT EXISTS idx_transactions_product_date ON transactions (product_id, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_type_history
+    ON transactions (transaction_type, transaction_date, transaction_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_products_sku ON products (sku);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_categories_name ON categories (name);
+
+CREATE TABLE IF NOT EXISTS category_stats (
+    category_id INT PRIMARY KEY,
+    product_count INT NOT NULL DEFAULT 0,
+    total_units BIGINT NOT NULL DEFAULT 0,
+    total_value DECIMAL(20, 2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS daily_sales (
+    sale_date DATE NOT NULL,
+    product_id INT NOT NULL,
+    units_sold BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, product_id)
+);
+
+CREATE TABLE IF NOT EXISTS low_stock (
+    product_id INT PRIMARY KEY,
+    quantity INT NOT NULL,
+    reorder_point INT NOT NULL,
+    since TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INT NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('low', 'restored')),
+    quantity INT NOT NULL,
+    reorder_point INT NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    delivered_at TIMESTAMP NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_low_stock_quantity ON low_stock (quantity);
+CREATE INDEX IF NOT EXISTS idx_stock_alerts_pending ON stock_alerts (delivered_at, alert_id);
+CREATE INDEX IF NOT EXISTS idx_products_name ON products (name);
+{search.CREATE_SQLITE_SEARCH_TABLE};
+
+{"".join(TRIGGERS)}
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+# Steps that bring a file created at an older SCHEMA_VERSION up to date,
+# run before SCHEMA (which only creates what is missing)
+UPGRADES = [
+    (7, f"""
+ALTER TABLE products ADD COLUMN reorder_point INT NULL;
+ALTER TABLE categories ADD COLUMN reorder_point INT NULL;
+CREATE TABLE IF NOT EXISTS low_stock (
+    product_id INT PRIMARY KEY,
+    quantity INT NOT NULL,
+    reorder_point INT NOT NULL,
+    since TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+{alerts.REBUILD_LOW_STOCK_QUERY};
+"""),
+    (9, f"""
+{search.CREATE_SQLITE_SEARCH_TABLE};
+{search.REBUILD_SQLITE_SEARCH_QUERY};
+"""),
+]
+
+# Values go in and come out as they do with mysql.connector: DECIMAL columns
+# read back as Decimal, TIMESTAMP as datetime and DATE as date. A computed
+# column has no declared type; the money ones are converted by name (MONEY_COLUMNS).
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()).quantize(CENT))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+# UPDATE t SET col = LAST_INSERT_ID(expr) WHERE ... reports the new value
+# through lastrowid in MySQL; here the same value comes back via RETURNING
+LAST_INSERT_ID_SET = re.compile(r"SET\s+(\w+)\s*=\s*LAST_INSERT_ID\((.*)\)\s*\n", re.IGNORECASE)
+SESSION_CHECKS = re.compile(r"^\s*SET SESSION foreign_key_checks\s*=\s*(\d)", re.IGNORECASE)
+# Transactions here take the database write lock up front, so row locks are implied
+FOR_UPDATE = re.compile(r"\s+FOR UPDATE\s*$", re.IGNORECASE)
+PLAN_TABLE = re.compile(r"^(?:SCAN|SEARCH) (\w+)")
+PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)")
+# Computed money columns (price * quantity and sums of it), which MySQL
+# returns as DECIMAL and SQLite as a float or integer
+MONEY_COLUMNS = frozenset(("total_value", "revenue"))
+
+_translations = {}
+
+
+def translate(query):
+    """
+    Return (sqlite statement, returns_value, explain) for a MySQL statement
+    issued by the service layer. Results are memoized per statement text.
+    """
+    cached = _translations.get(query)
+    if cached is not None:
+        return cached
+
+    statement, returns_value, explain = query.replace("%s", "?"), False, False
+    match = LAST_INSERT_ID_SET.search(statement)
+    if match:
+        column = match.group(1)
+        statement = LAST_INSERT_ID_SET.sub(f"SET {column} = {match.group(2)}\n", statement)
+        statement = statement.rstrip().rstrip(";") + f"\nRETURNING {column}"
+        returns_value = True
+    statement = statement.replace("LAST_INSERT_ID()", "last_insert_rowid()")
+    statement = FOR_UPDATE.sub("\n", statement)
+    checks = SESSION_CHECKS.match(statement)
+    if checks:
+        statement = f"PRAGMA foreign_keys = {'ON' if checks.group(1) == '1' else 'OFF'}"
+    if statement.lstrip().upper().startswith("EXPLAIN ") and "QUERY PLAN" not in statement.upper():
+        statement = "EXPLAIN QUERY PLAN " + statement.lstrip()[len("EXPLAIN "):]
+        returns_value, explain = False, True
+
+    result = (statement, returns_value, explain)
+    if len(_translations) < 1000:
+        _translations[query] = result
+    return result
+
+
+def plan_row(detail):
+    """Shape an EXPLAIN QUERY PLAN line like a MySQL EXPLAIN row for explain_summary"""
+    table = PLAN_TABLE.match(detail)
+    index = PLAN_INDEX.search(detail)
+    if detail.startswith("SCAN") and not index:
+        access = "ALL"
+    elif detail.startswith("SCAN"):
+        access = "index"
+    elif detail.startswith("SEARCH"):
+        access = "ref"
+    else:
+        access = None
+    return {
+        "table": table.group(1) if table else None,
+        "type": access,
+        "key": (index.group(1) or "PRIMARY") if index else None,
+        "rows": None,
+        "Extra": "Using filesort" if "TEMP B-TREE" in detail else detail,
+    }
+
+
+def mysql_error(error):
+    """Re-raise a sqlite3 error as the mysql.connector error callers already handle"""
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError):
+        if "UNIQUE" in message:
+            return errors.IntegrityError(msg=message, errno=1062)
+        if "FOREIGN KEY" in message:
+            return errors.IntegrityError(msg=message, errno=1452)
+        return errors.IntegrityError(msg=message, errno=1048 if "NOT NULL" in message else 3819)
+    if isinstance(error, sqlite3.OperationalError):
+        if "locked" in message or "busy" in message:
+            # Treated like InnoDB's lock wait timeout: the statement failed,
+            # the connection is fine
+            return errors.DatabaseError(msg=message, errno=1205)
+        return errors.ProgrammingError(msg=message, errno=1064)
+    if isinstance(error, sqlite3.ProgrammingError) and "closed" in message:
+        return errors.InterfaceError(msg=message, errno=2055)
+    return errors.DatabaseError(msg=message)
+
+
+def money_row(row, columns):
+    """Return the row with the given computed money columns as Decimal cents"""
+    row = list(row)
+    for index in columns:
+        if isinstance(row[index], (int, float)):
+            row[index] = Decimal(str(row[index])).quantize(CENT)
+    return tuple(row)
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+        self._consumed = False
+        self._explain = False
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def execute(self, query, params=None):
+        statement, returns_value, self._explain = translate(query)
+        self._consumed = False
+        try:
+            self._cursor.execute(statement, tuple(params or ()))
+            self.description = self._cursor.description
+            if returns_value:
+                rows = self._cursor.fetchall()
+                self.rowcount = len(rows)
+                self.lastrowid = rows[0][0] if rows else 0
+                self._consumed = True
+                return
+            self.rowcount = self._cursor.rowcount
+            self.lastrowid = self._cursor.lastrowid
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def executemany(self, query, seq_params):
+        statement = translate(query)[0]
+        try:
+            self._cursor.executemany(statement, [tuple(params) for params in seq_params])
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+        self.rowcount = self._cursor.rowcount
+
+    def _rows(self, rows):
+        if self._explain:
+            rows = [plan_row(row[3]) for row in rows]
+            return rows if self._dictionary else [tuple(row.values()) for row in rows]
+        if not self.description:
+            return rows
+        names = [column[0] for column in self.description]
+        money = [index for index, name in enumerate(names) if name in MONEY_COLUMNS]
+        if money:
+            rows = [money_row(row, money) for row in rows]
+        if self._dictionary:
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def fetchall(self):
+        if self._consumed:
+            return []
+        try:
+            return self._rows(self._cursor.fetchall())
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def fetchmany(self, size=1):
+        if self._consumed:
+            return []
+        try:
+            return self._rows(self._cursor.fetchmany(size))
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A sqlite3 connection with the parts of the mysql.connector API the service uses"""
+    def __init__(self, raw, shared=False):
+        self.raw = raw
+        self._shared = shared
+        self._closed = False
+
+    def cursor(self, dictionary=False, buffered=False):
+        if self._closed:
+            raise errors.InterfaceError(msg="Connection is closed", errno=2055)
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return not self._closed and self.raw.in_transaction
+
+    def start_transaction(self, consistent_snapshot=False, isolation_level=None, readonly=False):
+        try:
+            self.raw.execute("BEGIN")
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def commit(self):
+        try:
+            self.raw.commit()
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def rollback(self):
+        try:
+            self.raw.rollback()
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def consume_results(self):
+        # sqlite3 cursors can be abandoned mid-result
+        pass
+
+    def is_connected(self):
+        if self._closed:
+            return False
+        try:
+            self.raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._shared:
+            # The in-memory database lives as long as its one connection
+            if self.raw.in_transaction:
+                self.raw.rollback()
+        else:
+            self.raw.close()
+
+
+class SQLiteBackend:
+    """
+    Embedded storage: a SQLite file (several pooled connections, WAL mode)
+    or a private :memory: database (one shared connection, so pool size 1).
+    """
+    name = "sqlite"
+
+    def __init__(self, path=":memory:", busy_timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.memory = path == ":memory:"
+        self._shared = None
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def open(self):
+        raw = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+            # Writers take the write lock at BEGIN, so two transactions never
+            # deadlock upgrading from a read lock
+            isolation_level="IMMEDIATE", check_same_thread=False
+        )
+        raw.execute("PRAGMA foreign_keys = ON")
+        if not self.memory:
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.execute("PRAGMA synchronous = NORMAL")
+        if not self._schema_ready:
+            version = raw.execute("PRAGMA user_version").fetchone()[0]
+            for target, script in UPGRADES:
+                if 0 < version < target:
+                    raw.executescript(script)
+            raw.executescript(SCHEMA)
+            self._schema_ready = True
+        return raw
+
+    def connect(self):
+        """Open a connection for the pool"""
+        with self._lock:
+            try:
+                if not self.memory:
+                    return SQLiteConnection(self.open())
+                if self._shared is None:
+                    self._shared = self.open()
+                return SQLiteConnection(self._shared, shared=True)
+            except sqlite3.Error as e:
+                raise mysql_error(e) from e
+
+    def pool_size(self, requested):
+        """Connections the pool may open: all of them for a file, one for :memory:"""
+        return 1 if self.memory else requested
+
+    def replica_lag(self, conn):
+        """A SQLite file never replicates, so as a stand-in replica it is always current"""
+        return 0.0
+
+    def close(self):
+        with self._lock:
+            if self._shared is not None:
+                self._shared.close()
+                self._shared = None
+                self._schema_ready = False
@@ -0,0 +1,165 @@
+"""
+Prepared statement registry for the Inventory Management System
+Every statement the service layer issues is registered here under a name.
+On a MySQL connection each registered statement is prepared once, the first
+time it runs, and its prepared cursor is kept with the connection, so later
+calls only send the parameters and read rows in the binary protocol instead
+of having the server re-parse the SQL text every time.
+
+Connections that are not MySQL connections (the embedded SQLite backend,
+which caches compiled statements itself, or test doubles) get ordinary
+cursors, as do statements that were never registered.
+"""
+
+import threading
+import weakref
+
+from mysql.connector import Error
+from mysql.connector.abstracts import MySQLConnectionAbstract
+
+# Server errors meaning the statement cannot go through the prepared
+# protocol at all; it then always runs as text
+UNPREPARABLE_ERRORS = {1295}
+
+# Server errors after which a prepared statement handle is no longer valid
+# (unknown statement handler, needs re-preparing) and must be prepared again
+STALE_STATEMENT_ERRORS = {1243, 1615}
+
+
+class PreparedCursor:
+    """
+    A connection's long-lived prepared cursor for one statement. close()
+    only finishes the current result; the server-side statement stays
+    prepared for the next call on the same connection.
+    """
+    def __init__(self, cursor, query):
+        self._cursor = cursor
+        self._query = query
+        self._unread = False
+
+    def execute(self, query, params=None):
+        # Passing the registered string object lets the connector see the
+        # statement is already prepared on this cursor
+        self._cursor.execute(self._query, params or ())
+        self._unread = self._cursor.with_rows
+
+    def fetchall(self):
+        self._unread = False
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        if not rows:
+            self._unread = False
+        return rows
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        if self._unread:
+            self._unread = False
+            self._cursor.fetchall()
+
+    def deallocate(self):
+        self._cursor.close()
+
+
+class StatementRegistry:
+    def __init__(self, enabled=True, connection_types=(MySQLConnectionAbstract,)):
+        """
+        enabled: prepare registered statements (False runs everything as text)
+        connection_types: connection classes that support prepared cursors
+        """
+        self.enabled = enabled
+        self.connection_types = connection_types
+
+        self._names = {}
+        self._unpreparable = set()
+        self._cursors = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {'prepared': 0, 'executions': 0, 'text': 0}
+
+    def variant(self, enabled=None, connection_types=None):
+        """
+        Return a registry sharing this one's statements (including ones
+        registered later) but with its own settings and prepared cursors
+        """
+        other = StatementRegistry(
+            self.enabled if enabled is None else enabled,
+            self.connection_types if connection_types is None else connection_types
+        )
+        other._names = self._names
+        return other
+
+    def register(self, name, query):
+        """Register a statement under a name and return its text, for use as a module constant"""
+        if name in self._names.values():
+            raise ValueError(f"Statement '{name}' is already registered")
+        self._names[query] = name
+        return query
+
+    def name(self, query):
+        """Return the registered name of a statement, or None"""
+        return self._names.get(query)
+
+    def cursor(self, conn, query):
+        """
+        Return a dictionary cursor for running `query` on `conn`: the
+        connection's prepared cursor for a registered statement, or a new
+        text-protocol cursor. Close it after use either way.
+        """
+        name = self._names.get(query)
+        if (not self.enabled or name is None or name in self._unpreparable
+                or not isinstance(conn, self.connection_types)):
+            with self._lock:
+                self._stats['text'] += 1
+            return conn.cursor(dictionary=True)
+
+        with self._lock:
+            self._stats['executions'] += 1
+            cursors = self._cursors.get(conn)
+            if cursors is None:
+                cursors = self._cursors[conn] = {}
+        cursor = cursors.get(name)
+        if cursor is None:
+            cursor = cursors[name] = PreparedCursor(conn.cursor(prepared=True, dictionary=True), query)
+            with self._lock:
+                self._stats['prepared'] += 1
+        return cursor
+
+    def failed(self, conn, query, error):
+        """
+        Forget a connection's prepared cursor if an error invalidated it, and
+        run the statement as text from now on if the server cannot prepare it.
+        Ordinary statement errors (e.g. a duplicate key) keep it prepared.
+        """
+        errno = getattr(error, 'errno', None)
+        name = self._names.get(query)
+        cursors = self._cursors.get(conn)
+        if name is None or cursors is None or errno not in UNPREPARABLE_ERRORS | STALE_STATEMENT_ERRORS:
+            return
+        cursor = cursors.pop(name, None)
+        if cursor is not None:
+            try:
+                cursor.deallocate()
+            except Error:
+                pass
+        if errno in UNPREPARABLE_ERRORS:
+            self._unpreparable.add(name)
+
+    def get_stats(self):
+        """Registered statements, prepares, prepared executions and text executions"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['registered'] = len(self._names)
+        stats['connections'] = len(self._cursors)
+        return stats
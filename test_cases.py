@@ -4,8 +4,48 @@ This script demonstrates how the application would work with three test cases
 without requiring an actual MySQL connection.
 """
 
+import asyncio
+import csv
+import gzip
+import io
+import os
+import tempfile
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from mysql.connector import Error
 from tabulate import tabulate
 
+import benchmark
+import data_generator
+import aggregates
+import alerts
+import exporter
+import cli
+import http_api
+import importer
+import ingest
+import migrations
+import partitions
+import sales_rollup
+import service
+import sharding
+import sqlite_backend
+from service import InventoryService, StockError, create_backend
+
+from connection_pool import ConnectionPool, PoolTimeoutError
+from query_cache import QueryCache
+from query_stats import QueryStats, fingerprint
+from render import TableWriter, render
+from statements import StatementRegistry
+
 class MockInventorySystem:
     def __init__(self):
         # Mock data for demonstration
@@ -205,11 +245,1903 @@ def test_case_3():
     print(f"\nTotal Inventory Value: ${total_value:.2f}")
 
 
+class FakeConnection:
+    """Stand-in for a MySQL connection that records how it was used"""
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+    
+    def is_connected(self):
+        return self.connected
+    
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+    
+    def close(self):
+        self.closed = True
+
+
+def test_case_4():
+    """Test Case 4: Connection pool reuse, checkout timeout and health checks"""
+    print("\n" + "="*50)
+    print("TEST CASE 4: Connection pool behaviour")
+    print("="*50)
+    
+    created = []
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+    
+    pool = ConnectionPool(connect, size=2, timeout=0.05, health_check_interval=0)
+    
+    # Connections are reused rather than reopened
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.get_stats()['created'] == 1
+    
+    # An exhausted pool waits, then times out
+    a = pool.get_connection()
+    b = pool.get_connection()
+    try:
+        pool.get_connection()
+        assert False, "expected a checkout timeout"
+    except PoolTimeoutError:
+        pass
+    stats = pool.get_stats()
+    assert stats['in_use'] == 2 and stats['waits'] == 1 and stats['timeouts'] == 1
+    
+    # A waiting thread is handed the next released connection
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.get_connection()))
+    pool.timeout = 1
+    waiter.start()
+    a.in_transaction = True
+    pool.release(a)
+    waiter.join()
+    assert got == [a] and a.rollbacks == 1
+    pool.release(got[0])
+    pool.release(b)
+    
+    # Dead connections fail the health check and are replaced
+    for conn in created:
+        conn.connected = False
+    with pool.connection() as conn:
+        assert conn not in (a, b)
+    stats = pool.get_stats()
+    assert stats['health_check_failures'] == 2 and stats['open'] == 1
+    
+    pool.close()
+    assert all(conn.closed for conn in created)
+    print(f"Pool stats: {pool.get_stats()}")
+
+
+def test_case_5():
+    """Test Case 5: Synthetic data generator produces consistent, skewed rows"""
+    print("\n" + "="*50)
+    print("TEST CASE 5: Synthetic data generation")
+    print("="*50)
+    
+    rng = random.Random(7)
+    products = list(data_generator.generate_products(200, 11, [1, 2, 3], rng))
+    assert [p[0] for p in products] == list(range(11, 211))
+    assert all(p[4] in (1, 2, 3) and p[3] > 0 for p in products)
+    
+    transactions = list(data_generator.generate_transactions(5000, 11, 200, 30, rng))
+    product_ids = Counter(t[0] for t in transactions)
+    assert set(product_ids) <= set(range(11, 211))
+    # A handful of best-sellers should dominate the history
+    top_share = sum(n for _, n in product_ids.most_common(10)) / len(transactions)
+    assert top_share > 0.3
+    # Rows come out in chronological order
+    dates = [t[3] for t in transactions]
+    assert dates == sorted(dates)
+    
+    chunks = list(data_generator.chunked(range(12), 5))
+    assert [len(c) for c in chunks] == [5, 5, 2]
+    print(f"Top 10 products account for {top_share:.0%} of {len(transactions)} transactions")
+
+
+class HistoryOnlySystem(InventoryService):
+    """Serves the unfiltered history query from a list instead of MySQL"""
+    def __init__(self, transactions):
+        self.transactions = transactions
+    
+    def execute_query(self, query, params=None, fetch=False):
+        *cursor, limit = params
+        keys = lambda t: (t['transaction_date'], t['transaction_id'])
+        if "ASC" in query:
+            rows = sorted((t for t in self.transactions if not cursor or keys(t) > tuple(cursor)), key=keys)
+        else:
+            rows = sorted((t for t in self.transactions if not cursor or keys(t) < tuple(cursor)),
+                          key=keys, reverse=True)
+        return rows[:limit]
+
+
+def test_case_6():
+    """Test Case 6: Keyset pagination through transaction history"""
+    print("\n" + "="*50)
+    print("TEST CASE 6: Paging through transaction history")
+    print("="*50)
+    
+    # Several transactions share a timestamp, so the id must break ties
+    transactions = [
+        {"transaction_id": i, "transaction_date": f"2024-01-{1 + i // 3:02d}"}
+        for i in range(1, 12)
+    ]
+    ims = HistoryOnlySystem(transactions)
+    
+    ids = lambda page: [t["transaction_id"] for t in page.rows]
+    
+    first = ims.query_transactions(limit=4)
+    assert ids(first) == [11, 10, 9, 8] and first.newer is None and first.older
+    second = ims.query_transactions(before=first.older, limit=4)
+    assert ids(second) == [7, 6, 5, 4] and second.newer and second.older
+    last = ims.query_transactions(before=second.older, limit=4)
+    assert ids(last) == [3, 2, 1] and last.older is None
+    
+    back = ims.query_transactions(after=last.newer, limit=4)
+    assert ids(back) == [7, 6, 5, 4] and back.older and back.newer
+    top = ims.query_transactions(after=back.newer, limit=4)
+    assert ids(top) == [11, 10, 9, 8] and top.newer is None
+    print("Paged 11 transactions forward and back in pages of 4")
+
+
+def test_case_7():
+    """Test Case 7: Query cache LRU eviction and table-tag invalidation"""
+    print("\n" + "="*50)
+    print("TEST CASE 7: Query result cache")
+    print("="*50)
+    
+    cache = QueryCache(max_entries=2, ttl=60, dependents={'inventory': ('category_stats',)})
+    categories = "SELECT category_id, name FROM categories"
+    stock = "SELECT p.name, i.quantity FROM inventory i JOIN products p ON i.product_id = p.product_id"
+    totals = "SELECT SUM(total_value) FROM category_stats"
+    
+    def load(query, rows):
+        cache.put(query, None, rows, cache.snapshot(query))
+    
+    load(categories, [{"category_id": 1}])
+    load(stock, [{"quantity": 5}])
+    assert cache.get(categories) == [{"category_id": 1}]
+    
+    # A write to inventory evicts only reads of inventory
+    cache.invalidate_for("UPDATE inventory SET quantity = %s WHERE product_id = %s")
+    assert cache.get(stock) is None
+    assert cache.get(categories) is not None
+    
+    # ...and reads of tables its triggers maintain
+    load(totals, [{"total": 10}])
+    cache.invalidate_tables(["inventory"])
+    assert cache.get(totals) is None
+    
+    # A read that overlaps a write is not cached
+    snapshot = cache.snapshot(stock)
+    cache.invalidate_tables(["products"])
+    cache.put(stock, None, [{"quantity": 4}], snapshot)
+    assert cache.get(stock) is None
+    
+    # Least recently used entries go first
+    load(stock, [{"quantity": 3}])
+    load(totals, [{"total": 9}])
+    assert cache.get(categories) is None and cache.get(totals) is not None
+    
+    stats = cache.get_stats()
+    assert stats['hits'] == 3 and stats['evictions'] == 1
+    print(f"Cache stats: {stats}")
+
+
+class BatchRecordingSystem(InventoryService):
+    """Records how batch mode groups commands into transactions"""
+    def __init__(self):
+        self.local = threading.local()
+        self.stock = {1: 10, 2: 5}
+        self.transactions = 0
+        self.savepoints = 0
+    
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield
+    
+    @contextmanager
+    def savepoint(self):
+        self.savepoints += 1
+        yield
+    
+    def adjust_stock(self, product_id, delta, transaction_type=None, notes=None):
+        if product_id not in self.stock:
+            raise StockError(f"Product {product_id} not found in inventory.")
+        if self.stock[product_id] + delta < 0:
+            raise StockError(f"Not enough inventory. Current stock: {self.stock[product_id]}")
+        self.stock[product_id] += delta
+        return self.stock[product_id]
+
+
+def test_case_8():
+    """Test Case 8: Batch mode groups commands and reports each one"""
+    print("\n" + "="*50)
+    print("TEST CASE 8: Command batch mode")
+    print("="*50)
+    
+    ims = BatchRecordingSystem()
+    lines = [
+        "# morning stock take",
+        "txn record --product 1 --qty 3 --type sale",
+        "txn record --product 2 --qty 9 --type sale",
+        "",
+        "inventory adjust --product 2 --delta 4",
+        "txn record --product 7 --qty 1 --type restock",
+        "txn explode",
+    ]
+    out = io.StringIO()
+    failed = cli.run_batch(ims, cli.build_parser(), cli.read_commands(lines), 2, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    
+    assert [r["line"] for r in records] == [2, 3, 5, 6, 7]
+    assert [r["status"] for r in records] == ["ok", "error", "ok", "error", "error"]
+    assert records[0]["result"] == {"product_id": 1, "quantity": 7}
+    assert "Not enough inventory" in records[1]["error"]
+    assert failed == 3
+    # Five commands in groups of two, each command under its own savepoint
+    assert ims.transactions == 3 and ims.savepoints == 4
+    
+    # A help request is a bad line: no usage text in the output, and the batch goes on
+    out = io.StringIO()
+    lines = ["inventory adjust --product 1 --delta 1", "product list --help", "inventory adjust --product 1 --delta 1"]
+    failed = cli.run_batch(ims, cli.build_parser(), cli.read_commands(lines), 10, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["status"] for r in records] == ["ok", "error", "ok"] and failed == 1
+    assert "help is not available" in records[1]["error"]
+    assert records[2]["result"] == {"product_id": 1, "quantity": 9}
+    print(f"{len(records)} commands, {failed} failed, {ims.transactions} transactions")
+
+
+class APIRecordingSystem(BatchRecordingSystem):
+    """Batch test double plus the lookups and stats the HTTP API calls"""
+    def get_product(self, product_id):
+        if product_id not in self.stock:
+            return None
+        return {"product_id": product_id, "name": f"Product {product_id}", "price": 9.5}
+    
+    def get_pool_stats(self):
+        return {"size": 2, "in_use": 0}
+    
+    def get_cache_stats(self):
+        return None
+    
+    def get_statement_stats(self):
+        return {"registered": 0, "prepared": 0, "executions": 0, "text": 0, "connections": 0}
+    
+    def get_query_stats(self):
+        return {}
+    
+    def get_replica_stats(self):
+        return None
+
+
+async def call_api(port, requests):
+    """Send requests over one keep-alive connection; returns (status, body) pairs"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for method, path, body in requests:
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode() if body else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        payload = await reader.readexactly(int(headers["content-length"]))
+        responses.append((status, json.loads(payload) if payload else None))
+    writer.close()
+    return responses
+
+
+def test_case_9():
+    """Test Case 9: HTTP API routes, error statuses and latency metrics"""
+    print("\n" + "="*50)
+    print("TEST CASE 9: HTTP/JSON API")
+    print("="*50)
+    
+    async def scenario():
+        api = http_api.InventoryAPI(APIRecordingSystem(), concurrency=2)
+        server = await api.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await call_api(port, [
+                ("GET", "/products/1", None),
+                ("GET", "/products/99", None),
+                ("POST", "/transactions", {"product_id": 1, "quantity": 3, "type": "sale"}),
+                ("POST", "/transactions", {"product_id": 2, "quantity": 9, "type": "sale"}),
+                ("POST", "/inventory/2/adjust", "{not json"),
+                ("POST", "/transactions", {"product_id": 1, "quantity": 0, "type": "sale"}),
+                ("DELETE", "/inventory/1", None),
+                ("GET", "/metrics", None),
+            ])
+        finally:
+            await api.close()
+    
+    responses = asyncio.run(scenario())
+    statuses = [status for status, _ in responses]
+    
+    assert statuses == [200, 404, 201, 409, 400, 400, 405, 200]
+    assert responses[0][1]["name"] == "Product 1"
+    assert responses[2][1] == {"product_id": 1, "quantity": 7}
+    assert "Not enough inventory" in responses[3][1]["error"]
+    routes = responses[-1][1]["routes"]
+    # Requests are grouped by route template, not by the concrete path
+    assert routes["GET /products/{id}"]["count"] == 2
+    assert routes["POST /transactions"]["count"] == 3
+    assert routes["POST /transactions"]["p99_ms"] >= routes["POST /transactions"]["p50_ms"]
+    print(f"Statuses: {statuses}")
+    print(f"Routes measured: {', '.join(routes)}")
+
+
+class ImportConnection:
+    """Keeps categories, products and inventory in dicts and understands the importer's statements"""
+    def __init__(self):
+        self.tables = {"categories": {"tools": (1, "Tools")}, "products": {}, "inventory": {}}
+        self.commits = 0
+        self.saved = None
+    
+    def start_transaction(self):
+        self.saved = {name: dict(rows) for name, rows in self.tables.items()}
+    
+    def commit(self):
+        self.commits += 1
+    
+    def rollback(self):
+        self.tables = self.saved
+    
+    def cursor(self):
+        return ImportCursor(self)
+
+
+class ImportCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+    
+    def execute(self, query, params=None):
+        tables = self.connection.tables
+        params = list(params or [])
+        if query.startswith("SELECT category_id"):
+            self.rows = list(tables["categories"].values())
+        elif query.startswith("SELECT sku"):
+            self.rows = [(p["sku"], p["product_id"]) for key, p in tables["products"].items() if key in params]
+        elif "INTO categories" in query:
+            for name, _ in zip(params[::2], params[1::2]):
+                tables["categories"].setdefault(name.lower(), (len(tables["categories"]) + 1, name))
+        elif "INTO products" in query:
+            for sku, name, _, price, category_id in zip(*[iter(params)] * 5):
+                if name.startswith("!"):
+                    raise Error(msg="Incorrect string value", errno=1366)
+                existing = tables["products"].get(sku.lower())
+                product_id = existing["product_id"] if existing else len(tables["products"]) + 1
+                tables["products"][sku.lower()] = {"product_id": product_id, "sku": sku, "name": name,
+                                                   "price": price, "category_id": category_id}
+        elif "INTO inventory" in query:
+            for product_id, quantity in zip(params[::2], params[1::2]):
+                if "VALUES(quantity)" in query or product_id not in tables["inventory"]:
+                    tables["inventory"][product_id] = quantity
+    
+    def fetchall(self):
+        return self.rows
+    
+    def close(self):
+        pass
+
+
+def test_case_10():
+    """Test Case 10: Streaming bulk import with validation and rejects"""
+    print("\n" + "="*50)
+    print("TEST CASE 10: Bulk import")
+    print("="*50)
+    
+    catalog = io.StringIO(
+        "sku,name,description,price,category,quantity\n"
+        "HAM-1,Hammer,,12.50,Tools,10\n"
+        "SAW-1,Saw,,abc,Tools,5\n"
+        "DRL-1,Drill,,89.00,Power Tools,3\n"
+        "NUT-1,Nuts,,0.10,tools,\n"
+        "BAD-1,!Broken,,1.00,Tools,1\n"
+        "ham-1,Claw Hammer,,14.00,Tools,\n"
+    )
+    rejects = io.StringIO()
+    conn = ImportConnection()
+    job = importer.Importer(conn, "products", batch_size=3)
+    writer = importer.RejectWriter(rejects, "csv", importer.IMPORT_COLUMNS["products"])
+    summary = job.run(importer.read_rows(catalog, "csv"), writer)
+    
+    products = conn.tables["products"]
+    inventory = conn.tables["inventory"]
+    assert (summary["read"], summary["imported"], summary["rejected"]) == (6, 3, 3)
+    # Re-importing a SKU updates the product and, without a quantity, keeps its stock
+    assert products["ham-1"]["name"] == "Claw Hammer" and inventory[products["ham-1"]["product_id"]] == 10
+    assert inventory[products["nut-1"]["product_id"]] == 0
+    reasons = [row["error"] for row in csv.DictReader(io.StringIO(rejects.getvalue()))]
+    assert reasons[0].startswith("'price' must be a number")
+    assert reasons[1] == "Unknown category 'Power Tools'"
+    assert reasons[2].startswith("Database error")
+    
+    # Stock levels by SKU; unknown SKUs are rejected
+    stock = importer.Importer(conn, "stock").run(
+        importer.read_rows(io.StringIO('{"sku": "NUT-1", "quantity": 500}\n{"sku": "ZZZ", "quantity": 1}\n'), "jsonl")
+    )
+    assert stock["imported"] == 1 and inventory[products["nut-1"]["product_id"]] == 500
+    print(f"Imported {summary['imported']} of {summary['read']} rows, rejected: {reasons}")
+
+
+class ExportConnection:
+    """Serves the exporter's keyset queries from a list, optionally failing on one chunk"""
+    def __init__(self, transactions, fail_on_chunk=None):
+        self.transactions = transactions
+        self.fail_on_chunk = fail_on_chunk
+        self.chunks = 0
+        self.fetches = []
+    
+    def cursor(self, dictionary=False):
+        return ExportCursor(self)
+    
+    def commit(self):
+        pass
+
+
+class ExportCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+    
+    def execute(self, query, params=None):
+        rows = self.connection.transactions
+        if "MIN(transaction_id)" in query:
+            ids = [t["transaction_id"] for t in rows]
+            self.rows = [{"first_id": min(ids), "last_id": max(ids)}]
+            return
+        self.connection.chunks += 1
+        if self.connection.chunks == self.connection.fail_on_chunk:
+            raise Error(msg="Lost connection to MySQL server during query", errno=2013)
+        after, upto, limit = params
+        self.rows = [t for t in rows if after < t["transaction_id"] <= upto][:limit]
+    
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+    
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        self.connection.fetches.append(len(rows))
+        return rows
+    
+    def close(self):
+        pass
+
+
+def test_case_11():
+    """Test Case 11: Chunked, compressed, resumable transaction export"""
+    print("\n" + "="*50)
+    print("TEST CASE 11: Streaming export")
+    print("="*50)
+    
+    start = datetime(2024, 1, 1)
+    history = [{"transaction_id": i, "product_id": i % 3 + 1, "transaction_type": "sale", "quantity": i,
+                "transaction_date": start + timedelta(hours=i), "notes": "a, \"quoted\" note" if i == 4 else None}
+               for i in range(1, 11)]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.csv.gz")
+        fmt, compress = exporter.output_format(path, None)
+        
+        # The third chunk fails mid-export: the checkpoint covers the first two
+        interrupted = ExportConnection(history, fail_on_chunk=3)
+        try:
+            exporter.export_transactions(interrupted, path, fmt, compress, chunk_rows=3, fetch_rows=2)
+            assert False, "export should have failed"
+        except Error:
+            pass
+        assert exporter.load_checkpoint(path)["last_id"] == 6
+        
+        resumed = ExportConnection(history)
+        rows = exporter.export_transactions(resumed, path, fmt, compress, resume=True, chunk_rows=3, fetch_rows=2)
+        
+        with gzip.open(path, "rt", newline="") as source:
+            exported = list(csv.DictReader(source))
+        assert rows == 10 and [int(r["transaction_id"]) for r in exported] == list(range(1, 11))
+        assert exported[3]["notes"] == 'a, "quoted" note'
+        assert not os.path.exists(exporter.checkpoint_path(path))
+        # Rows arrive in fetchmany batches, never more than fetch_rows at a time
+        assert max(interrupted.fetches + resumed.fetches) == 2
+    print(f"Exported {rows} rows across an interruption, fetched in batches of at most 2")
+
+
+def test_case_12():
+    """Test Case 12: Benchmark measurement and baseline comparison"""
+    print("\n" + "="*50)
+    print("TEST CASE 12: Benchmark regression check")
+    print("="*50)
+    
+    calls = []
+    stats = benchmark.measure(lambda: calls.append(1), iterations=50, warmup=5, max_seconds=10)
+    assert len(calls) == 55 and stats["iterations"] == 50
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    
+    baseline = {"scales": {"1k": {
+        "report_low_stock": {"p50_ms": 2.0, "p95_ms": 4.0},
+        "record_transaction": {"p50_ms": 0.2, "p95_ms": 0.3},
+        "inventory_view": {"p50_ms": 5.0, "p95_ms": 9.0},
+    }}}
+    current = {"scales": {"1k": {
+        "report_low_stock": {"p50_ms": 2.2, "p95_ms": 6.0},    # p95 +50%: regression
+        "record_transaction": {"p50_ms": 0.4, "p95_ms": 0.6},  # doubled, but within the noise floor
+        "inventory_view": {"p50_ms": 4.0, "p95_ms": 8.0},      # faster
+        "catalog_first_page": {"p50_ms": 1.0, "p95_ms": 2.0},  # not in the baseline
+    }}}
+    regressions = benchmark.compare(current, baseline, threshold=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("1k report_low_stock: p95_ms")
+    print(f"Regressions: {regressions}")
+
+
+class StatsConnection(FakeConnection):
+    """Connection whose low-stock query is slow and whose EXPLAIN shows a full scan"""
+    def cursor(self, dictionary=False, buffered=False):
+        return StatsCursor()
+
+
+class StatsCursor:
+    def __init__(self):
+        self.rows = []
+        self.rowcount = 0
+    
+    def execute(self, query, params=None):
+        if query.startswith("EXPLAIN"):
+            self.rows = [{"table": "i", "type": "ALL", "key": None, "rows": 5000, "Extra": "Using filesort"}]
+        elif "FROM low_stock" in query:
+            time.sleep(0.01)
+            self.rows = [{"name": "Laptop", "quantity": 3, "category": "Electronics"}]
+        else:
+            self.rows = [{"product_id": 1}, {"product_id": 2}]
+    
+    def fetchall(self):
+        return self.rows
+    
+    def close(self):
+        pass
+
+
+def test_case_13():
+    """Test Case 13: Query instrumentation and the slow-query log"""
+    print("\n" + "="*50)
+    print("TEST CASE 13: Query instrumentation")
+    print("="*50)
+    
+    assert fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 10") == \
+        "SELECT * FROM t WHERE id IN (?+) AND name = ? LIMIT ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (?+)"
+    
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "slow.log")
+        service = InventoryService(pool=ConnectionPool(StatsConnection, size=1),
+                                   stats=QueryStats(slow_ms=5, slow_log=log))
+        with service.operation("Reports"):
+            service.low_stock_items()
+            service.low_stock_items()
+        service.list_products()
+        
+        stats = service.get_query_stats()
+        assert stats["operations"]["Reports"]["queries"] == 2
+        # Without a label, queries are attributed to the service method that issued them
+        assert stats["operations"]["list_products"]["queries"] == 1
+        slowest = stats["statements"][0]
+        assert slowest["operation"] == "Reports" and slowest["rows"] == 2 and slowest["max_ms"] >= 10
+        
+        with open(log) as source:
+            entries = source.read()
+        # Both slow runs are logged; the plan is taken once per interval
+        assert entries.count("operation=Reports") == 2
+        assert entries.count("type=ALL") == 1 and "full scan" in entries
+        service.close()
+    print(service.query_report(limit=3))
+
+
+def check_service_behaviour(service):
+    """
+    Backend-agnostic checks of the service layer against a real database.
+    Names are unique per run so a scratch MySQL database can be reused.
+    """
+    tag = f"{random.randrange(16 ** 6):06x}"
+    category = service.create_category(f"Tools {tag}", "Hand tools")
+    assert category
+    product = service.create_product(f"Hammer {tag}", "Claw hammer", 12.5, category, quantity=20, sku=f"H-{tag}")
+    assert service.get_product(product)["sku"] == f"H-{tag}"
+    
+    # The stock guard and the transaction log
+    assert service.record_transaction(product, 12, "sale") == 8
+    assert service.record_transaction(product, 4, "restock", "delivery") == 12
+    try:
+        service.record_transaction(product, 13, "sale")
+        assert False, "overselling must fail"
+    except StockError as e:
+        assert "Current stock: 12" in str(e)
+    assert service.set_stock(product, 9) == 9
+    assert any(row["name"] == f"Hammer {tag}" for row in service.low_stock_items())
+    
+    # Trigger-maintained aggregates
+    summary = {row["category"]: row for row in service.category_summary()}[f"Tools {tag}"]
+    assert (summary["product_count"], summary["total_units"]) == (1, 9)
+    assert float(summary["total_value"]) == 112.5
+    service.update_product(product, f"Hammer {tag}", "Claw hammer", 10, category)
+    summary = {row["category"]: row for row in service.category_summary()}[f"Tools {tag}"]
+    assert float(summary["total_value"]) == 90
+    today = datetime.now().date()
+    sales = {row["name"]: row for row in service.sales_summary(today - timedelta(days=1), today + timedelta(days=1))}
+    assert sales[f"Hammer {tag}"]["units_sold"] == 12
+    
+    # Computed money columns read back as Decimal, as DECIMAL columns do
+    assert sales[f"Hammer {tag}"]["revenue"] == Decimal("120.00")
+    assert isinstance(summary["total_value"], Decimal) and isinstance(service.inventory_total(), Decimal)
+    pins = service.create_product(f"Pins {tag}", None, Decimal("0.10"), category, quantity=3)
+    levels = {row["product_id"]: row for row in service.inventory_levels()}
+    assert levels[pins]["total_value"] == Decimal("0.30") and str(levels[pins]["total_value"]) == "0.30"
+    assert all(isinstance(row["total_value"], Decimal) for row in service.high_value_items())
+    assert service.delete_product(pins) is True
+    
+    # Keyset paging through the history, newest first
+    first = service.query_transactions(product_id=product, limit=1)
+    second = service.query_transactions(product_id=product, before=first.older, limit=1)
+    assert first.rows[0]["transaction_type"] == "restock" and second.rows[0]["transaction_type"] == "sale"
+    assert second.older is None
+    
+    # A failed unit of work leaves nothing behind
+    try:
+        with service.transaction():
+            service.create_product(f"Saw {tag}", None, 20, category, quantity=5)
+            service.create_product(f"Duplicate {tag}", None, 5, category, sku=f"H-{tag}")
+        assert False, "a duplicate SKU must fail"
+    except Error as e:
+        assert e.errno == 1062
+    assert {row["category"]: row for row in service.category_summary()}[f"Tools {tag}"]["product_count"] == 1
+    
+    assert service.delete_product(product) is True
+    assert service.get_product(product) is None
+    assert service.delete_product(product) is False
+
+
+def test_case_14():
+    """Test Case 14: The same service behaviour on every storage backend"""
+    print("\n" + "="*50)
+    print("TEST CASE 14: Storage backends")
+    print("="*50)
+    
+    # TEST_BACKENDS=sqlite,mysql also runs the checks against DB_CONFIG's server
+    backends = os.getenv("TEST_BACKENDS", "sqlite").split(",")
+    with tempfile.TemporaryDirectory() as directory:
+        targets = [("sqlite :memory:", create_backend("sqlite", ":memory:")),
+                   ("sqlite file", create_backend("sqlite", os.path.join(directory, "inventory.db")))]
+        if "mysql" in backends:
+            targets.append(("mysql", create_backend("mysql")))
+        
+        for label, backend in targets:
+            service = InventoryService(backend=backend)
+            try:
+                check_service_behaviour(service)
+                print(f"{label}: OK")
+            finally:
+                service.close()
+        
+        # Several pooled connections writing one file concurrently
+        service = InventoryService(backend=create_backend("sqlite", os.path.join(directory, "inventory.db")))
+        category = service.create_category("Concurrency")
+        product = service.create_product("Widget", None, 1, category, quantity=40)
+        failures = []
+        
+        def sell():
+            for _ in range(10):
+                if service.record_transaction(product, 1, "sale") is None:
+                    failures.append(1)
+        
+        workers = [threading.Thread(target=sell) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert not failures and service.get_stock(product)["quantity"] == 0
+        assert service.get_pool_stats()["created"] > 1
+        service.close()
+        print("sqlite file: 40 concurrent sales applied exactly once")
+
+
+class PreparingConnection(FakeConnection):
+    """Connection that counts statements prepared on the server, like the connector does"""
+    def __init__(self):
+        super().__init__()
+        self.prepares = 0
+        self.text_queries = []
+        self.quantity = 10
+    
+    def cursor(self, dictionary=False, buffered=False, prepared=False):
+        return PreparingCursor(self, prepared)
+    
+    def commit(self):
+        pass
+
+
+class PreparingCursor:
+    def __init__(self, connection, prepared):
+        self.connection = connection
+        self.prepared = prepared
+        self.executed = None
+        self.rows = []
+        self.with_rows = False
+        self.rowcount = 0
+        self.lastrowid = None
+    
+    def execute(self, query, params=()):
+        if not self.prepared:
+            self.connection.text_queries.append(query)
+        elif query is not self.executed:
+            # A prepared cursor re-prepares whenever it is given another statement
+            self.connection.prepares += 1
+            self.executed = query
+        self.rows, self.with_rows = [], query.lstrip().startswith("SELECT")
+        if query is service.ADJUST_STOCK_QUERY:
+            delta = params[0]
+            self.rowcount = int(self.connection.quantity + delta >= params[3])
+            if self.rowcount:
+                self.connection.quantity += delta
+                self.lastrowid = self.connection.quantity
+        elif query is service.STOCK_QUANTITY_QUERY:
+            self.rows = [{"quantity": self.connection.quantity}]
+        elif query is service.STOCK_LEVEL_QUERY:
+            self.rows = [{"name": "Widget", "quantity": self.connection.quantity}]
+        else:
+            self.rowcount = 1
+    
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        self.rowcount = len(rows)
+        return rows
+    
+    def close(self):
+        pass
+
+
+def test_case_15():
+    """Test Case 15: Registered statements are prepared once per connection"""
+    print("\n" + "="*50)
+    print("TEST CASE 15: Prepared statement registry")
+    print("="*50)
+    
+    registry = service.STATEMENTS.variant(connection_types=(PreparingConnection,))
+    connection = PreparingConnection()
+    system = InventoryService(pool=ConnectionPool(lambda: connection, size=1), statements=registry,
+                              stats=QueryStats(slow_ms=0))
+    
+    for _ in range(5):
+        system.record_transaction(1, 1, "sale")
+    assert system.get_stock(1)["quantity"] == 5
+    # The stock guard and the transaction insert, each prepared once for ten executions
+    assert connection.prepares == 3 and connection.text_queries == []
+    try:
+        system.record_transaction(1, 50, "sale")
+        assert False, "overselling must fail"
+    except StockError as e:
+        assert "Current stock: 5" in str(e)
+    assert connection.prepares == 4
+    
+    # Unregistered SQL and disabled registries use the text protocol
+    system.execute_query("SELECT 1", fetch=True)
+    text_only = InventoryService(pool=ConnectionPool(lambda: connection, size=1),
+                                 statements=registry.variant(enabled=False))
+    text_only.get_stock(1)
+    assert connection.prepares == 4 and len(connection.text_queries) == 2
+    
+    # A statement the server cannot prepare falls back to text for good
+    unpreparable = Error(msg="This command is not supported in the prepared statement protocol yet", errno=1295)
+    registry.failed(connection, service.STOCK_LEVEL_QUERY, unpreparable)
+    system.get_stock(1)
+    assert connection.text_queries[-1] is service.STOCK_LEVEL_QUERY
+    
+    stats = system.get_statement_stats()
+    assert stats["prepared"] == 4 and stats["registered"] >= 20
+    print(f"Statement stats: {stats}")
+    
+    own = StatementRegistry()
+    own.register("ping", "SELECT 1")
+    try:
+        own.register("ping", "SELECT 2")
+        assert False, "names must be unique"
+    except ValueError:
+        pass
+
+
+class PipelineConnection(FakeConnection):
+    """Connection that records each round trip, accepting multi-statement batches"""
+    def __init__(self):
+        super().__init__()
+        self.round_trips = []
+        self.commits = 0
+        self.fail = None
+    
+    def cursor(self, dictionary=False, buffered=False, prepared=False):
+        return PipelineCursor(self)
+    
+    def commit(self):
+        self.commits += 1
+
+
+class PipelineCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self.lastrowid = None
+        self.rows = []
+    
+    def execute(self, query, params=(), multi=False):
+        statements = query.split(";\n")
+        self.connection.round_trips.append((statements, list(params)))
+        if multi:
+            return self.results(statements)
+        self.rows = [{"name": "Widget", "quantity": 1}] if query.lstrip().startswith("SELECT") else []
+        self.rowcount = len(self.rows) or 1
+    
+    def results(self, statements):
+        for number, statement in enumerate(statements, 1):
+            if self.connection.fail and self.connection.fail in statement:
+                raise Error(msg="Cannot delete or update a parent row", errno=1451)
+            self.rowcount, self.lastrowid = 1, 100 + number
+            yield self
+    
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+    
+    def close(self):
+        pass
+
+
+def test_case_16():
+    """Test Case 16: Multi-statement operations as one pipelined batch and one commit"""
+    print("\n" + "="*50)
+    print("TEST CASE 16: Unit of work")
+    print("="*50)
+    
+    connection = PipelineConnection()
+    system = InventoryService(pool=ConnectionPool(lambda: connection, size=1),
+                              statements=service.STATEMENTS.variant(enabled=False), stats=QueryStats(slow_ms=0))
+    system.pipelined_connections = (PipelineConnection,)
+    
+    # Product and inventory rows: one round trip, one commit
+    assert system.create_product("Widget", None, 5, 1, quantity=3, sku="W-1") == 101
+    statements, params = connection.round_trips[-1]
+    assert len(statements) == 2 and "LAST_INSERT_ID()" in statements[1]
+    assert params == ["W-1", "Widget", None, 5, 1, 3] and connection.commits == 1
+    
+    assert system.delete_product(7) is True
+    assert len(connection.round_trips) == 2 and len(connection.round_trips[-1][0]) == 3
+    assert connection.commits == 2
+    
+    # Queued writes reach the server before a read in the same unit
+    with system.unit_of_work() as work:
+        work.execute(service.SET_STOCK_QUERY, (1, 7))
+        assert len(connection.round_trips) == 2
+        assert system.get_stock(7)["quantity"] == 1
+        assert connection.round_trips[-2][0][0].startswith("UPDATE inventory")
+    assert connection.commits == 3
+    
+    # A failing statement aborts the whole batch and nothing is committed
+    connection.fail = "DELETE FROM products"
+    try:
+        system.delete_product(7)
+        assert False, "the batch must fail"
+    except Error as e:
+        assert e.errno == 1451
+    assert connection.commits == 3 and connection.rollbacks >= 1
+    
+    stats = system.get_query_stats()
+    # Three statements from the first delete, then the failed batch as one error
+    assert stats["operations"]["delete_product"]["queries"] == 4
+    assert stats["operations"]["delete_product"]["errors"] == 1
+    print(f"{len(connection.round_trips)} round trips, {connection.commits} commits")
+
+
+def test_case_17():
+    """Test Case 17: Tables stream row by row with bounded buffering"""
+    print("\n" + "="*50)
+    print("TEST CASE 17: Streaming table renderer")
+    print("="*50)
+    
+    pulled = []
+    
+    def rows(count):
+        for i in range(1, count + 1):
+            pulled.append(i)
+            yield [i, f"Product {i}", 2.5 * i]
+    
+    # Widths from the schema: each row is written before the next is read
+    out = io.StringIO()
+    lines_seen = []
+    writer = TableWriter(out, ["ID", "Name", "Price"], widths=[4, 12, 8])
+    for row in rows(3):
+        writer.write(row)
+        lines_seen.append((len(pulled), out.getvalue().count("\n")))
+    writer.close()
+    assert lines_seen[0] == (1, 4) and lines_seen[2] == (3, 6)
+    
+    # Sized from a sample: at most `sample` rows are held, the rest stream
+    out = io.StringIO()
+    pulled.clear()
+    writer = TableWriter(out, ["ID", "Name", "Price"], sample=2, max_width=10)
+    for row in rows(5):
+        writer.write(row)
+        assert len(writer._pending) < 2
+    writer.write([6, "A much longer product name", None])
+    writer.close()
+    lines = out.getvalue().splitlines()
+    assert lines[1] == "| ID | Name      | Price |" and lines[3] == "|  1 | Product 1 |   2.5 |"
+    assert lines[-2] == "|  6 | A much... |       |" and writer.rows == 6
+    
+    # Redirected output is CSV or JSON lines; nothing is written for no rows
+    out = io.StringIO()
+    assert render(rows(2), ["ID", "Name", "Price"], out=out) == 2
+    assert out.getvalue().splitlines() == ["ID,Name,Price", "1,Product 1,2.5", "2,Product 2,5.0"]
+    out = io.StringIO()
+    render(rows(1), ["ID", "Name", "Price"], out=out, fmt="json")
+    assert json.loads(out.getvalue()) == {"ID": 1, "Name": "Product 1", "Price": 2.5}
+    out = io.StringIO()
+    assert render(iter([]), ["ID"], out=out, fmt="table") == 0 and out.getvalue() == ""
+    
+    out = io.StringIO()
+    cli.emit([{"sku": "W-1", "quantity": 3}], "table", out=out)
+    print(out.getvalue())
+    assert "| W-1 |        3 |" in out.getvalue()
+
+
+def test_case_18():
+    """Test Case 18: Reorder points, the maintained low-stock set and the alert queue"""
+    print("\n" + "="*50)
+    print("TEST CASE 18: Low-stock alerts")
+    print("="*50)
+    
+    backend = create_backend("sqlite", ":memory:")
+    system = InventoryService(backend=backend)
+    tools = system.create_category("Tools")
+    hammer = system.create_product("Hammer", None, 5, tools, quantity=3)
+    saw = system.create_product("Saw", None, 9, tools, quantity=30)
+    
+    def pending():
+        return [(a["product_id"], a["kind"], a["quantity"], a["reorder_point"]) for a in system.pending_alerts()]
+    
+    # New stock below the default reorder point is listed and alerted once
+    assert [item["name"] for item in system.low_stock_items()] == ["Hammer"]
+    assert pending() == [(hammer, "low", 3, 10)]
+    system.record_transaction(hammer, 1, "sale")
+    assert len(pending()) == 1 and system.low_stock_items()[0]["quantity"] == 2
+    
+    # Crossing in either direction queues an alert and updates the set
+    system.record_transaction(saw, 25, "sale")
+    system.record_transaction(hammer, 20, "restock")
+    assert pending()[1:] == [(saw, "low", 5, 10), (hammer, "restored", 22, 10)]
+    assert [item["name"] for item in system.low_stock_items()] == ["Saw"]
+    
+    # A category default applies to products without their own reorder point
+    system.set_category_reorder_point(tools, 25)
+    assert [item["name"] for item in system.low_stock_items()] == ["Saw", "Hammer"]
+    assert pending()[-1] == (hammer, "low", 22, 25)
+    system.set_reorder_point(hammer, 4)
+    assert [item["reorder_point"] for item in system.low_stock_items()] == [25]
+    system.set_stock(saw, 40)
+    assert system.low_stock_items() == [] and pending()[-1] == (saw, "restored", 40, 25)
+    
+    # Delivery appends JSON lines, then acknowledges what it wrote
+    sink = io.StringIO()
+    connection = backend.connect()
+    assert alerts.deliver_alerts(connection, sink, batch=2) == 6
+    delivered = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert [a["alert_id"] for a in delivered] == list(range(1, 7)) and delivered[0]["name"] == "Hammer"
+    assert system.pending_alerts() == [] and alerts.deliver_alerts(connection, sink) == 0
+    connection.close()
+    
+    assert system.delete_product(saw) and system.low_stock_items() == []
+    print(f"{len(delivered)} alerts delivered")
+    system.close()
+
+
+class PartitionConnection:
+    """A partitioned transactions table in memory, for the partition DDL and the archive job"""
+    def __init__(self, transactions, months):
+        self.transactions = transactions
+        self.partitions = [partitions.partition_name(m) for m in months] + ["pmax"]
+        self.ddl = []
+    
+    def partition_of(self, row):
+        for name in self.partitions:
+            month = partitions.partition_month(name)
+            if month is None or row["transaction_date"].date() < partitions.add_months(month, 1):
+                return name
+    
+    def cursor(self, dictionary=False):
+        return PartitionCursor(self)
+    
+    def commit(self):
+        pass
+
+
+class PartitionCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+    
+    def execute(self, query, params=None):
+        conn = self.connection
+        if "information_schema.partitions" in query:
+            self.rows = [(name, None, sum(conn.partition_of(t) == name for t in conn.transactions))
+                         for name in conn.partitions]
+        elif query.startswith("ALTER TABLE"):
+            conn.ddl.append(query)
+            if "DROP PARTITION" in query:
+                name = query.split()[-1]
+                conn.transactions = [t for t in conn.transactions if conn.partition_of(t) != name]
+                conn.partitions.remove(name)
+            else:
+                conn.partitions = conn.partitions[:-1] + re.findall(r"PARTITION (p\w+) VALUES", query)
+        elif "MIN(transaction_date)" in query:
+            self.rows = [(min((t["transaction_date"] for t in conn.transactions), default=None),)]
+        elif "COUNT(*)" in query:
+            name = query.split("(")[-1].rstrip(")")
+            self.rows = [(sum(conn.partition_of(t) == name for t in conn.transactions),)]
+        else:
+            # The exporter's id range and keyset chunk queries, bounded by an end date
+            end = params[-2] if "LIMIT" in query else params[-1]
+            matching = [t for t in conn.transactions if t["transaction_date"] < datetime.fromisoformat(str(end))]
+            if "MIN(transaction_id)" in query:
+                ids = [t["transaction_id"] for t in matching]
+                self.rows = [{"first_id": min(ids, default=None), "last_id": max(ids, default=None)}]
+            else:
+                after, upto, limit = params[0], params[1], params[-1]
+                self.rows = [t for t in matching if after < t["transaction_id"] <= upto][:limit]
+    
+    def fetchone(self):
+        return self.rows[0]
+    
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+    
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+    
+    def close(self):
+        pass
+
+
+def test_case_19():
+    """Test Case 19: Monthly transaction partitions and the archive job"""
+    print("\n" + "="*50)
+    print("TEST CASE 19: Partitioning and archival")
+    print("="*50)
+    
+    today = datetime(2024, 6, 15).date()
+    
+    # The initial layout runs from the oldest row (or the retention start) to the months ahead
+    unpartitioned = PartitionConnection([{"transaction_date": datetime(2023, 12, 20)}], [])
+    unpartitioned.partitions = []
+    partitions.partition_transactions(unpartitioned.cursor(), today, retention=3, ahead=2)
+    ddl = unpartitioned.ddl[-1]
+    assert "PARTITION p202312 VALUES LESS THAN (UNIX_TIMESTAMP('2024-01-01 00:00:00'))" in ddl
+    assert "PARTITION p202408" in ddl and "p202409" not in ddl and ddl.rstrip().endswith("MAXVALUE\n)")
+    
+    start = datetime(2024, 1, 1)
+    history = [{"transaction_id": i, "product_id": 1, "transaction_type": "sale", "quantity": i,
+                "transaction_date": start + timedelta(days=4 * i), "notes": None}
+               for i in range(1, 36)]
+    connection = PartitionConnection(history, [partitions.add_months(start.date(), n) for n in range(6)])
+    
+    # Future months are split out of pmax
+    assert partitions.ensure_partitions(connection, today, ahead=2) == ["p202407", "p202408"]
+    assert connection.partitions[-3:] == ["p202407", "p202408", "pmax"]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        assert partitions.archive_expired(connection, directory, retention=3, today=today, dry_run=True) == \
+            [("p202401", None), ("p202402", None)]
+        archived = partitions.archive_expired(connection, directory, retention=3, today=today)
+        assert archived == [("p202401", 7), ("p202402", 7)]
+        assert connection.partitions[0] == "p202403" and min(t["transaction_id"] for t in connection.transactions) == 15
+        assert sorted(os.listdir(directory)) == ["transactions-2024-01.csv.gz", "transactions-2024-02.csv.gz"]
+        assert partitions.archive_expired(connection, directory, retention=3, today=today) == []
+        
+        # Archived months are still readable through the exporter
+        path = os.path.join(directory, "february.jsonl")
+        rows = exporter.export_archive(directory, path, "jsonl", False, datetime(2024, 2, 1), datetime(2024, 3, 1))
+        with open(path) as source:
+            exported = [json.loads(line) for line in source]
+        assert rows == 7 and [r["transaction_id"] for r in exported] == list(range(8, 15))
+        assert exported[0]["transaction_date"] == "2024-02-02 00:00:00"
+    print(f"Archived {sum(rows for _, rows in archived)} transactions from {len(archived)} partitions")
+
+
+def test_case_20():
+    """Test Case 20: Batched ingest with coalesced stock updates, per-event acks and backpressure"""
+    print("\n" + "="*50)
+    print("TEST CASE 20: Ingest pipeline")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    tools = system.create_category("Tools")
+    hammer = system.create_product("Hammer", None, 5, tools, quantity=10)
+    saw = system.create_product("Saw", None, 9, tools, quantity=2)
+    
+    # Submitted before the workers start, so all of it lands in one flush
+    pipeline = ingest.IngestPipeline(system, workers=1, batch_size=100, flush_interval=0.5)
+    futures = [
+        pipeline.submit(hammer, 3, "sale"),
+        pipeline.submit(saw, 5, "sale"),
+        pipeline.submit(hammer, 4, "restock", "Delivery"),
+        pipeline.submit(saw, 1, "sale"),
+        pipeline.submit(hammer, 12, "sale"),
+        pipeline.submit(999, 1, "restock"),
+    ]
+    try:
+        pipeline.submit(hammer, 0, "sale")
+        assert False, "expected a ValueError"
+    except ValueError:
+        pass
+    pipeline.close()
+    
+    # Each event is acknowledged with the quantity after it, or with its rejection
+    assert futures[0].result() == 7 and futures[2].result() == 11 and futures[3].result() == 1
+    assert "Current stock: 2" in str(futures[1].exception())
+    assert "Current stock: 11" in str(futures[4].exception())
+    assert "not found" in str(futures[5].exception())
+    assert isinstance(futures[1].exception(), StockError)
+    assert system.get_stock(hammer)["quantity"] == 11 and system.get_stock(saw)["quantity"] == 1
+    
+    history = system.query_transactions(limit=10).rows
+    assert sorted((t["product_id"], t["transaction_type"], t["quantity"]) for t in history) == \
+        sorted([(hammer, "sale", 3), (hammer, "restock", 4), (saw, "sale", 1)])
+    
+    # One flush wrote three rows in one INSERT and both products in one UPDATE
+    stats = pipeline.get_stats()
+    assert stats["flushes"] == 1 and stats["acknowledged"] == 3 and stats["rejected"] == 3
+    calls = {s["query"].split()[0]: s["calls"] for s in system.get_query_stats()["statements"]
+             if s["operation"] == "ingest"}
+    assert calls == {"SELECT": 1, "INSERT": 1, "UPDATE": 1}
+    update = fingerprint(ingest.apply_deltas({hammer: 1, saw: -1})[0])
+    assert "WHEN ? THEN ?+" in update and update == fingerprint(ingest.apply_deltas({hammer: 1, saw: 2, 7: 3})[0])
+    
+    # A full queue refuses events instead of growing
+    full = ingest.IngestPipeline(system, workers=1, queue_size=2)
+    full.submit(hammer, 1, "sale", timeout=0)
+    full.submit(hammer, 1, "sale", timeout=0)
+    try:
+        full.submit(hammer, 1, "sale", timeout=0.01)
+        assert False, "expected IngestFullError"
+    except ingest.IngestFullError:
+        pass
+    full.close()
+    assert full.get_stats()["refused"] == 1 and system.get_stock(hammer)["quantity"] == 9
+    
+    # Many producers, several workers: every event is acknowledged and stock adds up
+    busy = ingest.IngestPipeline(system, workers=3, batch_size=50, flush_interval=0.01).start()
+    acks = []
+    def produce():
+        for _ in range(40):
+            acks.append(busy.submit(hammer, 2, "restock"))
+            acks.append(busy.submit(saw, 1, "restock"))
+    producers = [threading.Thread(target=produce) for _ in range(4)]
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    busy.close()
+    assert all(f.exception() is None for f in acks)
+    assert system.get_stock(hammer)["quantity"] == 9 + 320 and system.get_stock(saw)["quantity"] == 1 + 160
+    assert busy.get_stats()["flushes"] < len(acks)
+    print(f"Applied {len(acks)} events in {busy.get_stats()['flushes']} flushes")
+    system.close()
+
+
+def test_case_21():
+    """Test Case 21: Product sharding with replicated categories and scatter-gather reports"""
+    print("\n" + "="*50)
+    print("TEST CASE 21: Product shards")
+    print("="*50)
+    
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:")) for _ in range(2)]
+    system = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 100))
+    system.prepare()
+    
+    # Categories exist on every shard under the same id
+    tools = system.create_category("Tools")
+    assert [s.category_choices() for s in shards] == [[{"category_id": tools, "name": "Tools"}]] * 2
+    
+    # New products alternate between shards, each within its own id range
+    ids = [system.create_product(f"Item {i}", None, i + 1, tools, quantity=5 * i) for i in range(4)]
+    assert ids == [1, 101, 2, 102]
+    assert [s.get_product(101) for s in shards][0] is None and shards[1].get_product(101)["name"] == "Item 1"
+    assert system.get_product(102)["name"] == "Item 3"
+    # An id in no shard's range is simply not a product
+    assert system.get_product(250) is None
+    
+    # Single-product writes land on the owning shard only
+    assert system.record_transaction(101, 3, "sale") == 2
+    assert system.record_transaction(2, 2, "sale") == 8
+    
+    # Catalog-wide reads are merged in single-database order
+    assert [p["product_id"] for p in system.list_products()] == [1, 2, 101, 102]
+    pages = [[p["product_id"] for p in page] for page, _ in system.iter_product_pages(page_size=3)]
+    assert pages == [[1, 2, 101], [102]]
+    assert [r["quantity"] for r in system.inventory_levels()] == [15, 8, 2, 0]
+    assert [r["name"] for r in system.high_value_items()][:2] == ["Item 3", "Item 2"]
+    assert [r["quantity"] for r in system.low_stock_items()] == [0, 2, 8]
+    summary = system.category_summary()
+    assert [(r["category"], r["product_count"], r["total_units"], r["total_value"]) for r in summary] == \
+        [("Tools", 4, 25, 88)]
+    assert system.list_categories()[0]["product_count"] == 4 and system.inventory_total() == 88
+    
+    # Transaction ids are unique across shards, so merged history pages with one cursor
+    first = system.query_transactions(limit=1)
+    second = system.query_transactions(before=first.older, limit=1)
+    assert first.older is not None and second.older is None
+    assert {first.rows[0]["product_id"], second.rows[0]["product_id"]} == {2, 101}
+    assert [t["product_id"] for t in system.query_transactions(product_id=101).rows] == [101]
+    
+    # Alerts from both shards come back in id order and are acknowledged everywhere
+    alerts_seen = system.pending_alerts()
+    assert [a["product_id"] for a in alerts_seen] == [1, 2, 101]
+    assert system.acknowledge_alerts(alerts_seen[-1]["alert_id"]) == 3 and system.pending_alerts() == []
+    
+    # A failed multi-shard transaction rolls back on every shard it touched
+    try:
+        with system.transaction():
+            system.record_transaction(1, 4, "restock")
+            system.record_transaction(102, 1, "sale")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    assert system.get_stock(1)["quantity"] == 0 and system.get_stock(102)["quantity"] == 15
+    
+    # The ingest pipeline writes one transaction per shard a batch touches
+    pipeline = ingest.IngestPipeline(system, workers=1, flush_interval=0.5)
+    acks = [pipeline.submit(1, 2, "restock"), pipeline.submit(102, 5, "sale"), pipeline.submit(2, 1, "sale")]
+    pipeline.close()
+    assert [f.result() for f in acks] == [2, 10, 7] and pipeline.get_stats()["flushes"] == 1
+    
+    # Hash routing: shards hand out interleaved ids that map back to them
+    hashed = sharding.HashSharding(3)
+    assert [hashed.shard_of(i) for i in range(1, 7)] == [0, 1, 2, 0, 1, 2]
+    assert hashed.session(1) == {"auto_increment_increment": 3, "auto_increment_offset": 2}
+    assert service.database_config("db2:3307/inventory_s1")["port"] == 3307
+    print(f"Routed {len(ids)} products over {len(shards)} shards")
+    system.close()
+
+
+class StandInReplica:
+    """SQLite stand-in replica whose reported lag the test controls"""
+    def __init__(self):
+        self.backend = create_backend("sqlite", ":memory:")
+        self.lag = 0.0
+        self.probes = 0
+    
+    def connect(self):
+        return self.backend.connect()
+    
+    def pool_size(self, requested):
+        return self.backend.pool_size(requested)
+    
+    def replica_lag(self, conn):
+        self.probes += 1
+        return self.lag
+    
+    def close(self):
+        self.backend.close()
+
+
+def test_case_22():
+    """Test Case 22: Read/write splitting with lag-aware fallback to the primary"""
+    print("\n" + "="*50)
+    print("TEST CASE 22: Read replicas")
+    print("="*50)
+    
+    # The stand-in is not really replicated, so its rows show where a read ran
+    replica = StandInReplica()
+    copy = InventoryService(backend=replica.backend)
+    copy.create_product("Replica Widget", None, 2, copy.create_category("Tools"), quantity=7)
+    router = service.create_replica_router([replica], ["replica0"], max_lag=5, check_interval=60)
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"), replicas=router)
+    tools = system.create_category("Tools")
+    widget = system.create_product("Primary Widget", None, 3, tools, quantity=4)
+    
+    def names(rows):
+        return [row["name"] for row in rows]
+    
+    # Reports and listings read the replica; single-product reads stay on the primary
+    assert names(system.inventory_levels()) == ["Replica Widget"]
+    assert names(system.iter_inventory_levels()) == ["Replica Widget"]
+    assert names(system.iter_low_stock_items()) == ["Replica Widget"]
+    assert system.get_product(widget)["name"] == "Primary Widget"
+    
+    # This thread's own write sends reads of the written tables to the primary
+    # until a lag probe shows the replica has applied it
+    system.record_transaction(widget, 1, "sale")
+    assert names(system.inventory_levels()) == ["Primary Widget"]
+    assert names(system.list_categories()) == ["Tools"]
+    router.check_interval = 0
+    assert names(system.inventory_levels()) == ["Replica Widget"]
+    
+    # Another thread's writes do not hold back this one's reads
+    router.check_interval = 60
+    writer = threading.Thread(target=system.record_transaction, args=(widget, 1, "sale"))
+    writer.start()
+    writer.join()
+    assert names(system.high_value_items()) == ["Replica Widget"]
+    
+    # Reads inside a transaction use the primary and see its writes
+    with system.transaction():
+        assert names(system.inventory_levels()) == ["Primary Widget"]
+    
+    # A lagging or stopped replica is skipped until a probe says otherwise
+    router.check_interval = 0
+    replica.lag = 30.0
+    assert names(system.inventory_levels()) == ["Primary Widget"]
+    replica.lag = None
+    assert names(system.iter_inventory_levels()) == ["Primary Widget"]
+    # Back within the lag limit, and 1ms behind covers this thread's last write
+    time.sleep(0.01)
+    replica.lag = 0.001
+    assert names(system.inventory_levels()) == ["Replica Widget"]
+    
+    stats = system.get_replica_stats()
+    assert stats["fallbacks"] == {"lagging": 1, "unavailable": 1, "recent_write": 2}
+    assert stats["routes"]["replica0"]["queries"] == 6 and stats["routes"]["primary"]["queries"] == 4
+    assert stats["replicas"]["replica0"] == {"lag": 0.001, "available": True, "error": None}
+    assert "fallbacks to primary: lagging 1, unavailable 1, recent_write 2" in system.query_report()
+    print(f"{stats['routes']['replica0']['queries']} reads on the replica, "
+          f"{stats['routes']['primary']['queries']} fell back to the primary")
+    system.close()
+    copy.close()
+
+def test_case_23():
+    """Test Case 23: Ranked product search through the full-text index, kept current by triggers"""
+    print("\n" + "="*50)
+    print("TEST CASE 23: Product search")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    cables = system.create_category("Cables")
+    for name, description in [("USB-C Cable", "Braided, 2m"), ("Cable Tie", "Nylon, pack of 100"),
+                              ("Cable", None), ("Laptop Stand", "Aluminium"),
+                              ("Desk Lamp", "Fits any cable tray"), ("100% Cotton Cloth", None)]:
+        system.create_product(name, description, 5, cables, quantity=3)
+    
+    def names(text, limit=None):
+        return [p["name"] for p in system.search_products(text, limit)]
+    
+    # Exact name, then name prefix, then word prefix, then description
+    results = system.search_products("cable")
+    assert [(p["name"], p["match"]) for p in results] == [
+        ("Cable", "exact"), ("Cable Tie", "prefix"), ("USB-C Cable", "word"), ("Desk Lamp", "description")
+    ]
+    assert results[0]["quantity"] == 3 and results[0]["category"] == "Cables"
+    assert names("cable", limit=2) == ["Cable", "Cable Tie"]
+    
+    # Substrings, words in any order, and words that must all match
+    assert names("top") == ["Laptop Stand"]
+    assert names("STAND  lap") == ["Laptop Stand"]
+    assert names("cable nylon") == ["Cable Tie"]
+    assert names("cable xyz") == []
+    # Shorter than a trigram: a name prefix, with LIKE wildcards taken literally
+    assert names("ca") == ["Cable", "Cable Tie"]
+    assert names("10") == ["100% Cotton Cloth"] and names("1%") == []
+    assert system.search_products("   ") == []
+    
+    # Renames and deletes reach the index through the triggers
+    stand = next(p["product_id"] for p in system.search_products("laptop"))
+    system.update_product(stand, "Monitor Riser", "Aluminium", 30, cables)
+    assert names("laptop") == [] and names("riser") == ["Monitor Riser"]
+    system.delete_product(stand)
+    assert names("riser") == [] and names("aluminium") == []
+    
+    # The API answers with the ranked rows and rejects an empty search
+    status, rows = http_api.search_products(system, None, {"q": ["tie"]}, None)
+    assert status == 200 and [r["name"] for r in rows] == ["Cable Tie"]
+    try:
+        http_api.search_products(system, None, {}, None)
+        assert False, "expected a 400"
+    except http_api.HTTPError as e:
+        assert e.status == 400
+    
+    # Shards are searched in parallel and their matches ranked together
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:")) for _ in range(2)]
+    sharded = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 100))
+    sharded.prepare()
+    category = sharded.create_category("Cables")
+    for name in ["USB-C Cable", "Cable Tie", "Cable", "Patch Cable"]:
+        sharded.create_product(name, None, 5, category)
+    assert [p["name"] for p in sharded.search_products("cable")] == ["Cable", "Cable Tie", "Patch Cable", "USB-C Cable"]
+    print(f"Search 'cable': {[p['name'] for p in results]}")
+    sharded.close()
+    system.close()
+
+
+def test_case_24():
+    """Test Case 24: Batch mode over shards, with per-command savepoints on every shard touched"""
+    print("\n" + "="*50)
+    print("TEST CASE 24: Sharded batch savepoints")
+    print("="*50)
+    
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:")) for _ in range(2)]
+    system = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 100))
+    system.prepare()
+    tools = system.create_category("Tools")
+    first, second = (system.create_product(name, None, 2, tools, quantity=10) for name in ("Drill", "Level"))
+    assert (first, second) == (1, 101)
+    
+    # A block that fails after writing to both shards is undone on both,
+    # while the transaction's other writes still commit
+    with system.transaction():
+        system.adjust_stock(first, 1)
+        try:
+            with system.savepoint():
+                system.adjust_stock(first, 5)
+                system.adjust_stock(second, 5)
+                raise RuntimeError("undo")
+        except RuntimeError:
+            pass
+        system.adjust_stock(second, 2)
+    assert system.get_stock(first)["quantity"] == 11 and system.get_stock(second)["quantity"] == 12
+    
+    # The failing line is rolled back alone; the rest of its group commits on both shards
+    lines = [
+        f"inventory adjust --product {first} --delta 4",
+        f"txn record --product {second} --qty 50 --type sale",
+        f"inventory adjust --product {second} --delta -2",
+    ]
+    out = io.StringIO()
+    failed = cli.run_batch(system, cli.build_parser(), cli.read_commands(lines), 3, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["status"] for r in records] == ["ok", "error", "ok"] and failed == 1
+    assert "Not enough inventory" in records[1]["error"]
+    assert system.get_stock(first)["quantity"] == 15 and system.get_stock(second)["quantity"] == 10
+    history = system.query_transactions(product_id=second).rows
+    assert [(t["transaction_type"], t["quantity"]) for t in history] == [("sale", 2), ("restock", 2)]
+    print(f"{len(records)} sharded commands, {failed} rolled back")
+    system.close()
+
+
+def test_case_25():
+    """Test Case 25: Sharded stats come back in the single-database shape, added up over shards"""
+    print("\n" + "="*50)
+    print("TEST CASE 25: Sharded stats")
+    print("="*50)
+    
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:"),
+                               cache=QueryCache(max_entries=50, ttl=60, dependents=service.TRIGGER_DEPENDENTS))
+              for _ in range(2)]
+    system = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 100))
+    system.prepare()
+    tools = system.create_category("Tools")
+    for name in ("Drill", "Level"):
+        system.create_product(name, None, 2, tools, quantity=10)
+    with system.operation("Reports"):
+        system.category_summary()
+        system.category_summary()
+    
+    # Each shard missed once and then hit once; the menu's exit line reads these keys
+    cache = system.get_cache_stats()
+    per_shard = [shard.get_cache_stats() for shard in shards]
+    assert cache["hits"] == sum(s["hits"] for s in per_shard) and cache["hits"] >= 2
+    assert cache["misses"] == sum(s["misses"] for s in per_shard)
+    assert cache["entries"] == sum(s["entries"] for s in per_shard)
+    assert cache["hit_rate"] == cache["hits"] / (cache["hits"] + cache["misses"])
+    
+    pool = system.get_pool_stats()
+    assert pool["size"] == sum(shard.get_pool_stats()["size"] for shard in shards)
+    # Both shards use the module's statement registry, which is counted once
+    assert system.get_statement_stats() == shards[0].get_statement_stats()
+    
+    # The same statement under the same operation is one row, with both shards' counts
+    queries = system.get_query_stats()
+    summary = [s for s in queries["statements"] if s["operation"] == "Reports"]
+    assert len(summary) == 1 and summary[0]["calls"] == 2 and summary[0]["cached"] == 2
+    assert queries["operations"]["Reports"] == {"queries": 2, "cached": 2, "errors": 0,
+                                                "total_ms": summary[0]["total_ms"]}
+    assert system.get_replica_stats() is None
+    print(f"Cache over {len(shards)} shards: {cache['hits']} hits, {cache['misses']} misses")
+    system.close()
+
+
+def test_case_26():
+    """Test Case 26: New products spread over shards across separate router instances"""
+    print("\n" + "="*50)
+    print("TEST CASE 26: Shard placement across runs")
+    print("="*50)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"shard{i}.db") for i in range(2)]
+        
+        def router():
+            # A fresh router per product, as each short-lived cli.py run builds one
+            return sharding.ShardedInventoryService(
+                [InventoryService(backend=create_backend("sqlite", path)) for path in paths],
+                sharding.RangeSharding(2, 100)
+            )
+        
+        setup = router()
+        setup.prepare()
+        tools = setup.create_category("Tools")
+        setup.close()
+        
+        ids = []
+        for i in range(5):
+            run = router()
+            ids.append(run.create_product(f"Item {i}", None, 1, tools))
+            run.close()
+        assert ids == [1, 101, 2, 102, 3]
+        
+        # Inside one transaction the block's own uncommitted products count too
+        run = router()
+        with run.transaction():
+            ids = [run.create_product(f"Batch {i}", None, 1, tools) for i in range(3)]
+        assert ids == [103, 4, 104]
+        
+        # Placement reads each shard's highest id: deleting shard 0's newest
+        # product makes it the emptier shard, and the new id is not reused
+        run.delete_product(4)
+        assert run.create_product("After delete", None, 1, tools) == 5
+        run.close()
+    
+    hashed = sharding.HashSharding(3)
+    assert [hashed.ids_used(i, last) for i, last in [(0, None), (0, 7), (1, 5), (2, 3), (2, 2)]] == [0, 3, 2, 1, 0]
+    print(f"Products placed across runs: {ids}")
+
+
+def test_case_27():
+    """Test Case 27: Guarded relative stock changes on the real service"""
+    print("\n" + "="*50)
+    print("TEST CASE 27: adjust_stock")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    tools = system.create_category("Tools")
+    drill = system.create_product("Drill", None, 40, tools, quantity=10)
+    
+    def history():
+        return [(t["transaction_type"], t["quantity"]) for t in system.query_transactions(product_id=drill).rows]
+    
+    assert system.adjust_stock(drill, 5, notes="Delivery") == 15
+    assert system.adjust_stock(drill, -3) == 12
+    assert history() == [("sale", 3), ("restock", 5)]
+    
+    # Going below the minimum leaves stock and history untouched
+    for delta, minimum in [(-13, 0), (-5, 8)]:
+        try:
+            system.adjust_stock(drill, delta, minimum=minimum)
+            assert False, "expected a StockError"
+        except StockError as e:
+            assert str(e) == "Not enough inventory. Current stock: 12"
+    assert system.adjust_stock(drill, -4, minimum=8) == 8
+    assert system.get_stock(drill)["quantity"] == 8 and len(history()) == 3
+    
+    try:
+        system.adjust_stock(999, 1)
+        assert False, "expected a StockError"
+    except StockError as e:
+        assert "not found" in str(e)
+    
+    # A zero delta is not a shortage: it reports the stock and records nothing
+    assert system.adjust_stock(drill, 0) == 8
+    assert system.get_stock(drill)["quantity"] == 8 and len(history()) == 3
+    print(f"Drill history: {history()}")
+    system.close()
+
+
+def test_case_28():
+    """Test Case 28: Keyset catalog pages stay exact when product names tie"""
+    print("\n" + "="*50)
+    print("TEST CASE 28: Catalog page boundaries")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    tools = system.create_category("Tools")
+    names = ["Widget", "Widget", "Widget", "Widget", "Anvil", "Widget", "Anvil"]
+    ids = [system.create_product(name, None, 1, tools) for name in names]
+    
+    def pages(**kwargs):
+        return [([p["product_id"] for p in page], more) for page, more in system.iter_product_pages(**kwargs)]
+    
+    # Pages follow product_id, so a run of equal names split by a page
+    # boundary is neither repeated nor skipped
+    assert pages(page_size=3) == [(ids[0:3], True), (ids[3:6], True), (ids[6:], False)]
+    assert [p["name"] for p in system.list_products(after_id=ids[2], limit=2)] == ["Widget", "Anvil"]
+    
+    # A catalog that fills its last page exactly does not end with an empty page
+    system.delete_product(ids[6])
+    assert pages(page_size=3) == [(ids[0:3], True), (ids[3:6], False)]
+    
+    # A cursor on a product deleted since its page was shown still resumes after it
+    system.delete_product(ids[2])
+    assert pages(page_size=2, after_id=ids[2]) == [(ids[3:5], True), (ids[5:6], False)]
+    print(f"Pages of 3: {pages(page_size=3)}")
+    system.close()
+
+
+def test_case_29():
+    """Test Case 29: category_stats follows every product and stock change through the triggers"""
+    print("\n" + "="*50)
+    print("TEST CASE 29: Category aggregates")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    conn = system.backend.connect()
+    tools = system.create_category("Tools")
+    paint = system.create_category("Paint")
+    
+    def summary():
+        return {r["category"]: (r["product_count"], r["total_units"], r["total_value"])
+                for r in system.category_summary()}
+    
+    def check(expected):
+        assert summary() == expected, summary()
+        assert aggregates.verify_category_stats(conn) == []
+    
+    hammer = system.create_product("Hammer", None, 2, tools, quantity=10)
+    saw = system.create_product("Saw", None, 5, tools)
+    primer = system.create_product("Primer", None, 3, paint, quantity=4)
+    check({"Tools": (2, 10, 20), "Paint": (1, 4, 12)})
+    
+    # Price edits revalue the stock; stock changes and sales move units and value
+    system.update_product(hammer, "Hammer", None, 2.5, tools)
+    system.adjust_stock(saw, 2)
+    system.record_transaction(primer, 1, "sale")
+    check({"Tools": (2, 12, 35), "Paint": (1, 3, 9)})
+    
+    # Moving a product takes its count, units and value to the new category
+    system.update_product(hammer, "Hammer", None, 2.5, paint)
+    check({"Tools": (1, 2, 10), "Paint": (2, 13, 34)})
+    
+    system.set_stock(primer, 0)
+    system.delete_product(saw)
+    check({"Tools": (0, 0, 0), "Paint": (2, 10, 25)})
+    
+    # A rebuild from scratch agrees with what the triggers maintained
+    expected = summary()
+    aggregates.rebuild_category_stats(conn)
+    check(expected)
+    print(f"Category summary: {expected}")
+    system.close()
+
+
+def test_case_30():
+    """Test Case 30: daily_sales matches raw history after sales, edits and deletes; backfill repairs it"""
+    print("\n" + "="*50)
+    print("TEST CASE 30: Daily sales rollup")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    conn = system.backend.connect()
+    tools = system.create_category("Tools")
+    hammer = system.create_product("Hammer", None, 2, tools, quantity=100)
+    saw = system.create_product("Saw", None, 5, tools, quantity=100)
+    drill = system.create_product("Drill", None, 40, tools, quantity=100)
+    
+    # Backdated history over three days, then today's sales and restocks
+    insert = ("INSERT INTO transactions (product_id, quantity, transaction_type, transaction_date) "
+              "VALUES (%s, %s, %s, %s)")
+    for product, quantity, kind, moment in [
+        (hammer, 3, "sale", datetime(2024, 3, 1, 9, 30)), (hammer, 2, "sale", datetime(2024, 3, 1, 17, 0)),
+        (saw, 4, "sale", datetime(2024, 3, 1, 23, 59, 59)), (saw, 1, "sale", datetime(2024, 3, 2, 0, 0)),
+        (hammer, 50, "restock", datetime(2024, 3, 2, 8, 0)), (drill, 1, "sale", datetime(2024, 3, 3, 12, 0)),
+    ]:
+        system.execute_query(insert, (product, quantity, kind, moment))
+    system.record_transaction(hammer, 6, "sale")
+    system.record_transaction(saw, 10, "restock")
+    
+    # Edits: a price change, a stock correction, one sale deleted, one product deleted
+    system.update_product(saw, "Saw", None, 6, tools)
+    system.set_stock(hammer, 40)
+    system.execute_query("DELETE FROM transactions WHERE product_id = %s AND quantity = %s", (hammer, 2))
+    system.delete_product(drill)
+    assert sales_rollup.verify_daily_sales(conn) == []
+    
+    summary = system.sales_summary("2024-03-01", "2024-03-03")
+    assert [(r["name"], r["units_sold"], r["revenue"]) for r in summary] == [("Saw", 5, 30), ("Hammer", 3, 6)]
+    
+    # A drifted row is reported, and a backfill of its window puts it right
+    system.execute_query("UPDATE daily_sales SET units_sold = units_sold + 5 WHERE product_id = %s", (saw,))
+    mismatches = sales_rollup.verify_daily_sales(conn)
+    assert [(m[0].isoformat(), m[1], m[2], m[3]) for m in mismatches] == \
+        [("2024-03-01", saw, 4, 9), ("2024-03-02", saw, 1, 6)]
+    sales_rollup.backfill_daily_sales(conn, datetime(2024, 3, 1).date(), datetime(2024, 3, 3).date())
+    assert sales_rollup.verify_daily_sales(conn) == []
+    print(f"Sales 1-2 March: {[(r['name'], r['units_sold']) for r in summary]}")
+    system.close()
+
+
+def test_case_31():
+    """Test Case 31: Ids outside every shard's range behave like unknown products"""
+    print("\n" + "="*50)
+    print("TEST CASE 31: Out-of-range product ids")
+    print("="*50)
+    
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:")) for _ in range(2)]
+    system = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 3))
+    system.prepare()
+    tools = system.create_category("Tools")
+    system.create_product("Drill", None, 2, tools, quantity=5)
+    
+    assert system.get_product(99) is None and system.get_stock(99) is None
+    assert system.update_product(99, "Ghost", None, 1, tools) == 0
+    assert system.delete_product(99) is False
+    assert system.query_transactions(product_id=99).rows == []
+    for write in (lambda: system.set_stock(99, 1), lambda: system.adjust_stock(99, 1),
+                  lambda: system.record_transaction(99, 1, "sale")):
+        try:
+            write()
+            assert False, "expected a StockError"
+        except StockError as e:
+            assert "Product 99 not found" in str(e)
+    
+    # The front ends answer as they do for any missing product
+    try:
+        http_api.get_product(system, {"id": "99"}, {}, {})
+        assert False, "expected a 404"
+    except http_api.HTTPError as e:
+        assert e.status == 404
+    out = io.StringIO()
+    lines = ["txn list --product 99", "inventory adjust --product 99 --delta 1", "inventory set --product 1 --qty 7"]
+    failed = cli.run_batch(system, cli.build_parser(), cli.read_commands(lines), 10, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["status"] for r in records] == ["ok", "error", "ok"] and failed == 1
+    assert records[0]["result"] == [] and "not found" in records[1]["error"]
+    print(f"Product 99: {records[1]['error']}")
+    system.close()
+
+
+def test_case_32():
+    """Test Case 32: Filling every shard's id range is reported, not mistaken for a bad shard"""
+    print("\n" + "="*50)
+    print("TEST CASE 32: Full shard ranges")
+    print("="*50)
+    
+    shards = [InventoryService(backend=create_backend("sqlite", ":memory:")) for _ in range(2)]
+    system = sharding.ShardedInventoryService(shards, sharding.RangeSharding(2, 2))
+    system.prepare()
+    tools = system.create_category("Tools")
+    ids = [system.create_product(f"Item {n}", None, 1, tools) for n in range(4)]
+    assert sorted(ids) == [1, 2, 3, 4]
+    
+    try:
+        system.create_product("Item 5", None, 1, tools)
+        assert False, "expected a ShardError"
+    except sharding.ShardError as e:
+        assert "All shard ranges are full" in str(e)
+    
+    out = io.StringIO()
+    lines = [f"product add --name Extra --price 1 --category {tools}", "product list"]
+    failed = cli.run_batch(system, cli.build_parser(), cli.read_commands(lines), 10, out)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["status"] for r in records] == ["error", "ok"] and failed == 1
+    assert "All shard ranges are full" in records[0]["error"] and len(records[1]["result"]) == 4
+    
+    async def scenario():
+        api = http_api.InventoryAPI(system, concurrency=1)
+        server = await api.start("127.0.0.1", 0)
+        try:
+            return await call_api(server.sockets[0].getsockname()[1], [
+                ("POST", "/products", {"name": "Extra", "price": 1, "category_id": tools}),
+            ])
+        finally:
+            await api.close()
+    
+    [(status, payload)] = asyncio.run(scenario())
+    assert status == 503 and "All shard ranges are full" in payload["error"]
+    print(f"Fifth product: {status} {payload['error']}")
+
+
+def test_case_33():
+    """Test Case 33: Migration numbering and the query plan checks"""
+    print("\n" + "="*50)
+    print("TEST CASE 33: Migrations and plan checks")
+    print("="*50)
+    
+    # Versions are applied and recorded in list order, so they must count up without gaps
+    versions = [migration.version for migration in migrations.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert all(migration.steps for migration in migrations.MIGRATIONS)
+    assert sqlite_backend.SCHEMA_VERSION == versions[-1]
+    
+    assert migrations.plan_issues({"type": "ALL", "Extra": "Using where; Using filesort"}) == ["full scan", "filesort"]
+    assert migrations.plan_issues({"type": "ref", "Extra": None}) == []
+    assert migrations.plan_issues({"type": "index", "Extra": "Using index"}) == []
+    
+    # Every check builds from the current service statements with one parameter per placeholder
+    checks = migrations.query_plan_checks()
+    labels = [label for label, _, _, _ in checks]
+    assert len(set(labels)) == len(labels)
+    for label, query, params, allowed in checks:
+        assert isinstance(query, str) and query.strip(), label
+        assert query.count("%s") == len(params or ()), label
+        for alias, issue in allowed:
+            assert issue in ("full scan", "filesort"), label
+            assert re.search(rf"\b{alias}\b", query), label
+    print(f"{len(versions)} migrations, {len(checks)} plan checks")
+
+
+def test_case_34():
+    """Test Case 34: Setting stock over HTTP answers 400 for bad input and 404 for unknown products"""
+    print("\n" + "="*50)
+    print("TEST CASE 34: PUT /inventory statuses")
+    print("="*50)
+    
+    system = InventoryService(backend=create_backend("sqlite", ":memory:"))
+    tools = system.create_category("Tools")
+    product = system.create_product("Drill", None, 2, tools, quantity=5)
+    
+    async def scenario():
+        api = http_api.InventoryAPI(system, concurrency=1)
+        server = await api.start("127.0.0.1", 0)
+        try:
+            return await call_api(server.sockets[0].getsockname()[1], [
+                ("PUT", f"/inventory/{product}", {"quantity": 12}),
+                ("PUT", f"/inventory/{product}", {"quantity": -1}),
+                ("PUT", "/inventory/999", {"quantity": 3}),
+                ("PUT", f"/inventory/{product}", {"quantity": "many"}),
+            ])
+        finally:
+            await api.close()
+    
+    responses = asyncio.run(scenario())
+    assert [status for status, _ in responses] == [200, 400, 404, 400]
+    assert responses[0][1] == {"product_id": product, "quantity": 12}
+    assert "cannot be negative" in responses[1][1]["error"]
+    assert responses[2][1]["error"] == "Product not found"
+    print(f"Statuses: {[status for status, _ in responses]}")
+
+
 if __name__ == "__main__":
     print("Running test cases for Inventory Management System")
     
     test_case_1()
     test_case_2()
     test_case_3()
+    test_case_4()
+    test_case_5()
+    test_case_6()
+    test_case_7()
+    test_case_8()
+    test_case_9()
+    test_case_10()
+    test_case_11()
+    test_case_12()
+    test_case_13()
+    test_case_14()
+    test_case_15()
+    test_case_16()
+    test_case_17()
+    test_case_18()
+    test_case_19()
+    test_case_20()
+    test_case_21()
+    test_case_22()
+    test_case_23()
+    test_case_24()
+    test_case_25()
+    test_case_26()
+    test_case_27()
+    test_case_28()
+    test_case_29()
+    test_case_30()
+    test_case_31()
+    test_case_32()
+    test_case_33()
+    test_case_34()
     
     print("\nAll test cases completed successfully!")